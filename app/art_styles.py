@@ -1,27 +1,26 @@
+import sys
+import json
 import cv2
 import numpy as np
-import random
 from PIL import Image, ImageFilter, ImageOps
+from noise import NoiseSource, NOISE_MODES
+from buffers import get_arena
+from palette import build_palette, PaletteLUT
 
 class ArtStyleProcessor:
     def __init__(self, config):
         self.config = config
         self.styles = config["styles"]
         self.default_style = config["default_style"]
+        self.noise = NoiseSource(use_bank=config.get("noise_bank", True))
+        self._palette_luts = {}
+        self._compiled_styles = {}
         
     def process_image(self, img, style_name=None, custom_params=None):
         """Process an image with the selected art style"""
-        if style_name is None:
-            style_name = self.default_style
-            
-        if style_name not in self.styles and style_name != "custom":
-            print(f"Style {style_name} not found, using default style {self.default_style}")
-            style_name = self.default_style
-            
-        if style_name == "custom" and custom_params:
-            style_params = custom_params
-        else:
-            style_params = self.styles[style_name]
+        style_kind, style_params = self._select_style(style_name, custom_params)
+        if style_kind == "graph":
+            return self._apply_graph_style(img, style_params["pipeline"], style_params)
             
         if len(img.shape) == 3 and img.shape[2] == 4:
             has_alpha = True
@@ -33,14 +32,12 @@ class ArtStyleProcessor:
             rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
             pil_img = Image.fromarray(rgb_img)
             
-        if style_name == "faith" or (style_name == "custom" and style_params.get("color_mode") == "monochrome"):
+        if style_kind == "faith":
             processed_img = self._apply_faith_style(pil_img, style_params)
-        elif style_name == "classic_pixel" or (style_name == "custom" and style_params.get("color_mode") == "limited_palette"):
+        elif style_kind == "classic_pixel":
             processed_img = self._apply_classic_pixel_style(pil_img, style_params)
-        elif style_name == "glitch" or (style_name == "custom" and style_params.get("color_mode") == "rgb_shift"):
-            processed_img = self._apply_glitch_style(pil_img, style_params)
         else:
-            processed_img = self._apply_faith_style(pil_img, self.styles["faith"])
+            processed_img = self._apply_glitch_style(pil_img, style_params)
             
         result = np.array(processed_img)
         result = cv2.cvtColor(result, cv2.COLOR_RGB2BGR)
@@ -51,12 +48,54 @@ class ArtStyleProcessor:
             
         return result
         
+    def _select_style(self, style_name, custom_params):
+        """
+        Resolve a style name to the effect it uses and its params
+        
+        The effect is "faith", "classic_pixel" or "glitch", or "graph" for
+        styles defined as a "pipeline" of ops (see style_graph).
+        """
+        if style_name is None:
+            style_name = self.default_style
+            
+        if style_name not in self.styles and style_name != "custom":
+            print(f"Style {style_name} not found, using default style {self.default_style}",
+                  file=sys.stderr)
+            style_name = self.default_style
+            
+        if style_name == "custom" and custom_params:
+            style_params = custom_params
+        else:
+            style_params = self.styles[style_name]
+            
+        if style_params.get("pipeline"):
+            return "graph", style_params
+        if style_name == "faith" or (style_name == "custom" and style_params.get("color_mode") == "monochrome"):
+            return "faith", style_params
+        elif style_name == "classic_pixel" or (style_name == "custom" and style_params.get("color_mode") == "limited_palette"):
+            return "classic_pixel", style_params
+        elif style_name == "glitch" or (style_name == "custom" and style_params.get("color_mode") == "rgb_shift"):
+            return "glitch", style_params
+        return "faith", self.styles["faith"]
+        
+    def is_deterministic(self, style_name, custom_params=None):
+        """Whether identical frames always get identical results, i.e. the style draws no random noise or glitches"""
+        style_kind, style_params = self._select_style(style_name, custom_params)
+        if style_kind == "graph":
+            return self.compile_style(style_params["pipeline"]).deterministic
+        if style_kind == "faith":
+            return self._noise_mode(style_params, style_params.get("noise_level", 0.2)) is None
+        if style_kind == "glitch":
+            return style_params.get("glitch_blocks", int(10 * style_params.get("noise_level", 0.5))) <= 0
+        return True
+        
     def _apply_faith_style(self, img, params):
         """Apply Faith: The Unholy Trinity style to the image"""
         pixel_size = params.get("pixel_size", 4)
         contrast = params.get("contrast", 1.5)
         noise_level = params.get("noise_level", 0.2)
         use_dithering = params.get("dithering", True)
+        dither_mode = params.get("dither_mode", "floyd_steinberg")
         
         width, height = img.size
         small_size = (width // pixel_size, height // pixel_size)
@@ -66,23 +105,45 @@ class ArtStyleProcessor:
         
         enhancer = ImageOps.autocontrast(pixelated, cutoff=10)
         
-        if use_dithering:
+        if use_dithering and dither_mode == "floyd_steinberg":
             result = pixelated.convert('1', dither=Image.FLOYDSTEINBERG)
+        elif use_dithering:
+            from dithering import dither
+            result = Image.fromarray(dither(np.asarray(pixelated), dither_mode))
         else:
             result = pixelated.point(lambda x: 0 if x < 128 else 255, '1')
         
-        result = result.convert('RGB')
+        noise_mode = self._noise_mode(params, noise_level)
+        if noise_mode == "grid":
+            result = Image.fromarray(self._add_noise(np.array(result.convert('RGB')), noise_level))
+        elif noise_mode == "mono":
+            result = result.convert('L')
+        else:
+            result = result.convert('RGB')
         
         result = result.resize((width, height), Image.NEAREST)
         
-        if noise_level > 0:
-            noise = np.random.randint(0, int(noise_level * 255), (height, width, 3), dtype=np.uint8)
-            result_array = np.array(result)
-            result_array = cv2.add(result_array, noise)
-            result = Image.fromarray(result_array)
+        if noise_mode == "mono":
+            result = Image.fromarray(self._add_noise(np.array(result), noise_level)).convert('RGB')
+        elif noise_mode == "color":
+            result = Image.fromarray(self._add_noise(np.array(result), noise_level))
             
         return result
         
+    def _noise_mode(self, params, noise_level):
+        """Where noise is added (see noise.NOISE_MODES), or None for no noise"""
+        if int(noise_level * 255) <= 0:
+            return None
+        noise_mode = params.get("noise_mode", "color")
+        if noise_mode not in NOISE_MODES:
+            print(f"Noise mode {noise_mode} not found, using color", file=sys.stderr)
+            return "color"
+        return noise_mode
+        
+    def _add_noise(self, img, noise_level, dst=None):
+        """Saturating add of uniform noise in [0, noise_level * 255) to a uint8 array"""
+        return cv2.add(img, self.noise.uniform(img.shape, int(noise_level * 255)), dst=dst)
+        
     def _apply_classic_pixel_style(self, img, params):
         """Apply classic pixel art style with limited color palette"""
         pixel_size = params.get("pixel_size", 3)
@@ -94,12 +155,60 @@ class ArtStyleProcessor:
         
         pixelated = ImageOps.autocontrast(pixelated, cutoff=5)
         
-        pixelated = pixelated.quantize(16).convert('RGB')
+        if params.get("palette"):
+            pixelated = Image.fromarray(self._palette_lut(params["palette"]).apply(np.asarray(pixelated)))
+        else:
+            pixelated = pixelated.quantize(16).convert('RGB')
         
         result = pixelated.resize((width, height), Image.NEAREST)
         
         return result
         
+    def compile_style(self, steps):
+        """The compiled form of an op pipeline (see style_graph.CompiledStyle), built once per pipeline"""
+        key = json.dumps(steps, sort_keys=True)
+        if key not in self._compiled_styles:
+            from style_graph import CompiledStyle
+            self._compiled_styles[key] = CompiledStyle(steps)
+        return self._compiled_styles[key]
+        
+    def _apply_graph_style(self, img, steps, params):
+        """Run an op pipeline on a BGR(A) array and return a new BGR(A) array"""
+        result = self.compile_style(steps).run(img, self, params.get("grid_scale", 1))
+        # result may be an arena buffer, so always hand back a new array
+        if len(img.shape) == 3 and img.shape[2] == 4:
+            return np.dstack((result, img[:, :, 3]))
+        return result.copy()
+        
+    def _palette_lut(self, palette, bgr=False):
+        """Lookup table for a shared RGB palette, built once per palette and channel order"""
+        key = (tuple(map(tuple, palette)), bgr)
+        if key not in self._palette_luts:
+            colors = np.asarray(palette, dtype=np.uint8)
+            self._palette_luts[key] = PaletteLUT(colors[:, ::-1] if bgr else colors,
+                                                 self.config.get("palette_lut_bits", 6))
+        return self._palette_luts[key]
+        
+    def sample_palette(self, frames, params, colors=16):
+        """
+        Build one RGB palette for a whole video from sampled BGR(A) frames
+        
+        Each frame is pixelated and auto-contrasted exactly as the
+        classic_pixel style does before quantizing, then one median cut runs
+        over all of them. Passing the result as the style's "palette" param
+        replaces the per-frame quantize with a LUT lookup, so colors no longer
+        flicker between frames.
+        """
+        pixel_size = params.get("pixel_size", 3)
+        samples = []
+        for frame in frames:
+            height, width = frame.shape[:2]
+            small = cv2.resize(frame, (max(1, width // pixel_size), max(1, height // pixel_size)),
+                               interpolation=cv2.INTER_NEAREST_EXACT)
+            rgb = cv2.cvtColor(small, cv2.COLOR_BGRA2RGB if small.shape[2] == 4 else cv2.COLOR_BGR2RGB)
+            samples.append(autocontrast(rgb, cutoff=5))
+        return build_palette(samples, colors).tolist()
+        
     def _apply_glitch_style(self, img, params):
         """Apply glitch art style with digital artifacts"""
         pixel_size = params.get("pixel_size", 2)
@@ -107,33 +216,14 @@ class ArtStyleProcessor:
         
         width, height = img.size
         small_size = (width // pixel_size, height // pixel_size)
-        pixelated = img.resize(small_size, Image.NEAREST)
+        pixelated = np.asarray(img.resize(small_size, Image.NEAREST))
         
-        r, g, b = pixelated.split()
+        # grid_scale is set when the frame is already at pixel-grid resolution
+        shift = int(width * params.get("grid_scale", 1) * 0.02)
+        result = rgb_shift(pixelated, shift, red=0, blue=2)
+        displace_blocks(result, params.get("glitch_blocks", int(10 * noise_level)), self.noise.rng)
 
-        shift = int(width * 0.02)
-        r = ImageOps.crop(r, (shift, 0, 0, 0))
-        r = ImageOps.expand(r, (0, 0, shift, 0), fill=0)
-        
-        b = ImageOps.crop(b, (0, 0, shift, 0))
-        b = ImageOps.expand(b, (shift, 0, 0, 0), fill=0)
-
-        result = Image.merge("RGB", (r, g, b))
-        
-        if noise_level > 0:
-            for _ in range(int(10 * noise_level)):
-                block_x = random.randint(0, small_size[0] - 3)
-                block_y = random.randint(0, small_size[1] - 3)
-                block_w = random.randint(1, 6)
-                block_h = random.randint(1, 6)
-                
-                block = result.crop((block_x, block_y, block_x + block_w, block_y + block_h))
-                shift_x = random.randint(-3, 3)
-                result.paste(block, (block_x + shift_x, block_y))
-
-        result = result.resize((width, height), Image.NEAREST)
-        
-        return result
+        return Image.fromarray(result).resize((width, height), Image.NEAREST)
 
     def get_available_styles(self):
         """Return a list of available style names"""
@@ -143,4 +233,245 @@ class ArtStyleProcessor:
         """Return the description for a style"""
         if style_name in self.styles:
             return self.styles[style_name].get("description", "No description available")
-        return "Style not found"
\ No newline at end of file
+        return "Style not found"
+
+
+class NumpyArtStyleProcessor(ArtStyleProcessor):
+    """
+    Style engine that works directly on BGR(A) NumPy arrays
+    
+    Produces the same looks as ArtStyleProcessor without the per-frame
+    BGR -> RGB -> PIL -> NumPy -> BGR conversions. Resizes use OpenCV's exact
+    nearest-neighbour mode, which samples the same pixels as PIL's NEAREST.
+    Full-size intermediates are written into the thread's buffer arena, so the
+    returned frame is the only full-size array allocated per frame.
+    """
+    
+    def process_image(self, img, style_name=None, custom_params=None):
+        """Process a BGR or BGRA image with the selected art style"""
+        style_kind, style_params = self._select_style(style_name, custom_params)
+        
+        if style_kind == "graph":
+            return self._apply_graph_style(img, style_params["pipeline"], style_params)
+        if style_kind == "faith":
+            result = self._apply_faith_style(img, style_params)
+        elif style_kind == "classic_pixel":
+            result = self._apply_classic_pixel_style(img, style_params)
+        else:
+            result = self._apply_glitch_style(img, style_params)
+            
+        # result may be an arena buffer, so always hand back a new array
+        if len(img.shape) == 3 and img.shape[2] == 4:
+            return np.dstack((result, img[:, :, 3]))
+        return result.copy()
+        
+    def _pixelate(self, img, pixel_size):
+        """Shrink a BGR or BGRA frame to its pixel grid and return it as BGR"""
+        arena = get_arena()
+        height, width = img.shape[:2]
+        small_size = (max(1, width // pixel_size), max(1, height // pixel_size))
+        small = cv2.resize(img, small_size, dst=arena.get("pixelated", (small_size[1], small_size[0], img.shape[2])),
+                           interpolation=cv2.INTER_NEAREST_EXACT)
+        if small.shape[2] == 4:
+            small = cv2.cvtColor(small, cv2.COLOR_BGRA2BGR, dst=arena.get("pixelated_bgr", small.shape[:2] + (3,)))
+        return small
+        
+    def _upscale(self, img, width, height, name="upscaled"):
+        dst = get_arena().get(name, (height, width) + img.shape[2:])
+        return cv2.resize(img, (width, height), dst=dst, interpolation=cv2.INTER_NEAREST_EXACT)
+        
+    def _apply_faith_style(self, img, params):
+        """Apply Faith: The Unholy Trinity style to a BGR array"""
+        pixel_size = params.get("pixel_size", 4)
+        noise_level = params.get("noise_level", 0.2)
+        use_dithering = params.get("dithering", True)
+        dither_mode = params.get("dither_mode", "floyd_steinberg")
+        
+        arena = get_arena()
+        height, width = img.shape[:2]
+        pixelated = self._pixelate(img, pixel_size)
+        gray = grayscale(pixelated, dst=arena.get("gray", pixelated.shape[:2]))
+        
+        if use_dithering:
+            from dithering import dither
+            binary = dither(gray, dither_mode)
+        else:
+            _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY, dst=arena.get("binary", gray.shape))
+            
+        noise_mode = self._noise_mode(params, noise_level)
+        if noise_mode == "grid":
+            grid = cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR, dst=arena.get("grid_bgr", binary.shape + (3,)))
+            return self._upscale(self._add_noise(grid, noise_level, dst=grid), width, height)
+        
+        result = self._upscale(binary, width, height, "upscaled_gray")
+        if noise_mode == "mono":
+            result = self._add_noise(result, noise_level, dst=result)
+        result = cv2.cvtColor(result, cv2.COLOR_GRAY2BGR, dst=arena.get("upscaled", (height, width, 3)))
+        if noise_mode == "color":
+            result = self._add_noise(result, noise_level, dst=result)
+            
+        return result
+        
+    def _apply_classic_pixel_style(self, img, params):
+        """Apply classic pixel art style with limited color palette to a BGR array"""
+        pixel_size = params.get("pixel_size", 3)
+        
+        height, width = img.shape[:2]
+        pixelated = autocontrast(self._pixelate(img, pixel_size), cutoff=5)
+        
+        if params.get("palette"):
+            quantized = self._palette_lut(params["palette"], bgr=True).apply(pixelated)
+        else:
+            # Median cut splits and averages in channel order, so it has to see RGB
+            rgb = Image.fromarray(cv2.cvtColor(pixelated, cv2.COLOR_BGR2RGB))
+            quantized = cv2.cvtColor(np.asarray(rgb.quantize(16).convert('RGB')), cv2.COLOR_RGB2BGR)
+        
+        return self._upscale(quantized, width, height)
+        
+    def _apply_glitch_style(self, img, params):
+        """Apply glitch art style with digital artifacts to a BGR array"""
+        pixel_size = params.get("pixel_size", 2)
+        noise_level = params.get("noise_level", 0.5)
+        
+        height, width = img.shape[:2]
+        pixelated = self._pixelate(img, pixel_size)
+        
+        shift = int(width * params.get("grid_scale", 1) * 0.02)
+        result = rgb_shift(pixelated, shift, red=2, blue=0, out=get_arena().get("glitch", pixelated.shape))
+        displace_blocks(result, params.get("glitch_blocks", int(10 * noise_level)), self.noise.rng)
+                    
+        return self._upscale(result, width, height)
+
+
+class GraphArtStyleProcessor(NumpyArtStyleProcessor):
+    """
+    Style engine that runs every style as a compiled op pipeline
+    
+    The built-in effects are translated to their pipelines
+    (style_graph.legacy_pipeline) and compiled like styles defined with a
+    "pipeline" in config, so only the passes a style needs are run.
+    """
+    
+    def process_image(self, img, style_name=None, custom_params=None):
+        """Process a BGR or BGRA image with the selected art style"""
+        from style_graph import legacy_pipeline
+        
+        style_kind, style_params = self._select_style(style_name, custom_params)
+        steps = style_params["pipeline"] if style_kind == "graph" else legacy_pipeline(style_kind, style_params)
+        return self._apply_graph_style(img, steps, style_params)
+
+
+def rgb_shift(img, shift, red, blue, out=None):
+    """
+    Shift the red channel left and the blue channel right by shift pixels,
+    filling the uncovered columns with black
+    
+    red and blue are the channel indices, so this works on RGB and BGR arrays.
+    The result is written into out when given, else a new array.
+    """
+    height, width = img.shape[:2]
+    shift = min(shift, width)
+    if out is None:
+        out = np.empty_like(img)
+    green = 3 - red - blue
+    out[:, :, green] = img[:, :, green]
+    out[:, :width - shift, red] = img[:, shift:, red]
+    out[:, width - shift:, red] = 0
+    out[:, shift:, blue] = img[:, :width - shift, blue]
+    out[:, :shift, blue] = 0
+    return out
+
+
+def displace_blocks(img, count, rng, max_size=6, max_shift=3):
+    """
+    Glitch count random small blocks sideways, in place and in one indexing pass
+    
+    Each block is 1-max_size pixels on a side and moves up to max_shift pixels
+    left or right. Parts of a block past the right edge read as black and
+    parts moved off the frame are dropped. Every block is read before any is
+    written, so overlapping blocks do not copy each other's displaced pixels.
+    """
+    height, width = img.shape[:2]
+    if count <= 0 or height < 3 or width < 3:
+        return img
+    
+    xs = rng.integers(0, width - 2, count)[:, None, None]
+    ys = rng.integers(0, height - 2, count)[:, None, None]
+    block_w = rng.integers(1, max_size + 1, count)[:, None, None]
+    block_h = rng.integers(1, max_size + 1, count)[:, None, None]
+    shifts = rng.integers(-max_shift, max_shift + 1, count)[:, None, None]
+    
+    offsets = np.arange(max_size)
+    src_y = ys + offsets[None, :, None]
+    src_x = xs + offsets[None, None, :]
+    dst_x = src_x + shifts
+    keep = (offsets[None, :, None] < block_h) & (offsets[None, None, :] < block_w)
+    keep &= (src_y < height) & (dst_x >= 0) & (dst_x < width)
+    
+    src_y, src_x, dst_x = (np.broadcast_to(coords, keep.shape)[keep] for coords in (src_y, src_x, dst_x))
+    values = np.zeros((len(src_y),) + img.shape[2:], dtype=img.dtype)
+    inside = src_x < width
+    values[inside] = img[src_y[inside], src_x[inside]]
+    img[src_y, dst_x] = values
+    return img
+
+
+def grayscale(img, dst=None):
+    """
+    Gray plane of a BGR(A) array, rounded exactly like PIL's convert('L')
+    
+    PIL uses 16-bit fixed-point weights, which round differently from
+    cv2.cvtColor on some pixels; dithering would spread those differences.
+    """
+    weighted = img[:, :, 2].astype(np.uint32) * 19595
+    weighted += img[:, :, 1].astype(np.uint32) * 38470
+    weighted += img[:, :, 0].astype(np.uint32) * 7471 + 0x8000
+    weighted >>= 16
+    if dst is None:
+        return weighted.astype(np.uint8)
+    np.copyto(dst, weighted, casting="unsafe")
+    return dst
+
+
+def autocontrast(img, cutoff=0):
+    """NumPy equivalent of PIL's ImageOps.autocontrast, applied per channel"""
+    lut = autocontrast_tables(img, cutoff)
+    if img.ndim == 2:
+        return cv2.LUT(img, lut[:, 0])
+    return cv2.LUT(img, lut.reshape(1, 256, lut.shape[1]))
+
+
+def autocontrast_tables(img, cutoff=0):
+    """The (256, channels) lookup table autocontrast applies to img, one column per channel"""
+    channels = img.shape[2] if img.ndim == 3 else 1
+    lut = np.empty((256, channels), dtype=np.uint8)
+    levels = np.arange(256, dtype=np.float64)
+    
+    for channel in range(channels):
+        plane = img[:, :, channel] if img.ndim == 3 else img
+        hist = np.bincount(plane.ravel(), minlength=256)
+        cut = hist.sum() * cutoff // 100
+        low = int(np.argmax(np.cumsum(hist) > cut))
+        high = 255 - int(np.argmax(np.cumsum(hist[::-1]) > cut))
+        
+        if high <= low:
+            lut[:, channel] = levels
+        else:
+            scale = 255.0 / (high - low)
+            lut[:, channel] = np.clip((levels * scale - low * scale).astype(np.int64), 0, 255)
+    return lut
+
+
+STYLE_ENGINES = {
+    "pil": ArtStyleProcessor,
+    "numpy": NumpyArtStyleProcessor,
+    "graph": GraphArtStyleProcessor,
+}
+
+def create_art_processor(config):
+    """Build the style processor selected by the "style_engine" config key"""
+    engine = config.get("style_engine", "pil")
+    if engine not in STYLE_ENGINES:
+        print(f"Style engine {engine} not found, using pil", file=sys.stderr)
+        engine = "pil"
+    return STYLE_ENGINES[engine](config)
@@ -0,0 +1,361 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import current_rss, percentile
+from output_formats import OUTPUT_FORMATS
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESOLUTIONS = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+
+class PeakRSSSampler:
+    """Sample RSS on a background thread and keep the peak seen while the block runs"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = current_rss()
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def summarize(stage, resolution, alpha, latencies, total_seconds, peak_rss, style=None):
+    frames = len(latencies)
+    return {
+        "stage": stage,
+        "style": style,
+        "resolution": resolution,
+        "alpha": alpha,
+        "frames": frames,
+        "seconds": total_seconds,
+        "fps": frames / total_seconds if total_seconds else None,
+        "latency_ms": {
+            "mean": sum(latencies) / frames * 1000 if frames else None,
+            "p50": percentile(latencies, 50) * 1000 if frames else None,
+            "p90": percentile(latencies, 90) * 1000 if frames else None,
+            "p99": percentile(latencies, 99) * 1000 if frames else None,
+        },
+        "peak_rss_mb": peak_rss / 1024 ** 2 if peak_rss else None,
+    }
+
+
+def make_synthetic_video(path, size, frame_count, fps):
+    """Render a deterministic moving test pattern with ffmpeg's lavfi source"""
+    width, height = size
+    command = ['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi',
+               '-i', f'testsrc2=size={width}x{height}:rate={fps}',
+               '-frames:v', str(frame_count), '-pix_fmt', 'yuv420p', path]
+    subprocess.run(command, check=True)
+
+
+def make_synthetic_frames(size, frame_count, alpha, seed=0):
+    """Smooth gradients plus noise, with an elliptical alpha mask like rembg output when alpha is set"""
+    import numpy as np
+
+    width, height = size
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width]
+    frames = []
+    for index in range(frame_count):
+        phase = index / max(frame_count, 1)
+        base = np.stack([
+            (xs * 255 / width + phase * 255) % 256,
+            (ys * 255 / height) % 256,
+            ((xs + ys) * 127 / (width + height) + phase * 64) % 256,
+        ], axis=2)
+        frame = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+        if alpha:
+            mask = (((xs - width / 2) / (width * 0.35)) ** 2 + ((ys - height / 2) / (height * 0.4)) ** 2) <= 1
+            frame = np.dstack((frame, (mask * 255).astype(np.uint8)))
+        frames.append(frame)
+    return frames
+
+
+def time_per_frame(func, frames):
+    latencies = []
+    with PeakRSSSampler() as sampler:
+        start_time = time.perf_counter()
+        for frame in frames:
+            frame_start = time.perf_counter()
+            func(frame)
+            latencies.append(time.perf_counter() - frame_start)
+        total = time.perf_counter() - start_time
+    return latencies, total, sampler.peak
+
+
+def measure_allocations(func, frame):
+    """
+    Peak bytes allocated while processing one steady-state frame, from tracemalloc
+
+    With the buffer arena this should be close to the size of the returned frame.
+    """
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        func(frame)
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def seed_styles(core, seed):
+    """
+    Seed every random source the styles draw from
+
+    The styles' noise and glitches come from the processor's NoiseSource, which
+    has its own generator, so seeding random and np.random alone is not enough.
+    """
+    import numpy as np
+    from noise import NoiseSource
+
+    random.seed(seed)
+    np.random.seed(seed)
+    core.art_processor.noise = NoiseSource(seed, use_bank=core.config.get("noise_bank", True))
+
+
+def bench_styles(core, resolution, size, frame_count, styles, seed=0):
+    from buffers import arena_stats
+
+    results = []
+    edge_threshold = core.config["edge_threshold"]
+    distortion_strength = core.config["distortion_strength"]
+    for alpha in (False, True):
+        frames = make_synthetic_frames(size, frame_count, alpha, seed)
+        for style in styles:
+            # Reseeded per style, so a style's frames do not depend on which styles ran before it
+            seed_styles(core, seed)
+            # Warm-up frame so JIT compilation and first-call setup are not measured
+            core.style_frame(frames[0], edge_threshold, distortion_strength, style)
+            allocations_before = arena_stats()["allocations"]
+            latencies, total, peak = time_per_frame(
+                lambda frame: core.style_frame(frame, edge_threshold, distortion_strength, style), frames)
+            stage = "apply_legacy_edge_detection" if style == "legacy_edge" else "process_image"
+            result = summarize(stage, resolution, alpha, latencies, total, peak, style=style)
+            # New scratch buffers after the warm-up frame; 0 means steady state reuses every intermediate
+            result["arena_allocations"] = arena_stats()["allocations"] - allocations_before
+            result["frame_alloc_peak_mb"] = measure_allocations(
+                lambda frame: core.style_frame(frame, edge_threshold, distortion_strength, style), frames[0]) / 1024 ** 2
+            results.append(result)
+    return results
+
+
+def bench_video_stages(core, resolution, size, frame_count, fps, work_dir, skip_rembg):
+    results = []
+    video_path = os.path.join(work_dir, f"synthetic_{resolution}.mp4")
+    make_synthetic_video(video_path, size, frame_count, fps)
+
+    frames_dir = os.path.join(work_dir, f"frames_{resolution}")
+    os.makedirs(frames_dir)
+    with PeakRSSSampler() as sampler:
+        start_time = time.perf_counter()
+        core.extract_frames(video_path, fps, frames_dir)
+        total = time.perf_counter() - start_time
+    extracted = len(os.listdir(frames_dir))
+    results.append(summarize("extract_frames", resolution, False, [total / max(extracted, 1)] * extracted,
+                             total, sampler.peak))
+
+    # The same decode into a memory-mapped raw frame store instead of PNG files
+    with PeakRSSSampler() as sampler:
+        start_time = time.perf_counter()
+        core.extract_frames(video_path, fps, os.path.join(work_dir, f"frames_{resolution}.raw"))
+        total = time.perf_counter() - start_time
+    results.append(summarize("extract_frames_raw", resolution, False, [total / max(extracted, 1)] * extracted,
+                             total, sampler.peak))
+
+    if not skip_rembg:
+        import cv2
+        frames = [cv2.imread(os.path.join(frames_dir, name)) for name in sorted(os.listdir(frames_dir))]
+        remover = core.get_remover()
+        remover.remove_frame(frames[0])
+        latencies, total, peak = time_per_frame(remover.remove_frame, frames)
+        results.append(summarize("remove_background", resolution, False, latencies, total, peak))
+
+    # One entry per output format, with the file size, so formats can be compared per deliverable
+    for format_name, extension in OUTPUT_FORMATS.items():
+        with PeakRSSSampler() as sampler:
+            start_time = time.perf_counter()
+            output = core.reassemble_video(frames_dir, fps, os.path.join(work_dir, f"reassembled_{resolution}{extension}"))
+            total = time.perf_counter() - start_time
+        stage = "reassemble_video" if format_name == "mp4" else f"reassemble_video_{format_name}"
+        result = summarize(stage, resolution, False, [total / max(extracted, 1)] * extracted, total, sampler.peak)
+        result["output_bytes"] = output["bytes"]
+        results.append(result)
+    return results
+
+
+STARTUP_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import gui_components
+seconds = time.perf_counter() - start
+heavy = [name for name in ("cv2", "rembg", "onnxruntime", "numba", "numpy") if name in sys.modules]
+print(json.dumps({"seconds": seconds, "heavy_modules": heavy}))
+"""
+
+def bench_startup(runs=5):
+    """Time importing the GUI package in fresh interpreters and list any heavy libraries it pulls in"""
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    heavy_modules = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_PROBE, app_dir], capture_output=True,
+                                text=True, check=True).stdout
+        probe = json.loads(output)
+        samples.append(probe["seconds"])
+        heavy_modules = probe["heavy_modules"]
+    return {
+        "stage": "startup_import",
+        "style": None,
+        "resolution": None,
+        "alpha": None,
+        "frames": runs,
+        "seconds": sum(samples),
+        "fps": None,
+        "latency_ms": {
+            "mean": sum(samples) / runs * 1000,
+            "p50": percentile(samples, 50) * 1000,
+            "p90": percentile(samples, 90) * 1000,
+            "p99": percentile(samples, 99) * 1000,
+        },
+        "peak_rss_mb": None,
+        "heavy_modules": heavy_modules,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result):
+    return (result["stage"], result["style"], result["resolution"], result["alpha"])
+
+
+def speed(result):
+    """Throughput for frame stages, inverse median latency for one-off stages like startup"""
+    if result.get("fps"):
+        return result["fps"]
+    p50 = result["latency_ms"]["p50"]
+    return 1000 / p50 if p50 else None
+
+
+def compare(baseline_path, results, threshold):
+    """Print stages that got slower by more than threshold percent; return the regressions"""
+    with open(baseline_path, "r") as f:
+        baseline = {result_key(result): result for result in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        old = baseline.get(result_key(result))
+        if not old or not speed(old) or not speed(result):
+            continue
+        change = (speed(result) - speed(old)) / speed(old) * 100
+        if change < -threshold:
+            regressions.append({"key": list(result_key(result)), "old_speed": speed(old),
+                                "new_speed": speed(result), "change_pct": change})
+            print(f"REGRESSION {result_key(result)}: {speed(old):.2f} -> {speed(result):.2f} per second ({change:+.1f}%)",
+                  file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage and style on synthetic input")
+    parser.add_argument("--resolutions", nargs="+", default=["480p", "1080p", "4k"], choices=sorted(RESOLUTIONS))
+    parser.add_argument("--frames", type=int, default=24, help="Frames per resolution")
+    parser.add_argument("--fps", type=int, default=12)
+    parser.add_argument("--styles", nargs="+", help="Styles to measure (default: all, including legacy_edge)")
+    parser.add_argument("--skip-video", action="store_true", help="Skip the ffmpeg extract/reassemble stages")
+    parser.add_argument("--skip-rembg", action="store_true", help="Skip background removal (needs the model)")
+    parser.add_argument("--skip-startup", action="store_true", help="Skip the GUI cold-start import timing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args(argv)
+
+    args.output = os.path.abspath(args.output)
+    if args.compare:
+        args.compare = os.path.abspath(args.compare)
+    if not os.path.exists("config.json"):
+        os.chdir(PROJECT_DIR)
+
+    import core
+
+    seed_styles(core, args.seed)
+    styles = args.styles or core.get_available_styles()
+
+    results = []
+    if not args.skip_startup:
+        results.append(bench_startup())
+    with tempfile.TemporaryDirectory(prefix="converter_bench_") as work_dir:
+        for resolution in args.resolutions:
+            size = RESOLUTIONS[resolution]
+            print(f"Benchmarking {resolution}...", file=sys.stderr)
+            results += bench_styles(core, resolution, size, args.frames, styles, args.seed)
+            if not args.skip_video:
+                results += bench_video_stages(core, resolution, size, args.frames, args.fps, work_dir, args.skip_rembg)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "style_engine": core.config.get("style_engine", "pil"),
+            "frames": args.frames,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.compare:
+        report["regressions"] = compare(args.compare, results, args.threshold)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for result in results:
+        print(f"{result['stage']:<28} {result['style'] or '':<14} {result['resolution'] or '':<6} "
+              f"alpha={str(result['alpha']):<5} {result['fps'] or 0:8.2f} fps  "
+              f"p50={result['latency_ms']['p50'] or 0:8.2f} ms  p99={result['latency_ms']['p99'] or 0:8.2f} ms"
+              + (f"  alloc={result['frame_alloc_peak_mb']:.1f} MB/frame" if "frame_alloc_peak_mb" in result else ""),
+              file=sys.stderr)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+# Input normalization (mean, std, size) used by rembg for models whose
+# preprocessing can be reproduced for batched inference
+BATCH_MODEL_PARAMS = {
+    "u2net": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2netp": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2net_human_seg": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "silueta": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "isnet-general-use": ((0.5, 0.5, 0.5), (1.0, 1.0, 1.0), (1024, 1024)),
+}
+
+
+class BackgroundRemover:
+    """
+    Managed rembg engine that owns a small pool of warm ONNX sessions
+
+    Sessions are created once and reused for every frame and every job, so the
+    model load cost is only paid the first time. With more than one session,
+    several frames can be inferred concurrently (onnxruntime releases the GIL).
+    """
+
+    def __init__(self, model_name="u2net", pool_size=1):
+        self.model_name = model_name
+        self.pool_size = max(1, pool_size)
+        self._sessions = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """Create every session in the pool up front"""
+        sessions = [self._acquire() for _ in range(self.pool_size)]
+        for session in sessions:
+            self._release(session)
+
+    def _acquire(self):
+        try:
+            return self._sessions.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                # rembg pulls in onnxruntime, so it is only imported once a session is needed
+                from rembg import new_session
+                try:
+                    return new_session(self.model_name)
+                except Exception:
+                    # Give the slot back so the next caller retries instead of waiting forever
+                    self._created -= 1
+                    raise
+        return self._sessions.get()
+
+    def _release(self, session):
+        self._sessions.put(session)
+
+    def remove(self, data):
+        """Remove the background from encoded image bytes or an RGB array"""
+        from rembg import remove
+        session = self._acquire()
+        try:
+            return remove(data, session=session)
+        finally:
+            self._release(session)
+
+    def remove_frame(self, frame):
+        """Remove the background from a BGR frame and return it as BGRA"""
+        rgba = self.remove(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        return cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGRA)
+
+    def supports_batching(self):
+        """Whether frames can be stacked into a single inference call for this model"""
+        if self.model_name not in BATCH_MODEL_PARAMS:
+            return False
+        session = self._acquire()
+        try:
+            batch_dim = session.inner_session.get_inputs()[0].shape[0]
+        finally:
+            self._release(session)
+        return not isinstance(batch_dim, int) or batch_dim != 1
+
+    def remove_frames(self, frames, batch_size=1):
+        """
+        Remove the background from a list of BGR frames, returning BGRA frames
+        
+        With batch_size > 1 the frames are resized to the model input size and
+        stacked into one tensor per batch, so each batch is a single onnxruntime
+        call. Models that cannot be batched fall back to one call per frame.
+        """
+        if batch_size <= 1 or not self.supports_batching():
+            return self.map(self.remove_frame, frames)
+        batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+        results = []
+        for batch_result in self.map(self._remove_batch, batches):
+            results.extend(batch_result)
+        return results
+
+    def _remove_batch(self, frames):
+        mean, std, size = BATCH_MODEL_PARAMS[self.model_name]
+        mean = np.array(mean, dtype=np.float32)
+        std = np.array(std, dtype=np.float32)
+        
+        tensor = np.empty((len(frames), 3, size[1], size[0]), dtype=np.float32)
+        for i, frame in enumerate(frames):
+            rgb = cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_LANCZOS4), cv2.COLOR_BGR2RGB)
+            rgb = rgb.astype(np.float32) / max(float(rgb.max()), 1e-6)
+            tensor[i] = ((rgb - mean) / std).transpose(2, 0, 1)
+        
+        session = self._acquire()
+        try:
+            inner = session.inner_session
+            predictions = inner.run(None, {inner.get_inputs()[0].name: tensor})[0][:, 0, :, :]
+        finally:
+            self._release(session)
+        
+        results = []
+        for frame, pred in zip(frames, predictions):
+            low, high = pred.min(), pred.max()
+            pred = (pred - low) / max(high - low, 1e-6)
+            mask = cv2.resize((pred * 255).astype(np.uint8), (frame.shape[1], frame.shape[0]),
+                              interpolation=cv2.INTER_LANCZOS4)
+            cutout = cv2.multiply(frame, cv2.merge((mask, mask, mask)), scale=1 / 255)
+            results.append(cv2.merge((*cv2.split(cutout), mask)))
+        return results
+
+    def map(self, func, items):
+        """Run func over items using one thread per pooled session, preserving order"""
+        if self.pool_size == 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            return list(executor.map(func, items))
+
+
+_removers = {}
+_removers_lock = threading.Lock()
+
+def get_background_remover(model_name="u2net", pool_size=1):
+    """Return the process-wide remover for a model, creating it on first use"""
+    with _removers_lock:
+        remover = _removers.get(model_name)
+        if remover is None:
+            remover = BackgroundRemover(model_name, pool_size)
+            _removers[model_name] = remover
+        elif remover.pool_size < pool_size:
+            remover.pool_size = pool_size
+        return remover
@@ -0,0 +1,71 @@
+import weakref
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class BufferArena:
+    """
+    Scratch arrays reused across frames, keyed by name, shape and dtype
+
+    Kernels ask for their intermediates with get() and write into them with
+    dst=/out= arguments, so once every frame size has been seen a video is
+    processed without allocating new intermediates. An array handed out by
+    get() is overwritten the next time the same key is requested, so it must
+    never be returned to a caller that keeps it. Only the max_buffers most
+    recently used buffers are kept, so changing frame sizes cannot grow the
+    arena without bound.
+    """
+
+    def __init__(self, max_buffers=32):
+        self.max_buffers = max_buffers
+        self._buffers = OrderedDict()
+        self.allocations = 0
+        self.requests = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        key = (name, tuple(shape), np.dtype(dtype).str)
+        self.requests += 1
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[key] = buffer
+            self.allocations += 1
+            while len(self._buffers) > self.max_buffers:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(key)
+        return buffer
+
+    def clear(self):
+        self._buffers.clear()
+
+    def stats(self):
+        return {
+            "buffers": len(self._buffers),
+            "bytes": sum(buffer.nbytes for buffer in self._buffers.values()),
+            "allocations": self.allocations,
+            "requests": self.requests,
+        }
+
+
+_local = threading.local()
+# Weak, so a thread's buffers are freed when the thread exits
+_arenas = weakref.WeakSet()
+_arenas_lock = threading.Lock()
+
+def get_arena():
+    """Return this thread's arena, so concurrent renders never share scratch buffers"""
+    arena = getattr(_local, "arena", None)
+    if arena is None:
+        arena = _local.arena = BufferArena()
+        with _arenas_lock:
+            _arenas.add(arena)
+    return arena
+
+
+def arena_stats():
+    """Buffer counts, bytes held and allocations summed over every thread's arena in this process"""
+    with _arenas_lock:
+        stats = [arena.stats() for arena in list(_arenas)]
+    return {key: sum(stat[key] for stat in stats) for key in ("buffers", "bytes", "allocations", "requests")}
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+def params_hash(params):
+    """Stable SHA-256 of a JSON-serializable parameter set"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def video_stamp(video_path):
+    """Cheap identity of the input video: absolute path, size and mtime"""
+    stat = os.stat(video_path)
+    return f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+class JobCheckpoint:
+    """
+    Manifest of which frames have finished which stage of one job
+
+    Each stage is recorded with a hash of its parameters chained to the hash of
+    the stage before it, so changing fps invalidates every later stage while
+    changing the style only invalidates styling and encoding. Finishing a frame
+    in one stage marks it stale in every later stage. Done frames are kept as
+    a set per stage and only sorted into the manifest when it is written,
+    atomically and at most every save_interval seconds, so a crash only costs
+    the frames finished since the last save.
+    """
+
+    def __init__(self, path, save_interval=1.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        self._order = []
+        self._stores = {}
+        self._data = self._load()
+        self._frames = {name: set(entry["frames"]) for name, entry in self._data["stages"].items()}
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if isinstance(data.get("stages"), dict):
+                return data
+        except (OSError, ValueError):
+            pass
+        return {"stages": {}}
+
+    def stage(self, name, params, output_dir=None):
+        """Open a stage; its recorded progress is kept only if the chained params hash matches"""
+        previous = self._data["stages"].get(self._order[-1]) if self._order else None
+        digest = params_hash({"params": params, "previous": previous["params"] if previous else None})
+        with self._lock:
+            if name in self._order:
+                self._order = self._order[:self._order.index(name)]
+            self._order.append(name)
+            if output_dir is not None and not isinstance(output_dir, str):
+                self._stores[name] = output_dir
+            entry = self._data["stages"].get(name)
+            if not entry or entry["params"] != digest:
+                self._data["stages"][name] = {"params": digest, "frames": [], "complete": False}
+                self._frames[name] = set()
+                self._save()
+        return StageCheckpoint(self, name, output_dir)
+
+    def _mark_done(self, name, file_names):
+        with self._lock:
+            stages = self._data["stages"]
+            self._frames[name].update(file_names)
+            for later in self._order[self._order.index(name) + 1:]:
+                if later in stages:
+                    self._frames[later].difference_update(file_names)
+                    stages[later]["complete"] = False
+            if time.perf_counter() - self._last_save >= self.save_interval:
+                self._save()
+
+    def _complete(self, name):
+        with self._lock:
+            self._data["stages"][name]["complete"] = True
+            self._save()
+
+    def _save(self):
+        # Frame stores index their frames lazily; write the index before recording the frames as done
+        for store in self._stores.values():
+            store.flush()
+        for name, entry in self._data["stages"].items():
+            entry["frames"] = sorted(self._frames[name])
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self._data, f)
+        os.replace(self.path + ".tmp", self.path)
+        self._last_save = time.perf_counter()
+
+    def delete(self):
+        """Forget the job, e.g. once its outputs are final"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class StageCheckpoint:
+    """Progress of one stage within a JobCheckpoint"""
+
+    def __init__(self, checkpoint, name, output_dir=None):
+        self.checkpoint = checkpoint
+        self.name = name
+        self.output_dir = output_dir
+
+    def _has_output(self, file_name):
+        """Whether the frame's output exists; output_dir is a folder or a frame store"""
+        if not self.output_dir:
+            return True
+        if isinstance(self.output_dir, str):
+            return os.path.exists(os.path.join(self.output_dir, file_name))
+        return self.output_dir.has(file_name)
+
+    def pending(self, file_names):
+        """File names not yet done in this stage, or whose output has gone missing"""
+        with self.checkpoint._lock:
+            done = set(self.checkpoint._frames[self.name])
+        return [file_name for file_name in file_names if file_name not in done or not self._has_output(file_name)]
+
+    def mark_done(self, *file_names):
+        self.checkpoint._mark_done(self.name, file_names)
+
+    def is_complete(self):
+        """True once the whole stage has finished with the current params and its frames are still on disk"""
+        with self.checkpoint._lock:
+            complete = self.checkpoint._data["stages"][self.name]["complete"]
+            done = list(self.checkpoint._frames[self.name])
+        if not complete:
+            return False
+        return all(self._has_output(file_name) for file_name in done)
+
+    def complete(self):
+        self.checkpoint._complete(self.name)
@@ -0,0 +1,260 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import JobMetrics
+from output_formats import OUTPUT_FORMATS
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_manifest(manifest_path):
+    """
+    Load jobs from a JSON list or a CSV file
+
+    Each job needs a "video" and may set "output", "style", "fps",
+    "edge_threshold", "distortion_strength" and "custom_params". In CSV files
+    custom_params and edge_threshold are JSON-encoded cells.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    if manifest_path.lower().endswith(".csv"):
+        with open(manifest_path, "r", newline="") as f:
+            jobs = [{key: value for key, value in row.items() if value not in (None, "")}
+                    for row in csv.DictReader(f)]
+        for job in jobs:
+            for key in ("custom_params", "edge_threshold"):
+                if key in job:
+                    job[key] = json.loads(job[key])
+            for key in ("fps", "distortion_strength"):
+                if key in job:
+                    job[key] = float(job[key]) if "." in job[key] else int(job[key])
+    else:
+        with open(manifest_path, "r") as f:
+            jobs = json.load(f)
+        if isinstance(jobs, dict):
+            jobs = jobs["jobs"]
+
+    for job in jobs:
+        job["video"] = os.path.join(base_dir, job["video"])
+        if job.get("output"):
+            job["output"] = os.path.join(base_dir, job["output"])
+    return jobs
+
+
+def build_jobs(args, config):
+    """Combine manifest jobs and positional videos, filling unset fields from the command line and config"""
+    jobs = load_manifest(args.manifest) if args.manifest else []
+    jobs += [{"video": video} for video in args.videos]
+
+    custom_params = json.loads(args.custom_params) if args.custom_params else None
+    extension = OUTPUT_FORMATS[args.format or config.get("output_format", "mp4")]
+    used_outputs = {job["output"] for job in jobs if job.get("output")}
+    for job in jobs:
+        job.setdefault("style", args.style or config.get("default_style", "faith"))
+        job.setdefault("fps", args.fps or config["fps"])
+        job.setdefault("edge_threshold", config["edge_threshold"])
+        job.setdefault("distortion_strength", config["distortion_strength"])
+        if custom_params is not None:
+            job.setdefault("custom_params", custom_params)
+        if not job.get("output"):
+            name = os.path.splitext(os.path.basename(job["video"]))[0]
+            output = os.path.join(args.output_dir, name + "_final" + extension)
+            suffix = 2
+            while output in used_outputs:
+                output = os.path.join(args.output_dir, f"{name}_{suffix}_final{extension}")
+                suffix += 1
+            used_outputs.add(output)
+            job["output"] = output
+    return jobs
+
+
+def run_staged(job, work_dir, batch_size, low_res, metrics, resume=False):
+    """
+    Run the staged pipeline for one job inside work_dir and return the frame count
+
+    Intermediate frames are PNG folders or raw frame stores, per the
+    frame_store config key (see core.open_stage_stores). With resume a checkpoint manifest is kept in work_dir, so running the same
+    job again only processes frames that are missing or stale.
+    """
+    import core
+
+    style_name, custom_params = job["style"], job.get("custom_params")
+    pixel_size, noise_level = 1, 0
+    plan = core.plan_low_res(style_name, custom_params) if low_res else None
+    if plan:
+        pixel_size, custom_params, noise_level = plan
+        style_name = "custom"
+
+    frames_dir, nobg_dir, processed_dir = core.open_stage_stores(
+        work_dir, capacity=core.probe_frame_count(job["video"], job["fps"]))
+
+    stages = {}
+    if resume:
+        stages = core.open_checkpoint(os.path.join(work_dir, "checkpoint.json"), job["video"], job["fps"],
+                                      frames_dir, nobg_dir, processed_dir, job["output"], job["edge_threshold"],
+                                      job["distortion_strength"], style_name, custom_params, pixel_size, noise_level)
+
+    if not stages.get("extract_frames") or not stages["extract_frames"].is_complete():
+        core.extract_frames(job["video"], job["fps"], frames_dir, metrics, pixel_size)
+        if stages:
+            stages["extract_frames"].mark_done(*frames_dir.names())
+            stages["extract_frames"].complete()
+    if not stages.get("remove_background") or not stages["remove_background"].is_complete():
+        core.remove_background(frames_dir, nobg_dir, batch_size, metrics, stages.get("remove_background"))
+    if not stages.get("apply_converter_style") or not stages["apply_converter_style"].is_complete():
+        core.apply_converter_style(nobg_dir, job["edge_threshold"], job["distortion_strength"], processed_dir,
+                                   style_name, custom_params, core.config.get("style_workers", 1), metrics,
+                                   stages.get("apply_converter_style"))
+    encode_stage = stages.get("reassemble_video")
+    if not encode_stage or not encode_stage.is_complete() or not os.path.exists(job["output"]):
+        core.reassemble_video(processed_dir, job["fps"], job["output"], metrics, pixel_size, noise_level,
+                              core.probe_video(job["video"]) if plan else None)
+        if encode_stage:
+            encode_stage.complete()
+    return len(processed_dir.names())
+
+
+def run_job(job, mode, batch_size, low_res=False, work_dir=None, segment_options=None):
+    """Run one job and return its machine-readable result"""
+    import core
+    import segments
+
+    result = {
+        "video": job["video"],
+        "output": job["output"],
+        "style": job["style"],
+        "fps": job["fps"],
+        "mode": mode,
+        "status": "ok",
+    }
+    metrics = JobMetrics(os.path.basename(job["output"]))
+    start_time = time.perf_counter()
+    try:
+        if mode == "stream":
+            result["frames"] = core.process_video_stream(
+                job["video"], job["fps"], job["output"], job["edge_threshold"], job["distortion_strength"],
+                job["style"], job.get("custom_params"), batch_size=batch_size, metrics=metrics, low_res=low_res
+            )
+        elif mode == "segmented":
+            result["frames"] = segments.process_video_segmented(
+                job["video"], job["fps"], job["output"], job["edge_threshold"], job["distortion_strength"],
+                job["style"], job.get("custom_params"), batch_size=batch_size, metrics=metrics, low_res=low_res,
+                **(segment_options or {})
+            )
+        elif work_dir:
+            job_dir = os.path.join(work_dir, os.path.splitext(os.path.basename(job["output"]))[0])
+            result["frames"] = run_staged(job, job_dir, batch_size, low_res, metrics, resume=True)
+        else:
+            with tempfile.TemporaryDirectory(prefix="converter_") as temp_dir:
+                result["frames"] = run_staged(job, temp_dir, batch_size, low_res, metrics)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+        result["traceback"] = traceback.format_exc()
+
+    result["seconds"] = time.perf_counter() - start_time
+    if result.get("frames"):
+        result["frames_per_second"] = result["frames"] / result["seconds"]
+    if metrics.outputs:
+        output = metrics.outputs[-1]
+        result["output_format"] = output["format"]
+        result["output_bytes"] = output["bytes"]
+        result["encode_seconds"] = output["encode_seconds"]
+    result["metrics"] = metrics.summary()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert videos to pixel art without the GUI")
+    parser.add_argument("videos", nargs="*", help="Video files to convert")
+    parser.add_argument("--manifest", help="JSON or CSV job manifest with per-job style, fps and custom params")
+    parser.add_argument("--style", help="Style for jobs that do not set one (default: config default_style)")
+    parser.add_argument("--fps", type=int, help="Frame rate for jobs that do not set one (default: config fps)")
+    parser.add_argument("--custom-params", help="JSON custom style parameters for jobs that do not set them")
+    parser.add_argument("--output-dir", default="final_videos", help="Where to write videos for jobs without an output")
+    parser.add_argument("--format", choices=tuple(OUTPUT_FORMATS),
+                        help="Output format for jobs without an output path (default: config output_format); "
+                             "gif, webp and apng keep the background-removed alpha")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of jobs to run concurrently")
+    parser.add_argument("--mode", choices=("stream", "staged", "segmented"), default="stream",
+                        help="stream keeps frames in memory; staged writes PNG folders to a temp dir; "
+                             "segmented streams time segments in parallel worker processes and joins them")
+    parser.add_argument("--batch-size", type=int, help="Background removal batch size (default: config rembg_batch_size)")
+    parser.add_argument("--low-res", action="store_true", default=None,
+                        help="Style frames at pixel-grid size and upscale at encode (default: config low_res_mode)")
+    parser.add_argument("--work-dir",
+                        help="Keep staged-mode frames and a resume checkpoint per job here instead of a temp dir, "
+                             "so re-running an interrupted job only redoes missing frames")
+    parser.add_argument("--segment-seconds", type=float,
+                        help="Segment length in segmented mode (default: config segment_seconds)")
+    parser.add_argument("--segment-workers", type=int,
+                        help="Local worker processes in segmented mode, 0 for one per core "
+                             "(default: config segment_workers)")
+    parser.add_argument("--queue-dir",
+                        help="Segment queue directory for segmented mode; workers on other hosts that see it "
+                             "can help with \"python app/segments.py <queue-dir>\" (default: a temp dir)")
+    parser.add_argument("--report", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    if not args.videos and not args.manifest:
+        parser.error("give at least one video or a --manifest")
+
+    # Resolve every user path before moving to the project directory, where core finds config.json
+    args.videos = [os.path.abspath(video) for video in args.videos]
+    if args.manifest:
+        args.manifest = os.path.abspath(args.manifest)
+    args.output_dir = os.path.abspath(args.output_dir)
+    report_path = os.path.abspath(args.report) if args.report else None
+    work_dir = os.path.abspath(args.work_dir) if args.work_dir else None
+    segment_options = {
+        "segment_seconds": args.segment_seconds,
+        "workers": args.segment_workers,
+        "queue_dir": os.path.abspath(args.queue_dir) if args.queue_dir else None,
+    }
+    if not os.path.exists("config.json"):
+        os.chdir(PROJECT_DIR)
+
+    import core
+
+    jobs = build_jobs(args, core.config)
+    concurrency = max(1, min(args.jobs, len(jobs)))
+    batch_size = args.batch_size or core.config.get("rembg_batch_size", 1)
+    low_res = args.low_res if args.low_res is not None else core.config.get("low_res_mode", False)
+
+    # One warm model pool shared by every job, with a session per concurrent job
+    core.config["rembg_sessions"] = max(core.config.get("rembg_sessions", 1), concurrency)
+    try:
+        core.get_remover().warm_up()
+    except Exception as e:
+        # Every job reports the failure itself when it tries to load the model
+        print(f"Background removal warm-up failed: {e}", file=sys.stderr)
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda job: run_job(job, args.mode, batch_size, low_res, work_dir,
+                                                           segment_options), jobs))
+
+    report = {
+        "jobs": results,
+        "succeeded": sum(result["status"] == "ok" for result in results),
+        "failed": sum(result["status"] != "ok" for result in results),
+        "seconds": time.perf_counter() - start_time,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if report_path:
+        with open(report_path, "w") as f:
+            f.write(output)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,115 +1,808 @@
 import os
 import json
+import math
+import random
 import subprocess
+import time
 import cv2
 import numpy as np
 import shutil
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
 from PIL import Image
-from rembg import remove
-from art_styles import ArtStyleProcessor
+from bg_removal import get_background_remover
+from frame_cache import FrameCache
+from checkpoint import JobCheckpoint, video_stamp
+from art_styles import create_art_processor
+from metrics import NullMetrics
+from buffers import get_arena
+from dedup import FrameDeduper, find_duplicates
+from output_formats import output_format, keeps_alpha, encode_args
+from frame_store import open_frame_store
+from pipeline import PipelineStage, run_pipeline
+import style_catalog
 
 
 with open("config.json", "r") as f:
     config = json.load(f)
 
-art_processor = ArtStyleProcessor(config)
+art_processor = create_art_processor(config)
 
-def extract_frames(video_path, fps, output_dir):
-    command = f'ffmpeg -i "{video_path}" -vf "fps={fps}" "{output_dir}/frame_%04d.png"'
-    subprocess.run(command, shell=True)
+def extract_frames(video_path, fps, output_dir, metrics=None, pixel_size=1):
+    """
+    Decode the video's frames into output_dir, a PNG folder or a frame store
+    
+    Frames are filled from the raw decode pipe (see iter_video_frames), so
+    raw frames are never compressed, and fingerprinted for dedup on the way
+    (see find_duplicate_frames). With dedup_frames off, ffmpeg writes
+    full-size PNG folders itself.
+    """
+    store = open_frame_store(output_dir)
+    total_frames = probe_frame_count(video_path, fps) if metrics else None
+    metrics = metrics or NullMetrics()
+    deduper = FrameDeduper(config.get("dedup_threshold", 12)) if config.get("dedup_frames", True) else None
+    with metrics.stage("extract_frames", total_frames):
+        if store.kind == "png" and pixel_size <= 1 and not deduper:
+            command = f'ffmpeg -i "{video_path}" -vf "{_decode_filter(fps)}" "{store.directory}/frame_%04d.png"'
+            _run_ffmpeg(command, metrics)
+            return
+        sources = {}
+        source = None
+        for index, frame in enumerate(iter_video_frames(video_path, fps, pixel_size), start=1):
+            file_name = f"frame_{index:04d}.png"
+            store.write(file_name, frame)
+            if deduper:
+                if not deduper.is_duplicate(frame):
+                    source = file_name
+                sources[file_name] = source
+            metrics.frame_done()
+        store.flush()
+        if deduper:
+            _save_duplicates(store, sources)
 
-def remove_background(input_dir, output_dir):
-    for file_name in os.listdir(input_dir):
-        if not file_name.lower().endswith(('.png', '.jpg', '.jpeg')):
-            continue
+def _decode_filter(fps, start=0):
+    """
+    ffmpeg filter that samples frames at fps
+    
+    With start > 0 frames before start seconds are dropped after sampling, so
+    a segment keeps the frame grid of a decode from the beginning.
+    """
+    filters = [f"fps={fps}"]
+    if start > 0:
+        filters.append(f"select=gte(t\\,{start - 0.5 / fps:.6f})")
+    return ",".join(filters)
 
-        img_path = os.path.join(input_dir, file_name)
-        output_path = os.path.join(output_dir, file_name)
+def _encode_filter(upscale=1, format_name="mp4", pad=None):
+    """
+    ffmpeg filter that restores full size from pixel-grid frames in one integer
+    nearest-neighbour upscale, or None when frames need no filtering
+    
+    Full-size grid frames can have odd sizes, which yuv420p cannot hold, so
+    formats without alpha are padded to even sizes. pad defaults to
+    upscale > 1; pass it for grid frames that were already upscaled.
+    """
+    filters = [f"scale=iw*{upscale}:ih*{upscale}:flags=neighbor"] if upscale > 1 else []
+    if (upscale > 1 if pad is None else pad) and not keeps_alpha(format_name):
+        filters.append("pad=ceil(iw/2)*2:ceil(ih/2)*2")
+    return ",".join(filters) or None
 
-        with open(img_path, "rb") as inp_file:
-            img_data = inp_file.read()
+def _exact_upscale_size(grid_shape, upscale, size=None, noise_level=0):
+    """
+    Full (width, height) to upscale pixel-grid frames to in Python, or None
+    when ffmpeg's integer upscale gives the same frames
+    
+    size is the source frame size; when it is not a multiple of upscale the
+    grid is stretched back to it the way the full-size styles do.
+    """
+    if upscale <= 1:
+        return None
+    scaled = (grid_shape[1] * upscale, grid_shape[0] * upscale)
+    size = tuple(size) if size else scaled
+    return size if noise_level > 0 or size != scaled else None
 
-        output_data = remove(img_data)
+def upscale_with_noise(frame, size, noise_level=0):
+    """
+    Upscale a pixel-grid frame to size (width, height) and add the color noise
+    its style adds at full size
+    
+    The upscale is the full-size styles' own nearest-neighbour resize. The
+    noise matches ArtStyleProcessor's: a saturating add of uniform noise in
+    [0, noise_level * 255) to every color channel of every full-size pixel, so
+    it only brightens and white stays white. Alpha stays noise-free. Returns
+    a buffer from the thread's arena.
+    """
+    arena = get_arena()
+    width, height = size
+    upscaled = cv2.resize(frame, (width, height), dst=arena.get("encode_upscaled", (height, width) + frame.shape[2:]),
+                          interpolation=cv2.INTER_NEAREST_EXACT)
+    if noise_level <= 0:
+        return upscaled
+    if upscaled.shape[2] == 3:
+        return art_processor._add_noise(upscaled, noise_level, dst=upscaled)
+    color = cv2.cvtColor(upscaled, cv2.COLOR_BGRA2BGR, dst=arena.get("encode_color", (height, width, 3)))
+    upscaled[:, :, :3] = art_processor._add_noise(color, noise_level, dst=color)
+    return upscaled
 
-        with open(output_path, "wb") as out_file:
-            out_file.write(output_data)
+def plan_low_res(style_name, custom_params=None):
+    """
+    Plan running a style natively at its pixel-grid resolution
+    
+    Returns (pixel_size, native_params, noise_level): decode at 1/pixel_size,
+    style as "custom" with native_params, then upscale by pixel_size and add
+    noise_level color noise at encode time (see upscale_with_noise). Returns
+    None for styles without a pixel grid, and for faith styles with mono
+    noise, which the encoder cannot reproduce.
+    """
+    if style_name == "legacy_edge":
+        return None
+    style_kind, style_params = art_processor._select_style(style_name, custom_params)
+    if style_kind == "graph":
+        return art_processor.compile_style(style_params["pipeline"]).low_res_plan(style_params)
+    pixel_size = int(style_params.get("pixel_size", 1))
+    if pixel_size <= 1:
+        return None
+    color_mode = {"faith": "monochrome", "classic_pixel": "limited_palette", "glitch": "rgb_shift"}[style_kind]
+    native_params = dict(style_params, pixel_size=1, grid_scale=pixel_size, color_mode=color_mode)
+    noise_level = 0
+    # Grid noise is already per grid cell, so only full-size noise moves to the encoder
+    noise_mode = art_processor._noise_mode(style_params, style_params.get("noise_level", 0.2)) \
+        if style_kind == "faith" else None
+    if noise_mode == "mono":
+        return None
+    if noise_mode == "color":
+        noise_level = style_params.get("noise_level", 0.2)
+        native_params["noise_level"] = 0
+    return pixel_size, native_params, noise_level
 
-def apply_converter_style(input_dir, edge_threshold, distortion_strength, processed_dir, style_name=None, custom_params=None):
+def plan_palette(style_name, custom_params, sample_frames):
     """
-    Apply the selected art style to images
+    Give classic_pixel-type styles one palette shared by the whole video
     
-    This is a wrapper around the ArtStyleProcessor that maintains compatibility
-    with the existing code while adding new style options.
+    Returns (style_name, custom_params) to style with: unchanged for other
+    styles, when the params already carry a palette, or when shared_palette is
+    off in config; otherwise "custom" params with a palette sampled from
+    sample_frames (BGR(A) arrays, or a callable returning them).
+    """
+    if style_name == "legacy_edge" or not config.get("shared_palette", True):
+        return style_name, custom_params
+    style_kind, style_params = art_processor._select_style(style_name, custom_params)
+    if style_kind != "classic_pixel" or style_params.get("palette"):
+        return style_name, custom_params
+    frames = sample_frames() if callable(sample_frames) else sample_frames
+    if not frames:
+        return style_name, custom_params
+    palette = art_processor.sample_palette(frames, style_params)
+    return "custom", dict(style_params, color_mode="limited_palette", palette=palette)
+
+def _run_ffmpeg(command, metrics):
+    """
+    Run an ffmpeg shell command, forwarding its frame counter to metrics
+    
+    Outputs are overwritten without prompting, so a resumed stage can rewrite
+    frames or a video left behind by an interrupted run.
+    """
+    command = command.replace('ffmpeg ', 'ffmpeg -y -progress pipe:1 -nostats ', 1)
+    process = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.startswith('frame='):
+            metrics.advance_to(int(line.split('=')[1]))
+    process.wait()
+
+def probe_duration(video_path):
+    """Return the video's duration in seconds, or None if unknown"""
+    command = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', video_path]
+    try:
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        return float(output.strip())
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+
+def probe_frame_count(video_path, fps):
+    """Estimate how many frames decoding at fps will produce, or None if unknown"""
+    duration = probe_duration(video_path)
+    return math.ceil(duration * fps) if duration is not None else None
+
+def probe_video(video_path):
     """
-    for file_name in os.listdir(input_dir):
-        if not file_name.lower().endswith(('.png', '.jpg', '.jpeg')):
-            continue
+    Return the (width, height) of the first video stream as ffmpeg decodes it
+
+    ffmpeg applies the stream's rotation while decoding, so for clips rotated
+    by 90 or 270 degrees (portrait phone videos) the stored size is swapped.
+    """
+    command = ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+               '-show_entries', 'stream=width,height:stream_tags=rotate:stream_side_data=rotation',
+               '-of', 'json', video_path]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    stream = json.loads(output)["streams"][0]
+    rotation = stream.get("tags", {}).get("rotate")
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            rotation = side_data["rotation"]
+    width, height = int(stream["width"]), int(stream["height"])
+    if rotation and int(float(rotation)) % 180:
+        return height, width
+    return width, height
+
+def iter_video_frames(video_path, fps, pixel_size=1, start=0, frame_limit=None):
+    """
+    Decode a video into BGR NumPy frames through an ffmpeg rawvideo pipe
+    
+    Nothing is written to disk; each frame is read straight from ffmpeg's stdout.
+    With pixel_size > 1 frames are shrunk to the style's pixel grid with the
+    same nearest-neighbour sampling the styles use, so low-resolution runs
+    see exactly the pixels a full-size run would; ffmpeg's scaler does not
+    sample exactly. start (seconds) seeks the input before decoding and frame_limit stops after
+    that many frames, so a time segment can be decoded on its own. The seek
+    lands a second early and keeps the source timestamps, so the fps filter
+    picks the same source frames as it would decoding from the start.
+    """
+    width, height = probe_video(video_path)
+    grid_size = (max(1, width // pixel_size), max(1, height // pixel_size))
+    frame_bytes = width * height * 3
+    command = ['ffmpeg', '-v', 'error']
+    if start > 0:
+        command += ['-ss', f'{max(0.0, start - 1):.6f}', '-copyts', '-start_at_zero']
+    command += ['-i', video_path, '-vf', _decode_filter(fps, start)]
+    if frame_limit is not None:
+        command += ['-frames:v', str(frame_limit)]
+    command += ['-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1']
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    # Full-size frames are only kept when they are yielded, so grid runs reuse one read buffer
+    buffer = bytearray(frame_bytes) if pixel_size > 1 else None
+    try:
+        while True:
+            if pixel_size <= 1:
+                buffer = bytearray(frame_bytes)
+            if process.stdout.readinto(buffer) < frame_bytes:
+                break
+            frame = np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+            if pixel_size > 1:
+                frame = cv2.resize(frame, grid_size, interpolation=cv2.INTER_NEAREST_EXACT)
+            yield frame
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.terminate()
+        process.wait()
+
+def extract_frame_at(video_path, seconds):
+    """Decode the single frame at the given timestamp as a BGR NumPy array, or None past the end"""
+    width, height = probe_video(video_path)
+    command = ['ffmpeg', '-v', 'error', '-ss', f'{max(0.0, seconds):.3f}', '-i', video_path,
+               '-frames:v', '1', '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1']
+    output = subprocess.run(command, capture_output=True, check=True).stdout
+    if len(output) < width * height * 3:
+        return None
+    return np.frombuffer(output[:width * height * 3], dtype=np.uint8).reshape(height, width, 3)
+
+class VideoEncoder:
+    """
+    Encode BGR/BGRA NumPy frames by piping them into ffmpeg's stdin
+    
+    The output format follows final_video_path's extension (see
+    output_formats). Pixel-grid frames are upscaled by ffmpeg, or here when
+    noise_level adds full-size noise or size (the source frame size) is not a
+    multiple of upscale (see upscale_with_noise). seconds accumulates the
+    time spent preparing, writing and waiting on ffmpeg.
+    """
+    
+    def __init__(self, final_video_path, fps, upscale=1, noise_level=0, size=None):
+        self.final_video_path = final_video_path
+        self.fps = fps
+        self.format_name = output_format(final_video_path)
+        self.upscale = upscale
+        self.noise_level = noise_level if upscale > 1 else 0
+        self.size = size
+        self.exact_size = None
+        self.process = None
+        self.seconds = 0.0
+        
+    def _open(self, frame):
+        height, width = frame.shape[:2]
+        video_filter = _encode_filter(self.upscale, self.format_name)
+        self.exact_size = _exact_upscale_size(frame.shape, self.upscale, self.size, self.noise_level)
+        if self.exact_size:
+            width, height = self.exact_size
+            video_filter = _encode_filter(1, self.format_name, pad=True)
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        pix_fmt = {1: 'gray', 3: 'bgr24', 4: 'bgra'}[channels]
+        os.makedirs(os.path.dirname(self.final_video_path), exist_ok=True)
+        command = ['ffmpeg', '-y', '-v', 'error', '-f', 'rawvideo', '-pix_fmt', pix_fmt,
+                   '-s', f'{width}x{height}', '-framerate', str(self.fps), '-i', 'pipe:0']
+        command += encode_args(self.format_name, video_filter, config.get("gif_dither", "none"))
+        command.append(self.final_video_path)
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        
+    def write(self, frame):
+        start_time = time.perf_counter()
+        if self.process is None:
+            self._open(frame)
+        if self.exact_size:
+            frame = upscale_with_noise(frame, self.exact_size, self.noise_level)
+        self.process.stdin.write(np.ascontiguousarray(frame).data)
+        self.seconds += time.perf_counter() - start_time
+        
+    def close(self):
+        if self.process is not None:
+            start_time = time.perf_counter()
+            self.process.stdin.close()
+            self.process.wait()
+            self.process = None
+            self.seconds += time.perf_counter() - start_time
             
-        img_path = os.path.join(input_dir, file_name)
-        img = cv2.imread(img_path, cv2.IMREAD_UNCHANGED)
+    def __enter__(self):
+        return self
         
-        if style_name == "legacy_edge":
-            result = apply_legacy_edge_detection(img, edge_threshold, distortion_strength)
+    def __exit__(self, *exc_info):
+        self.close()
+
+def open_stage_stores(work_dir, names=("frames", "nobg", "processed"), capacity=0):
+    """
+    Frame stores for the staged pipeline's intermediate frames inside work_dir
+    
+    PNG folders by default. With frame_store set to "raw" in config each stage
+    gets one memory-mapped file preallocated for capacity frames instead (see
+    frame_store.RawFrameStore), which avoids compressing, listing and deleting
+    thousands of files; PNGs are then only written when frames are exported.
+    """
+    raw = config.get("frame_store", "png") == "raw"
+    stores = []
+    for name in names:
+        path = os.path.join(work_dir, name + ".raw" if raw else name)
+        os.makedirs(work_dir if raw else path, exist_ok=True)
+        stores.append(open_frame_store(path, capacity))
+    return stores
+
+def get_remover():
+    """Return the shared, warm background-removal engine for the configured model"""
+    return get_background_remover(config.get("rembg_model", "u2net"), config.get("rembg_sessions", 1))
+
+_frame_cache = None
+
+def get_frame_cache(base_dir="."):
+    """Return the persistent frame cache, or None when it is disabled in config"""
+    global _frame_cache
+    if not config.get("frame_cache_enabled", True):
+        return None
+    if _frame_cache is None:
+        cache_dir = os.path.join(base_dir, config.get("frame_cache_dir", "cache"))
+        _frame_cache = FrameCache(cache_dir, int(config.get("frame_cache_max_gb", 10) * 1024 ** 3))
+    return _frame_cache
+
+def open_checkpoint(checkpoint_path, video_path, fps, frames_dir, nobg_dir, processed_dir, final_video_path,
+                    edge_threshold, distortion_strength, style_name, custom_params, pixel_size=1, noise_level=0):
+    """
+    Load or start the resume manifest for a staged job
+    
+    Returns a dict of StageCheckpoints keyed by stage name. Each stage hashes the
+    params that change its output, chained to the stages before it.
+    """
+    checkpoint = JobCheckpoint(checkpoint_path)
+    return {
+        "extract_frames": checkpoint.stage("extract_frames", {
+            "video": video_stamp(video_path), "fps": fps, "pixel_size": pixel_size}, frames_dir),
+        "remove_background": checkpoint.stage("remove_background", {
+            "model": config.get("rembg_model", "u2net")}, nobg_dir),
+        "apply_converter_style": checkpoint.stage("apply_converter_style", {
+            "style": style_name, "style_config": config.get("styles", {}).get(style_name),
+            "custom_params": custom_params, "edge_threshold": edge_threshold,
+            "distortion_strength": distortion_strength, "style_engine": config.get("style_engine", "pil")},
+            processed_dir),
+        "reassemble_video": checkpoint.stage("reassemble_video", {
+            "output": os.path.abspath(final_video_path), "upscale": pixel_size, "noise_level": noise_level}),
+    }
+
+def _save_duplicates(store, sources):
+    """Save a {file_name: source_file_name} map for every frame in store, stamped with the frames it describes"""
+    store.write_duplicates({"threshold": config.get("dedup_threshold", 12),
+                            "stamp": store.stamp(store.names()), "sources": sources})
+
+def find_duplicate_frames(input_dir, file_names):
+    """
+    Map frames that repeat an earlier frame to the frame whose result they reuse
+    
+    Returns {file_name: source_file_name} for the duplicates only (see
+    dedup.FrameDeduper), or {} when dedup_frames is off in config. The map is
+    saved with the frames when they are extracted and passed on by
+    remove_background, so stages and resumed runs do not decode the frames
+    again; frames without a map that still matches them are fingerprinted
+    here once and the map is saved.
+    """
+    if not config.get("dedup_frames", True):
+        return {}
+    store = open_frame_store(input_dir)
+    threshold = config.get("dedup_threshold", 12)
+    saved = store.read_duplicates()
+    if saved and saved["threshold"] == threshold and all(name in saved["sources"] for name in file_names) \
+            and saved["stamp"] == store.stamp(store.names()):
+        sources = saved["sources"]
+    else:
+        sources = find_duplicates(store.read, file_names, threshold)
+        _save_duplicates(store, sources)
+    return {file_name: sources[file_name] for file_name in file_names if sources[file_name] != file_name}
+
+def _copy_duplicates(output_dir, duplicates, metrics, checkpoint=None):
+    """Give each duplicate frame a copy of its source frame's output"""
+    store = open_frame_store(output_dir)
+    for file_name, source in duplicates.items():
+        store.copy(file_name, source)
+    if checkpoint and duplicates:
+        checkpoint.mark_done(*duplicates)
+    metrics.frame_skipped(len(duplicates))
+
+def remove_background(input_dir, output_dir, batch_size=1, metrics=None, checkpoint=None):
+    """
+    Remove the background from every frame in input_dir
+    
+    input_dir and output_dir are PNG folders or frame stores (see
+    frame_store). Returns throughput stats ({"frames", "skipped", "seconds", "fps"}) so the
+    batch size can be tuned per machine. Frames that duplicate the frame
+    before them are not segmented but get a copy of its result; they are
+    counted as skipped, not in frames or fps. With a StageCheckpoint only
+    frames it does not record as done are processed, and each finished frame
+    is recorded.
+    """
+    metrics = metrics or NullMetrics()
+    remover = get_remover()
+    start_time = time.perf_counter()
+    source, output = open_frame_store(input_dir), open_frame_store(output_dir)
+    
+    all_names = source.names()
+    all_duplicates = find_duplicate_frames(source, all_names)
+    file_names = checkpoint.pending(all_names) if checkpoint else all_names
+    duplicates = {file_name: all_duplicates[file_name] for file_name in file_names if file_name in all_duplicates}
+    file_names = [file_name for file_name in file_names if file_name not in duplicates]
+    
+    with metrics.stage("remove_background", len(file_names) + len(duplicates)):
+        if batch_size > 1 and remover.supports_batching():
+            chunk_size = batch_size * remover.pool_size
+            for i in range(0, len(file_names), chunk_size):
+                chunk = file_names[i:i + chunk_size]
+                frames = [source.read(file_name) for file_name in chunk]
+                for file_name, result in zip(chunk, remover.remove_frames(frames, batch_size)):
+                    output.write(file_name, result)
+                if checkpoint:
+                    checkpoint.mark_done(*chunk)
+                metrics.frame_done(count=len(chunk))
         else:
-            result = art_processor.process_image(img, style_name, custom_params)
-        
-        save_path = os.path.join(processed_dir, file_name)
-        cv2.imwrite(save_path, result)
+            def process(file_name):
+                frame_start = time.perf_counter()
+                if source.kind == "png" and output.kind == "png":
+                    # PNG to PNG: let rembg decode and encode the files itself
+                    with open(source.path(file_name), "rb") as inp_file:
+                        img_data = inp_file.read()
 
-def apply_legacy_edge_detection(img, edge_threshold, distortion_strength):
-    """The original edge detection algorithm, kept for compatibility"""
-    if img.shape[2] == 4:
-        alpha = img[:, :, 3]
-        
-        gray = cv2.cvtColor(img[:, :, :3], cv2.COLOR_BGR2GRAY)
+                    output_data = remover.remove(img_data)
 
-        edges = cv2.Canny(gray, edge_threshold[0], edge_threshold[1])
-        edges = cv2.bitwise_and(edges, edges, mask=alpha)
-        
-        rows, cols = edges.shape
-        distort_map = np.random.randint(-distortion_strength, distortion_strength, (rows, cols), dtype=np.int8)
-        distorted = np.clip(edges + distort_map, 0, 255)
+                    with open(output.path(file_name), "wb") as out_file:
+                        out_file.write(output_data)
+                else:
+                    output.write(file_name, remover.remove_frame(source.read(file_name)))
+                if checkpoint:
+                    checkpoint.mark_done(file_name)
+                metrics.frame_done(time.perf_counter() - frame_start)
+            
+            remover.map(process, file_names)
         
-        result = np.zeros((rows, cols, 4), dtype=np.uint8)
-        result[:, :, 0] = distorted  
-        result[:, :, 1] = distorted  
-        result[:, :, 2] = distorted  
-        result[:, :, 3] = alpha      
+        _copy_duplicates(output, duplicates, metrics, checkpoint)
+        output.flush()
+        # Duplicates got copies of their sources' results, so the same map describes the output
+        if config.get("dedup_frames", True):
+            _save_duplicates(output, {name: all_duplicates.get(name, name) for name in all_names})
+    
+    if checkpoint:
+        checkpoint.complete()
+    seconds = time.perf_counter() - start_time
+    return {"frames": len(file_names), "skipped": len(duplicates), "seconds": seconds,
+            "fps": len(file_names) / seconds if seconds else 0.0}
+
+def remove_background_frame(frame):
+    """Remove the background from a BGR frame and return it as BGRA"""
+    return get_remover().remove_frame(frame)
+
+def sample_video_frames(video_path, count, remove_bg=True):
+    """Frames spread evenly over the video, background-removed unless remove_bg is False, for a shared palette"""
+    duration = probe_duration(video_path) or 0
+    frames = [extract_frame_at(video_path, duration * (index + 0.5) / count) for index in range(count)]
+    frames = [frame for frame in frames if frame is not None]
+    return [remove_background_frame(frame) for frame in frames] if remove_bg else frames
+
+def style_is_deterministic(style_name, custom_params=None):
+    """Whether a repeated frame can reuse the styled result of the frame it repeats"""
+    return style_name != "legacy_edge" and art_processor.is_deterministic(style_name, custom_params)
+
+def style_frame(img, edge_threshold, distortion_strength, style_name=None, custom_params=None):
+    """Apply the selected art style to a single frame"""
+    if style_name == "legacy_edge":
+        return apply_legacy_edge_detection(img, edge_threshold, distortion_strength)
+    return art_processor.process_image(img, style_name, custom_params)
+
+def apply_converter_style(input_dir, edge_threshold, distortion_strength, processed_dir, style_name=None, custom_params=None, workers=1, metrics=None, checkpoint=None):
+    """
+    Apply the selected art style to images
+    
+    This is a wrapper around the ArtStyleProcessor that maintains compatibility
+    with the existing code while adding new style options. With workers > 1 the
+    frames are styled across a process pool; workers=0 uses every CPU core.
+    With a StageCheckpoint only frames it does not record as done are styled.
+    When the style is deterministic, frames that duplicate the frame before
+    them get a copy of its result instead of being styled again. input_dir and
+    processed_dir are PNG folders or frame stores (see frame_store). Returns
+    {"frames", "skipped"} counts.
+    """
+    source, output = open_frame_store(input_dir), open_frame_store(processed_dir)
+    file_names = source.names()
+    
+    # Sample the palette from every frame of the video, not just the pending ones
+    sample_names = file_names[::max(1, len(file_names) // config.get("palette_samples", 8))]
+    style_name, custom_params = plan_palette(
+        style_name, custom_params, lambda: [source.read(file_name) for file_name in sample_names])
+    
+    duplicates = find_duplicate_frames(source, file_names) \
+        if style_is_deterministic(style_name, custom_params) else {}
+    if checkpoint:
+        file_names = checkpoint.pending(file_names)
+    duplicates = {file_name: duplicates[file_name] for file_name in file_names if file_name in duplicates}
+    file_names = [file_name for file_name in file_names if file_name not in duplicates]
+    metrics = metrics or NullMetrics()
+    
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(file_names))
+    stats = {"frames": len(file_names), "skipped": len(duplicates)}
+    
+    if workers <= 1:
+        with metrics.stage("apply_converter_style", len(file_names) + len(duplicates)):
+            for file_name in file_names:
+                latency = _style_stored_frame(source, output, file_name, edge_threshold, distortion_strength,
+                                              style_name, custom_params)
+                if checkpoint:
+                    checkpoint.mark_done(file_name)
+                metrics.frame_done(latency)
+            _copy_duplicates(output, duplicates, metrics, checkpoint)
+            output.flush()
+        if checkpoint:
+            checkpoint.complete()
+        return stats
+    
+    # Workers write into their frames' slots directly; every style keeps the frame's shape
+    output.reserve(file_names, source.read(file_names[0]).shape)
+    chunksize = max(1, len(file_names) // (workers * 4))
+    # Spawned, not forked: a fork after numba's parallel kernels have started its threading
+    # layer leaves this process unable to exit
+    with metrics.stage("apply_converter_style", len(file_names) + len(duplicates)), \
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                initializer=_init_style_worker, initargs=(config,)) as executor:
+        latencies = executor.map(
+            _style_stored_frame,
+            repeat(source),
+            repeat(output),
+            file_names,
+            repeat(edge_threshold),
+            repeat(distortion_strength),
+            repeat(style_name),
+            repeat(custom_params),
+            chunksize=chunksize
+        )
+        for file_name, latency in zip(file_names, latencies):
+            if checkpoint:
+                checkpoint.mark_done(file_name)
+            metrics.frame_done(latency)
+        _copy_duplicates(output, duplicates, metrics, checkpoint)
+        output.flush()
+    if checkpoint:
+        checkpoint.complete()
+    return stats
+
+def _init_style_worker(worker_config):
+    """Give each pool worker its own style processor and independent random state"""
+    global art_processor
+    art_processor = create_art_processor(worker_config)
+    np.random.seed()
+    random.seed()
+
+def _style_stored_frame(source, output, file_name, edge_threshold, distortion_strength, style_name, custom_params):
+    """Style one frame from the source store into the output store and return how long it took"""
+    frame_start = time.perf_counter()
+    img = source.read(file_name)
+    result = style_frame(img, edge_threshold, distortion_strength, style_name, custom_params)
+    output.write(file_name, result)
+    return time.perf_counter() - frame_start
+
+def apply_legacy_edge_detection(img, edge_threshold, distortion_strength):
+    """
+    The original edge detection algorithm, kept for compatibility
+    
+    Intermediates are written into the thread's buffer arena, so the returned
+    frame is the only full-size array allocated per frame.
+    """
+    arena = get_arena()
+    rows, cols = img.shape[:2]
+    has_alpha = img.shape[2] == 4
+    
+    gray = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY if has_alpha else cv2.COLOR_BGR2GRAY,
+                        dst=arena.get("edge_gray", (rows, cols)))
+    edges = cv2.Canny(gray, edge_threshold[0], edge_threshold[1], edges=arena.get("edge_canny", (rows, cols)))
+    
+    if has_alpha:
+        alpha = cv2.extractChannel(img, 3, dst=arena.get("edge_alpha", (rows, cols)))
+        masked = arena.get("edge_masked", (rows, cols))
+        masked.fill(0)
+        edges = cv2.bitwise_and(edges, edges, dst=masked, mask=alpha)
+    
+    # Distortion is uniform in [-strength, strength), like the original randint map
+    strength = int(distortion_strength)
+    if strength > 0:
+        total = arena.get("edge_total", (rows, cols), np.int16)
+        np.add(edges, art_processor.noise.uniform((rows, cols), 2 * strength), out=total, dtype=np.int16)
+        np.subtract(total, strength, out=total)
+        np.clip(total, 0, 255, out=total)
+        distorted = arena.get("edge_distorted", (rows, cols))
+        np.copyto(distorted, total, casting="unsafe")
     else:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, edge_threshold[0], edge_threshold[1])
-        
-        rows, cols = edges.shape
-        distort_map = np.random.randint(-distortion_strength, distortion_strength, (rows, cols), dtype=np.int8)
-        distorted = np.clip(edges + distort_map, 0, 255)
-        
-        result = np.zeros((rows, cols, 3), dtype=np.uint8)
-        result[:, :, 0] = distorted  # Blue 
-        result[:, :, 1] = distorted  # Green 
-        result[:, :, 2] = distorted  # Red 
+        distorted = edges
     
-    return result
+    return cv2.merge([distorted, distorted, distorted, alpha] if has_alpha else [distorted, distorted, distorted])
 
-def reassemble_video(processed_dir, fps, final_video_path):
+def reassemble_video(processed_dir, fps, final_video_path, metrics=None, upscale=1, noise_level=0, size=None):
+    """
+    Encode the processed frames into final_video_path
+    
+    The format follows the file extension: MP4, or GIF, lossless WebP or APNG
+    with the frames' alpha kept (see output_formats). processed_dir is a PNG
+    folder, read by ffmpeg, or a frame store, piped into it; pixel-grid frames
+    that get full-size noise or go back to a size that is not a multiple of
+    upscale are always piped (see VideoEncoder). Returns
+    {"format", "bytes", "seconds"} so formats can be compared per deliverable.
+    """
+    metrics = metrics or NullMetrics()
     os.makedirs(os.path.dirname(final_video_path), exist_ok=True)
     
-    processed_dir = os.path.normpath(processed_dir)
+    format_name = output_format(final_video_path)
+    store = open_frame_store(processed_dir)
+    start_time = time.perf_counter()
+    file_names = store.names()
+    exact_size = upscale > 1 and file_names and \
+        _exact_upscale_size(store.read(file_names[0]).shape, upscale, size, noise_level)
+    if store.kind == "png" and not exact_size:
+        frame_pattern = os.path.join(os.path.normpath(store.directory), "frame_%04d.png")
+        output_args = encode_args(format_name, _encode_filter(upscale, format_name),
+                                  config.get("gif_dither", "none"))
+        output_options = " ".join(f'"{arg}"' for arg in output_args)
+        command = f'ffmpeg -framerate {fps} -i "{frame_pattern}" {output_options} "{final_video_path}"'
+        with metrics.stage("reassemble_video", len(file_names)):
+            _run_ffmpeg(command, metrics)
+    else:
+        with metrics.stage("reassemble_video", len(file_names)), \
+                VideoEncoder(final_video_path, fps, upscale, noise_level, size) as encoder:
+            for file_name in file_names:
+                encoder.write(store.read(file_name))
+                metrics.frame_done()
+    seconds = time.perf_counter() - start_time
+    metrics.output_written(final_video_path, format_name, seconds)
+    return {"format": format_name, "bytes": os.path.getsize(final_video_path), "seconds": seconds}
+
+def process_video_stream(video_path, fps, final_video_path, edge_threshold, distortion_strength,
+                         style_name=None, custom_params=None, original_dir=None, nobg_dir=None,
+                         processed_dir=None, remove_bg=True, batch_size=1, metrics=None, low_res=False,
+                         start=0, frame_limit=None):
+    """
+    Run the whole pipeline on in-memory frames without intermediate PNGs
+    
+    Decoding, background removal, styling and encoding run concurrently as a
+    pipeline (see pipeline.run_pipeline): frames are decoded from an ffmpeg
+    pipe, background-removed in chunks, styled as NumPy arrays by
+    pipeline_style_threads threads and piped in order into a second ffmpeg
+    process for encoding, with at most pipeline_queue_size items waiting
+    between two stages. metrics records the queue depths. Frame folders are
+    only written for the directories that are passed in. With low_res the
+    frames stay at the style's pixel-grid resolution until the encoder
+    upscales them (see plan_low_res), so exported frames are grid-sized.
+    A shared palette (see plan_palette) is sampled from palette_samples
+    frames spread over the whole video before the run starts. Frames that duplicate the frame before them reuse
+    its background-removed frame, and its styled result when the style is
+    deterministic; metrics counts them as skipped. start and frame_limit
+    restrict the run to one time segment (see iter_video_frames and
+    segments.py). Returns the number of frames processed.
+    """
+    styling = bool(final_video_path or processed_dir)
+    if styling:
+        style_name, custom_params = plan_palette(style_name, custom_params, lambda: sample_video_frames(
+            video_path, config.get("palette_samples", 8), remove_bg))
+    pixel_size, noise_level = 1, 0
+    plan = plan_low_res(style_name, custom_params) if low_res else None
+    if plan:
+        pixel_size, custom_params, noise_level = plan
+        style_name = "custom"
+    
+    total_frames = frame_limit or (probe_frame_count(video_path, fps) if metrics else None)
+    metrics = metrics or NullMetrics()
+    encoder = VideoEncoder(final_video_path, fps, pixel_size, noise_level,
+                           probe_video(video_path) if plan else None) if final_video_path else None
+    remover = get_remover() if remove_bg else None
+    chunk_size = batch_size * remover.pool_size if remover else 1
+    reuse_styled = style_is_deterministic(style_name, custom_params)
+    deduper = FrameDeduper(config.get("dedup_threshold", 12)) \
+        if config.get("dedup_frames", True) and (remover or reuse_styled) else None
+    state = {"nobg_frame": None, "result": None}
+    
+    def read_chunks():
+        """Decode frames in chunks of one background-removal batch, tagged with their first frame's index"""
+        frames = iter_video_frames(video_path, fps, pixel_size, start, frame_limit)
+        first_index = 0
+        try:
+            while True:
+                chunk = list(islice(frames, chunk_size))
+                if not chunk:
+                    return
+                if original_dir:
+                    for offset, frame in enumerate(chunk, start=first_index + 1):
+                        cv2.imwrite(os.path.join(original_dir, f"frame_{offset:04d}.png"), frame)
+                duplicates = [deduper.is_duplicate(frame) if deduper else False for frame in chunk]
+                yield first_index, (chunk, duplicates)
+                first_index += len(chunk)
+        finally:
+            frames.close()
     
-    frame_pattern = os.path.join(processed_dir, "frame_%04d.png")
+    def remove_chunk(item):
+        """Remove the backgrounds of a chunk and split it into frames; a single worker, so chunks stay in order"""
+        first_index, (chunk, duplicates) = item
+        if remover:
+            removed = iter(remover.remove_frames(
+                [frame for frame, duplicate in zip(chunk, duplicates) if not duplicate], batch_size))
+            nobg_chunk = []
+            for duplicate in duplicates:
+                if not duplicate:
+                    state["nobg_frame"] = next(removed)
+                nobg_chunk.append(state["nobg_frame"])
+            chunk = nobg_chunk
+        if nobg_dir:
+            for offset, frame in enumerate(chunk, start=first_index + 1):
+                cv2.imwrite(os.path.join(nobg_dir, f"frame_{offset:04d}.png"), frame)
+        return [(first_index + offset, (frame, duplicate))
+                for offset, (frame, duplicate) in enumerate(zip(chunk, duplicates))]
     
-    frame_pattern = frame_pattern.replace('/', '\\')
+    def style_item(item):
+        index, (frame, duplicate) = item
+        result = None
+        if styling and not (duplicate and reuse_styled):
+            result = style_frame(frame, edge_threshold, distortion_strength, style_name, custom_params)
+        return [(index, (duplicate, result))]
     
-    command = f'ffmpeg -framerate {fps} -i "{frame_pattern}" -c:v libx264 -pix_fmt yuv420p "{final_video_path}"'
-    subprocess.run(command, shell=True)
+    def write_frame(item):
+        """Export and encode one styled frame; called in frame order, so duplicates reuse the result before them"""
+        index, (duplicate, result) = item
+        if styling:
+            if result is None:
+                result = state["result"]
+            state["result"] = result
+            if processed_dir:
+                cv2.imwrite(os.path.join(processed_dir, f"frame_{index + 1:04d}.png"), result)
+            if encoder:
+                encoder.write(result)
+        if duplicate:
+            metrics.frame_skipped()
+        else:
+            metrics.frame_done()
+    
+    stages = [PipelineStage("remove_background", remove_chunk),
+              PipelineStage("style", style_item, config.get("pipeline_style_threads", 2))]
+    metrics.start_stage("stream", total_frames)
+    try:
+        frame_count = run_pipeline(read_chunks(), stages, write_frame, config.get("pipeline_queue_size", 8), metrics)
+    finally:
+        if encoder:
+            encoder.close()
+        metrics.end_stage()
+    if encoder:
+        metrics.output_written(final_video_path, encoder.format_name, encoder.seconds)
+    return frame_count
 
 def get_available_styles():
     """Return a list of available art styles"""
-    styles = art_processor.get_available_styles()
-    styles.append("legacy_edge")
-    return styles
+    return style_catalog.get_available_styles(config)
 
 def get_style_description(style_name):
     """Return the description for a style"""
-    if style_name == "legacy_edge":
-        return "Original edge detection algorithm with distortion"
-    return art_processor.get_style_description(style_name)
+    return style_catalog.get_style_description(config, style_name)
@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+
+def fingerprint(frame, size=32):
+    """Area-averaged size x size thumbnail of every channel of the frame, used to compare frames"""
+    return cv2.resize(frame, (size, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class FrameDeduper:
+    """
+    Detects runs of identical or near-identical frames
+
+    Each frame is shrunk to a small thumbnail and compared with the last unique
+    frame: when no thumbnail value differs by more than threshold (0-255 scale),
+    the frame is a duplicate of it. Averaging over thumbnail cells hides most
+    encoder noise (re-encoded copies of a frame differ by up to ~10), while
+    taking the max keeps small local changes such as a moving cursor.
+    Comparing against the last unique frame instead of the previous one stops a
+    slow fade from drifting through a run of "duplicates".
+    """
+
+    def __init__(self, threshold=12, size=32):
+        self.threshold = threshold
+        self.size = size
+        self.unique = 0
+        self.duplicates = 0
+        self._last = None
+
+    def is_duplicate(self, frame):
+        thumbnail = fingerprint(frame, self.size)
+        if self._last is not None and self._last.shape == thumbnail.shape \
+                and np.abs(thumbnail - self._last).max() <= self.threshold:
+            self.duplicates += 1
+            return True
+        self._last = thumbnail
+        self.unique += 1
+        return False
+
+
+def find_duplicates(read_frame, file_names, threshold=12, size=32):
+    """
+    Map each frame to the frame whose result it can reuse
+
+    read_frame(file_name) returns a frame as an array. Returns
+    {file_name: source_file_name}, in which unique frames map to themselves
+    and duplicates to the unique frame that starts their run.
+    """
+    deduper = FrameDeduper(threshold, size)
+    sources = {}
+    source = None
+    for file_name in file_names:
+        if not deduper.is_duplicate(read_frame(file_name)):
+            source = file_name
+        sources[file_name] = source
+    return sources
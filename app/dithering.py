@@ -0,0 +1,133 @@
+import os
+import sys
+import numpy as np
+
+if getattr(sys, 'frozen', False) and "NUMBA_CACHE_DIR" not in os.environ:
+    # The bundled package directory is read-only, so keep compiled kernels next to the executable
+    os.environ["NUMBA_CACHE_DIR"] = os.path.join(os.path.dirname(sys.executable), "numba_cache")
+
+from numba import njit, prange
+
+
+@njit(cache=True)
+def floyd_steinberg(gray):
+    """
+    Floyd-Steinberg error diffusion to black/white
+
+    Integer port of PIL's convert('1', dither=FLOYDSTEINBERG), so results are
+    identical. Each row depends on the previous one, so this runs serially.
+    """
+    height, width = gray.shape
+    out = np.empty((height, width), dtype=np.uint8)
+    errors = np.zeros(width + 1, dtype=np.int32)
+    for y in range(height):
+        l = 0
+        l0 = 0
+        l1 = 0
+        for x in range(width):
+            total = l + errors[x + 1]
+            # C integer division truncates towards zero
+            if total >= 0:
+                total = total // 16
+            else:
+                total = -((-total) // 16)
+            l = min(max(np.int32(gray[y, x]) + total, 0), 255)
+            value = 255 if l > 128 else 0
+            out[y, x] = value
+
+            l -= value
+            l2 = l
+            d2 = l + l
+            l += d2
+            errors[x] = l + l0
+            l += d2
+            l0 = l + l1
+            l1 = l2
+            l += d2
+        errors[width] = l0
+    return out
+
+
+@njit(cache=True)
+def atkinson(gray):
+    """Atkinson error diffusion: spreads 6/8 of the error for crisper, higher-contrast output"""
+    height, width = gray.shape
+    out = np.empty((height, width), dtype=np.uint8)
+    buffer = gray.astype(np.int32)
+    for y in range(height):
+        for x in range(width):
+            old = buffer[y, x]
+            value = 255 if old > 128 else 0
+            out[y, x] = value
+            error = (old - value) >> 3
+            if x + 1 < width:
+                buffer[y, x + 1] += error
+            if x + 2 < width:
+                buffer[y, x + 2] += error
+            if y + 1 < height:
+                if x > 0:
+                    buffer[y + 1, x - 1] += error
+                buffer[y + 1, x] += error
+                if x + 1 < width:
+                    buffer[y + 1, x + 1] += error
+            if y + 2 < height:
+                buffer[y + 2, x] += error
+    return out
+
+
+@njit(cache=True, parallel=True)
+def threshold_map_dither(gray, thresholds):
+    """Compare every pixel against a tiled threshold map; rows are independent so this runs in parallel"""
+    height, width = gray.shape
+    tile_h, tile_w = thresholds.shape
+    out = np.empty((height, width), dtype=np.uint8)
+    for y in prange(height):
+        row = thresholds[y % tile_h]
+        for x in range(width):
+            out[y, x] = 255 if gray[y, x] > row[x % tile_w] else 0
+    return out
+
+
+def bayer_matrix(size):
+    """Ordered-dither thresholds (0-255) for a size x size Bayer matrix, size a power of two"""
+    matrix = np.zeros((1, 1), dtype=np.int32)
+    while matrix.shape[0] < size:
+        matrix = np.block([[4 * matrix, 4 * matrix + 2],
+                           [4 * matrix + 3, 4 * matrix + 1]])
+    return ((matrix + 0.5) * 255 / matrix.size).astype(np.uint8)
+
+
+_blue_noise_tiles = {}
+
+def blue_noise_tile(size=64, seed=0):
+    """
+    Approximate blue-noise threshold tile, built once per size and reused
+
+    White noise is high-pass filtered (noise minus its wrapped box blur) and
+    then rank-ordered, which pushes its energy into high frequencies.
+    """
+    key = (size, seed)
+    if key not in _blue_noise_tiles:
+        noise = np.random.default_rng(seed).random((size, size))
+        blurred = sum(np.roll(np.roll(noise, dy, 0), dx, 1)
+                      for dy in (-1, 0, 1) for dx in (-1, 0, 1)) / 9
+        ranks = np.argsort(np.argsort((noise - blurred).ravel()))
+        _blue_noise_tiles[key] = (ranks * 256 // ranks.size).astype(np.uint8).reshape(size, size)
+    return _blue_noise_tiles[key]
+
+
+DITHER_MODES = ("floyd_steinberg", "atkinson", "bayer2", "bayer4", "bayer8", "blue_noise")
+
+def dither(gray, mode="floyd_steinberg"):
+    """Dither a 2D uint8 grayscale array to 0/255 with the given dither_mode"""
+    gray = np.ascontiguousarray(gray, dtype=np.uint8)
+    if mode == "floyd_steinberg":
+        return floyd_steinberg(gray)
+    if mode == "atkinson":
+        return atkinson(gray)
+    if mode in ("bayer2", "bayer4", "bayer8"):
+        return threshold_map_dither(gray, bayer_matrix(int(mode[5:])))
+    if mode == "blue_noise":
+        return threshold_map_dither(gray, blue_noise_tile())
+    print(f"Dither mode {mode} not found, using floyd_steinberg", file=sys.stderr)
+    return floyd_steinberg(gray)
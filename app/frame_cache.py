@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+
+class FrameCache:
+    """
+    Persistent, content-addressed cache of decoded and background-removed frames
+
+    Frames are keyed by video content hash + fps + frame index, plus the rembg
+    model for background-removed frames and the pixel grid for frames decoded
+    at low resolution. Frames are stored and evicted as whole
+    sets (every frame of one video/fps/model), least recently used first, once
+    the cache grows past max_bytes.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"entries": {}, "hashes": {}}
+
+    def _save_index(self):
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(index_path + ".tmp", index_path)
+
+    def video_hash(self, video_path):
+        """Return the SHA-256 of the video's contents, memoized by path, size and mtime"""
+        stat = os.stat(video_path)
+        stamp = f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        with self._lock:
+            cached = self._index["hashes"].get(stamp)
+        if cached:
+            return cached
+
+        digest = hashlib.sha256()
+        with open(video_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+
+        with self._lock:
+            self._index["hashes"][stamp] = digest.hexdigest()
+            self._save_index()
+        return digest.hexdigest()
+
+    @staticmethod
+    def entry_key(video_hash, fps, model=None, pixel_size=1):
+        """Key for one set of frames; model is the rembg model for background-removed frames"""
+        grid = f"_grid{pixel_size}" if pixel_size > 1 else ""
+        return f"{video_hash}/fps_{fps}{grid}/{model or 'original'}"
+
+    def frame_path(self, video_hash, fps, frame_index, model=None, pixel_size=1):
+        """Path of a single cached frame"""
+        return os.path.join(self.cache_dir, *self.entry_key(video_hash, fps, model, pixel_size).split("/"),
+                            f"frame_{frame_index:04d}.png")
+
+    def lookup(self, video_hash, fps, model=None, pixel_size=1):
+        """Return the cached frame directory if every frame is present, else None"""
+        key = self.entry_key(video_hash, fps, model, pixel_size)
+        entry_dir = os.path.join(self.cache_dir, *key.split("/"))
+        with self._lock:
+            entry = self._index["entries"].get(key)
+            if not entry:
+                return None
+            if not os.path.isdir(entry_dir) or len(os.listdir(entry_dir)) != entry["frames"]:
+                del self._index["entries"][key]
+                self._save_index()
+                return None
+            entry["last_used"] = time.time()
+            self._save_index()
+        return entry_dir
+
+    def store(self, video_hash, fps, source_dir, model=None, pixel_size=1):
+        """Add every frame in source_dir to the cache, then evict old sets to stay under max_bytes"""
+        key = self.entry_key(video_hash, fps, model, pixel_size)
+        entry_dir = os.path.join(self.cache_dir, *key.split("/"))
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.makedirs(entry_dir)
+
+        size = 0
+        file_names = [name for name in os.listdir(source_dir) if name.lower().endswith(".png")]
+        for file_name in file_names:
+            shutil.copyfile(os.path.join(source_dir, file_name), os.path.join(entry_dir, file_name))
+            size += os.path.getsize(os.path.join(entry_dir, file_name))
+
+        with self._lock:
+            self._index["entries"][key] = {"frames": len(file_names), "bytes": size, "last_used": time.time()}
+            self._evict(keep=key)
+            self._save_index()
+
+    def restore(self, entry_dir, dest_dir):
+        """
+        Copy the cached frames into dest_dir without decoding anything
+
+        Frames are copied rather than hard-linked so later in-place writes to
+        dest_dir can never corrupt the cache.
+        """
+        os.makedirs(dest_dir, exist_ok=True)
+        for file_name in os.listdir(entry_dir):
+            shutil.copyfile(os.path.join(entry_dir, file_name), os.path.join(dest_dir, file_name))
+
+    def _evict(self, keep=None):
+        entries = self._index["entries"]
+        total = sum(entry["bytes"] for entry in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, *key.split("/")), ignore_errors=True)
+            total -= entries.pop(key)["bytes"]
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry["bytes"] for entry in self._index["entries"].values())
+
@@ -0,0 +1,267 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import cv2
+import numpy as np
+
+
+FRAME_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def frame_order(name):
+    """Sort key that keeps frame_9999.png before frame_10000.png"""
+    return len(name), name
+
+
+def _read_json(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    """Write data as JSON atomically, so a crash never leaves a half-written file"""
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def _stat_stamp(entries):
+    """Hash of (name, size, mtime) for each (name, path), which changes whenever a file is rewritten"""
+    digest = hashlib.sha256()
+    for name, path in entries:
+        stat = os.stat(path)
+        digest.update(f"{name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PngFrameStore:
+    """Frames of one stage as individual image files in a directory"""
+
+    kind = "png"
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.duplicates_path = os.path.join(directory, ".duplicates.json")
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def names(self):
+        return sorted((name for name in os.listdir(self.directory) if name.lower().endswith(FRAME_EXTENSIONS)),
+                      key=frame_order)
+
+    def has(self, name):
+        return os.path.exists(self.path(name))
+
+    def read(self, name):
+        return cv2.imread(self.path(name), cv2.IMREAD_UNCHANGED)
+
+    def write(self, name, frame):
+        cv2.imwrite(self.path(name), frame)
+
+    def copy(self, name, source):
+        shutil.copyfile(self.path(source), self.path(name))
+
+    def reserve(self, names, shape, dtype=np.uint8):
+        pass
+
+    def flush(self):
+        pass
+
+    def stamp(self, names):
+        """Identity of the named frames' current contents, cheap enough to check before every stage"""
+        return _stat_stamp((name, self.path(name)) for name in names)
+
+    def read_duplicates(self):
+        """The duplicate map saved with these frames by write_duplicates, or None"""
+        return _read_json(self.duplicates_path)
+
+    def write_duplicates(self, data):
+        _write_json(self.duplicates_path, data)
+
+    def export_png(self, directory, names=None):
+        if os.path.abspath(directory) == os.path.abspath(self.directory):
+            return
+        os.makedirs(directory, exist_ok=True)
+        for name in self.names() if names is None else names:
+            shutil.copyfile(self.path(name), os.path.join(directory, name))
+
+    def delete(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class RawFrameStore:
+    """
+    Frames of one stage in a single preallocated, memory-mapped file
+
+    Every frame has the shape and dtype of the first frame written (or
+    reserved). The file holds capacity frame slots and doubles when it fills
+    up; an index next to it (<path>.json) maps frame names to slots. read()
+    returns a view into the mapping, so frames are never decoded or copied on
+    the way in, and write() is one copy into the frame's slot. Frame names are
+    the PNG file names the frames export to, so stores and PNG folders are
+    interchangeable for the stages and checkpoints.
+
+    The index is written by flush(), which a JobCheckpoint also calls whenever
+    it saves, so frames it records as done can be found after a crash.
+    read() views must not be held across writes that may grow the file. A
+    store can be pickled for process-pool
+    workers, which map the same file and can write to slots reserved for them
+    beforehand; only the owning process adds frames or writes the index.
+    """
+
+    kind = "raw"
+
+    def __init__(self, path, capacity=0):
+        self.path = path
+        self.index_path = path + ".json"
+        self.duplicates_path = path + ".duplicates.json"
+        self.initial_capacity = max(1, capacity or 0)
+        self._lock = threading.Lock()
+        self._map = None
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            if not os.path.exists(path):
+                raise ValueError("frame file is missing")
+        except (OSError, ValueError):
+            index = {"shape": None, "dtype": None, "capacity": 0, "frames": {}}
+        self.shape = tuple(index["shape"]) if index["shape"] else None
+        self.dtype = index["dtype"]
+        self.capacity = index["capacity"]
+        self._slots = index["frames"]
+
+    def __getstate__(self):
+        return {"path": self.path, "shape": self.shape, "dtype": self.dtype,
+                "capacity": self.capacity, "slots": dict(self._slots)}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self.index_path = self.path + ".json"
+        self.duplicates_path = self.path + ".duplicates.json"
+        self.initial_capacity = 1
+        self._lock = threading.Lock()
+        self._map = None
+        self.shape = state["shape"]
+        self.dtype = state["dtype"]
+        self.capacity = state["capacity"]
+        self._slots = state["slots"]
+
+    def _mapping(self):
+        if self._map is None:
+            self._map = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(self.capacity,) + self.shape)
+        return self._map
+
+    def _grow(self, capacity):
+        """Extend the file to capacity slots, allocating its blocks up front where the OS supports it"""
+        size = capacity * int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+        if self._map is not None:
+            self._map.flush()
+            # Windows cannot resize a file that is still mapped
+            mapping, self._map = self._map, None
+            del mapping
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.truncate(size)
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, size)
+        self.capacity = capacity
+
+    def _slot(self, name, shape, dtype):
+        """Slot for name, adding it (and growing the file) if it is new; call with the lock held"""
+        if self.shape is None:
+            self.shape, self.dtype = tuple(shape), np.dtype(dtype).str
+            self._grow(self.initial_capacity)
+        if tuple(shape) != self.shape or np.dtype(dtype).str != self.dtype:
+            raise ValueError(f"Frame {name} is {tuple(shape)} {np.dtype(dtype)}, "
+                             f"but {self.path} holds {self.shape} {np.dtype(self.dtype)} frames")
+        slot = self._slots.get(name)
+        if slot is None:
+            slot = len(self._slots)
+            if slot >= self.capacity:
+                self._grow(max(self.capacity * 2, slot + 1))
+            self._slots[name] = slot
+        return slot
+
+    def names(self):
+        with self._lock:
+            return sorted(self._slots, key=frame_order)
+
+    def has(self, name):
+        return name in self._slots
+
+    def read(self, name):
+        """The frame as a view into the mapped file; copy it before the store is written again if it must be kept"""
+        with self._lock:
+            return np.asarray(self._mapping()[self._slots[name]])
+
+    def write(self, name, frame):
+        # Copied with the lock held, so no view of the mapping is alive when another write grows the file
+        with self._lock:
+            slot = self._slot(name, frame.shape, frame.dtype)
+            self._mapping()[slot] = frame
+
+    def copy(self, name, source):
+        with self._lock:
+            slot = self._slot(name, self.shape, self.dtype)
+            mapping = self._mapping()
+            mapping[slot] = mapping[self._slots[source]]
+
+    def reserve(self, names, shape, dtype=np.uint8):
+        """Give every name a slot up front, so pickled copies of the store can write them from other processes"""
+        with self._lock:
+            for name in names:
+                self._slot(name, shape, dtype)
+
+    def flush(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+            index = {"shape": self.shape, "dtype": self.dtype, "capacity": self.capacity, "frames": self._slots}
+            _write_json(self.index_path, index)
+
+    def stamp(self, names):
+        """Identity of the named frames' current contents; writes through the mapping update the file's mtime"""
+        return _stat_stamp([(json.dumps(names), self.path)])
+
+    def read_duplicates(self):
+        """The duplicate map saved with these frames by write_duplicates, or None"""
+        return _read_json(self.duplicates_path)
+
+    def write_duplicates(self, data):
+        _write_json(self.duplicates_path, data)
+
+    def export_png(self, directory, names=None):
+        """Write frames out as PNG files, e.g. when the user asked to keep a stage's frames"""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.names() if names is None else names:
+            cv2.imwrite(os.path.join(directory, name), self.read(name))
+
+    def delete(self):
+        with self._lock:
+            self._map = None
+            self._slots = {}
+            self.shape = None
+            self.capacity = 0
+        for path in (self.path, self.index_path, self.duplicates_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def open_frame_store(location, capacity=0):
+    """
+    Frame store for a stage: location itself if it is already a store, a
+    RawFrameStore for a path ending in .raw, else a PngFrameStore directory
+    """
+    if not isinstance(location, str):
+        return location
+    if location.endswith(".raw"):
+        return RawFrameStore(location, capacity)
+    return PngFrameStore(location)
@@ -1 +1 @@
-from .main_app import ConverterApp
\ No newline at end of file
+from .main_app import ConverterApp
@@ -3,8 +3,13 @@ import sys
 import json
 import shutil
 import threading
+import datetime
+import tkinter as tk
 from tkinter import filedialog, messagebox
 from .app_styles import TEXT_COLOR, ERROR_COLOR, SUCCESS_COLOR, ACCENT_COLOR
+from metrics import JobMetrics, format_eta
+from output_formats import OUTPUT_FORMATS
+import style_catalog
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -18,6 +23,18 @@ def resource_path(relative_path):
 with open(resource_path("config.json"), "r") as f:
     config = json.load(f)
 
+# Overall progress range (start, end) and status text for each pipeline stage
+STAGE_PROGRESS = {
+    "extract_frames": (5, 30, "Extracting frames"),
+    "remove_background": (30, 60, "Removing background"),
+    "apply_converter_style": (60, 90, "Applying selected art style"),
+    "reassemble_video": (90, 100, "Reassembling video"),
+    "stream": (5, 100, "Streaming frames through the pipeline"),
+}
+
+# How often the Tk thread checks for a finished preview render
+PREVIEW_POLL_MS = 30
+
 class AppFunctions:
     """Class containing all the application functionality"""
     
@@ -37,42 +54,132 @@ class AppFunctions:
             self.app.output_name.set(suggested_name)
     
     def update_log(self, log_text, level="info"):
-        """Add a log entry to the logs box"""
-        self.app.logs_box.config(state="normal")
+        """Queue a log entry for the logs box; safe to call from any thread"""
+        self.app.events.log(log_text, level)
+    
+    def update_progress(self, value, status_text=None):
+        """Queue a progress bar and status text update; safe to call from any thread"""
+        self.app.events.progress(value, status_text)
+    
+    def set_buttons_state(self, state):
+        """Enable or disable the process and reset buttons from any thread"""
+        self.app.events.call(self.app.process_btn.config, state=state)
+        self.app.events.call(self.app.reset_btn.config, state=state)
+    
+    def append_logs(self, entries):
+        """
+        Append a batch of (timestamp, text, level) log entries on the Tk thread
         
-        import datetime
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        The logs box keeps only the newest log_max_lines entries, so long runs
+        do not slow the widget down.
+        """
+        max_lines = config.get("log_max_lines", 1000)
+        entries = entries[-max_lines:]
+        logs_box = self.app.logs_box
+        logs_box.config(state="normal")
         
-        if level == "error":
-            tag = "error"
-            self.app.logs_box.tag_config(tag, foreground=ERROR_COLOR)
-        elif level == "success":
-            tag = "success"
-            self.app.logs_box.tag_config(tag, foreground=SUCCESS_COLOR)
-        else:
-            tag = "info"
-            self.app.logs_box.tag_config(tag, foreground=TEXT_COLOR)
-            
-        self.app.logs_box.insert("end", f"[{timestamp}] ", "timestamp")
-        self.app.logs_box.tag_config("timestamp", foreground=ACCENT_COLOR)
-        self.app.logs_box.insert("end", f"{log_text}\n", tag)
+        logs_box.tag_config("timestamp", foreground=ACCENT_COLOR)
+        logs_box.tag_config("error", foreground=ERROR_COLOR)
+        logs_box.tag_config("success", foreground=SUCCESS_COLOR)
+        logs_box.tag_config("info", foreground=TEXT_COLOR)
+        for timestamp, log_text, level in entries:
+            tag = level if level in ("error", "success") else "info"
+            logs_box.insert("end", f"[{timestamp}] ", "timestamp")
+            logs_box.insert("end", f"{log_text}\n", tag)
         
-        self.app.logs_box.yview("end")
-        self.app.logs_box.config(state="disabled")
+        # Every entry ends in a newline, so the text ends with one empty line after the last entry
+        entry_count = int(logs_box.index("end-1c").split(".")[0]) - 1
+        if entry_count > max_lines:
+            logs_box.delete("1.0", f"{entry_count - max_lines + 1}.0")
+        
+        logs_box.yview("end")
+        logs_box.config(state="disabled")
     
-    def update_progress(self, value, status_text=None):
-        """Update the progress bar and status text"""
+    def apply_progress(self, value, status_text=None):
+        """Update the progress bar and status text on the Tk thread"""
         self.app.progress_var.set(value)
         if status_text:
             self.app.progress_label.config(text=status_text)
-        self.app.update_idletasks()
     
     def start_processing(self):
-        """Start the video processing in a separate thread"""
-        processing_thread = threading.Thread(target=self.process_video)
+        """Read the form and ask any questions on the Tk thread, then process the video in a separate thread"""
+        job = self.prepare_job()
+        if not job:
+            return
+        self.set_buttons_state("disabled")
+        processing_thread = threading.Thread(target=self.process_video, args=(job,))
         processing_thread.daemon = True
         processing_thread.start()
     
+    def start_background_warmup(self):
+        """Load the image libraries and the background-removal model off the Tk thread"""
+        def warm_up():
+            try:
+                import core
+                core.get_remover().warm_up()
+                self.update_log("Background removal model loaded.")
+            except Exception as e:
+                self.update_log(f"Background removal model will load on first use ({str(e)}).", "error")
+        
+        warmup_thread = threading.Thread(target=warm_up)
+        warmup_thread.daemon = True
+        warmup_thread.start()
+    
+    def setup_preview(self):
+        """Re-render the preview whenever the video, its position, the style or a style parameter changes"""
+        from .preview import PreviewRenderer
+        
+        self.preview = PreviewRenderer(tuple(config.get("preview_max_size", [400, 225])))
+        self._preview_job = None
+        for variable in (self.app.video_path, self.app.preview_position, self.app.selected_style,
+                         self.app.pixel_size, self.app.use_dithering, self.app.dither_mode, self.app.contrast,
+                         self.app.noise_level, self.app.edge_min, self.app.edge_max, self.app.distortion):
+            variable.trace_add("write", lambda *args: self.schedule_preview())
+        self.app.after(PREVIEW_POLL_MS, self.poll_preview)
+    
+    def schedule_preview(self):
+        """Debounce preview renders so dragging a slider renders once it settles, not on every step"""
+        if self._preview_job is not None:
+            self.app.after_cancel(self._preview_job)
+        self._preview_job = self.app.after(config.get("preview_debounce_ms", 40), self.request_preview)
+    
+    def request_preview(self):
+        """Hand the current settings to the preview renderer thread"""
+        self._preview_job = None
+        video_path = self.app.video_path.get()
+        if not video_path or not os.path.isfile(video_path):
+            return
+        try:
+            style_name = self.app.selected_style.get()
+            custom_params = self.get_custom_params() if style_name == "custom" else None
+            edge_threshold = [self.app.edge_min.get(), self.app.edge_max.get()]
+            self.preview.request(video_path, self.app.preview_position.get(), style_name, custom_params,
+                                 edge_threshold, self.app.distortion.get())
+        except tk.TclError:
+            return
+        self.app.preview_status.config(text="Rendering preview...")
+    
+    def poll_preview(self):
+        """Show the newest finished preview, then check again shortly"""
+        result = self.preview.take_result()
+        if result:
+            self.show_preview(result)
+        self.app.after(PREVIEW_POLL_MS, self.poll_preview)
+    
+    def show_preview(self, result):
+        """Display a finished preview render"""
+        if result["error"]:
+            self.app.preview_status.config(text=f"Preview failed: {result['error']}")
+            return
+        from PIL import Image, ImageTk
+        
+        photo = ImageTk.PhotoImage(Image.fromarray(result["image"]))
+        self.app.preview_label.config(image=photo, text="", height=photo.height())
+        # Tk does not hold a reference to the image, so keep one on the widget
+        self.app.preview_label.image = photo
+        self.app.preview_status.config(
+            text=f"Styled in {result['styled_ms']:.0f} ms ({result['total_ms']:.0f} ms total)")
+    
     def on_style_selected(self, event):
         """Update the style description when a style is selected"""
         self.app.style_desc_label.config(text=self.get_style_description())
@@ -85,50 +192,75 @@ class AppFunctions:
     def get_style_description(self):
         """Get the description for the currently selected style"""
         style_name = self.app.selected_style.get()
-        import core
-        if hasattr(core, 'get_style_description'):
-            return core.get_style_description(style_name)
-        
-        descriptions = {
-            "faith": "Low-res pixelated horror style with high contrast",
-            "classic_pixel": "Clean pixel art with limited palette",
-            "glitch": "Distorted pixel art with digital artifacts",
-            "legacy_edge": "Original edge detection algorithm with distortion",
-            "custom": "Customized pixel art style with user-defined parameters"
-        }
-        return descriptions.get(style_name, "No description available")
+        return style_catalog.get_style_description(config, style_name)
 
     def get_custom_params(self):
         """Get the custom style parameters as a dictionary"""
         return {
             "pixel_size": self.app.pixel_size.get(),
             "dithering": self.app.use_dithering.get(),
+            "dither_mode": self.app.dither_mode.get(),
             "contrast": self.app.contrast.get(),
             "noise_level": self.app.noise_level.get(),
             "color_mode": "monochrome"  
         }
         
-    def process_video(self):
-        """Process the selected video with the chosen options"""
+    def get_base_dir(self):
+        """Get the directory that output, processed and cache folders are created in"""
+        if getattr(sys, 'frozen', False):
+            # Running as compiled executable
+            return os.path.dirname(sys.executable)
+        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    
+    def read_options(self):
+        """Snapshot the form values the pipeline uses; Tk variables are only read on the Tk thread"""
+        style_name = self.app.selected_style.get()
+        return {
+            "fps": self.app.fps.get(),
+            "edge_threshold": [self.app.edge_min.get(), self.app.edge_max.get()],
+            "distortion_strength": self.app.distortion.get(),
+            "style_name": style_name,
+            "custom_params": self.get_custom_params() if style_name == "custom" else None,
+            "export_original_frames": self.app.export_original_frames.get(),
+            "export_nobg_frames": self.app.export_nobg_frames.get(),
+            "export_processed_frames": self.app.export_processed_frames.get(),
+            "create_final_video": self.app.create_final_video.get(),
+            "streaming": self.app.streaming_mode.get(),
+            "low_res": self.app.low_res_mode.get(),
+        }
+    
+    def output_paths(self, output_name):
+        """Original, no-background and processed frame folders and the final video path for an output name"""
+        base_dir = self.get_base_dir()
+        return (
+            os.path.normpath(os.path.join(base_dir, config["output_dir"], output_name)),
+            os.path.normpath(os.path.join(base_dir, config["output_dir"], output_name + "_nobg")),
+            os.path.normpath(os.path.join(base_dir, config["processed_dir"], output_name)),
+            os.path.normpath(os.path.join(base_dir, config["final_video_dir"], output_name + "_final" + OUTPUT_FORMATS[config.get("output_format", "mp4")])),
+        )
+    
+    def prepare_job(self):
+        """
+        Read the form and settle the output paths on the Tk thread
+        
+        Asks before overwriting an existing video. Returns the job for
+        process_video, or None when there is nothing to run.
+        """
         video_path = self.app.video_path.get()
         if not video_path:
             self.update_log("No video selected!", "error")
             messagebox.showerror("Error", "Please select a video file first.")
-            return
+            return None
+        
+        job = self.read_options()
+        if not (job["export_original_frames"] or job["export_nobg_frames"] or job["export_processed_frames"] or job["create_final_video"]):
+            self.update_log("No processing options selected.", "error")
+            return None
         
-        if getattr(sys, 'frozen', False):
-            # Running as compiled executable
-            base_dir = os.path.dirname(sys.executable)
-        else:
-            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
         output_name = self.app.output_name.get() or config["sub_directory"]
-        output_dir = os.path.normpath(os.path.join(base_dir, config["output_dir"], output_name))
-        nobg_dir = os.path.normpath(os.path.join(base_dir, config["output_dir"], output_name + "_nobg"))
-        processed_dir = os.path.normpath(os.path.join(base_dir, config["processed_dir"], output_name))
-        final_video_path = os.path.normpath(os.path.join(base_dir, config["final_video_dir"], output_name + "_final.mp4"))
+        output_dir, nobg_dir, processed_dir, final_video_path = self.output_paths(output_name)
         
-        if self.app.create_final_video.get() and os.path.exists(final_video_path):
+        if job["create_final_video"] and os.path.exists(final_video_path):
             response = messagebox.askyesnocancel(
                 "File Already Exists", 
                 f"The output video file already exists:\n{final_video_path}\n\nDo you want to overwrite it?\n\nYes: Overwrite\nNo: Choose a new name\nCancel: Abort processing"
@@ -136,119 +268,107 @@ class AppFunctions:
             
             if response is None: 
                 self.update_log("Processing cancelled by user.", "info")
-                return
+                return None
             elif response is False: 
                 new_name = filedialog.asksaveasfilename(
                     initialdir=os.path.dirname(final_video_path),
                     initialfile=os.path.basename(final_video_path),
-                    defaultextension=".mp4",
-                    filetypes=[("MP4 Video", "*.mp4")]
+                    defaultextension=os.path.splitext(final_video_path)[1],
+                    filetypes=[("MP4 Video", "*.mp4"), ("Animated GIF", "*.gif"), ("Animated WebP", "*.webp"),
+                               ("Animated PNG", "*.apng")]
                 )
                 if not new_name:
                     self.update_log("Processing cancelled by user.", "info")
-                    return
-                final_video_path = new_name
+                    return None
                 
                 new_base_name = os.path.splitext(os.path.basename(new_name))[0]
                 if new_base_name.endswith("_final"):
                     new_base_name = new_base_name[:-6]  
                 self.app.output_name.set(new_base_name)
                 output_name = new_base_name
-                
-                output_dir = os.path.normpath(os.path.join(base_dir, config["output_dir"], output_name))
-                nobg_dir = os.path.normpath(os.path.join(base_dir, config["output_dir"], output_name + "_nobg"))
-                processed_dir = os.path.normpath(os.path.join(base_dir, config["processed_dir"], output_name))
+                output_dir, nobg_dir, processed_dir, _ = self.output_paths(output_name)
+                final_video_path = new_name
+        
+        job.update(video_path=video_path, output_name=output_name, output_dir=output_dir, nobg_dir=nobg_dir,
+                   processed_dir=processed_dir, final_video_path=final_video_path)
+        return job
+    
+    def show_error(self, message):
+        """Show an error dialog on the Tk thread; safe to call from any thread"""
+        self.app.events.call(messagebox.showerror, "Error", message)
+    
+    def offer_to_open_folder(self, folder):
+        """Ask on the Tk thread whether to open the output folder"""
+        def ask():
+            if messagebox.askyesno("Open Folder", "Would you like to open the output folder?"):
+                os.startfile(folder)
+        self.app.events.call(ask)
+    
+    def process_video(self, job):
+        """
+        Process a job from prepare_job on the worker thread
+        
+        Nothing here touches Tk: logs, progress, button states and dialogs
+        are all posted through the UI event bus.
+        """
+        output_name = job["output_name"]
+        output_dir, nobg_dir, processed_dir = job["output_dir"], job["nobg_dir"], job["processed_dir"]
+        final_video_path = job["final_video_path"]
+        streaming = job["streaming"]
         
         try:
-            os.makedirs(output_dir, exist_ok=True)
-            self.update_log(f"Created directory: {output_dir}")
+            if not streaming or job["export_original_frames"]:
+                os.makedirs(output_dir, exist_ok=True)
+                self.update_log(f"Created directory: {output_dir}")
             
-            if self.app.export_nobg_frames.get() or self.app.export_processed_frames.get() or self.app.create_final_video.get():
+            if (job["export_nobg_frames"] or
+                    (not streaming and (job["export_processed_frames"] or job["create_final_video"]))):
                 os.makedirs(nobg_dir, exist_ok=True)
                 self.update_log(f"Created directory: {nobg_dir}")
             
-            if self.app.export_processed_frames.get() or self.app.create_final_video.get():
+            if job["export_processed_frames"] or (not streaming and job["create_final_video"]):
                 os.makedirs(processed_dir, exist_ok=True)
                 self.update_log(f"Created directory: {processed_dir}")
             
-            if self.app.create_final_video.get():
+            if job["create_final_video"]:
                 os.makedirs(os.path.dirname(final_video_path), exist_ok=True)
                 self.update_log(f"Created directory: {os.path.dirname(final_video_path)}")
         except Exception as e:
             self.update_log(f"Error creating directories: {str(e)}", "error")
-            messagebox.showerror("Error", f"Failed to create required directories:\n{str(e)}")
-            self.app.process_btn.config(state="normal")
-            self.app.reset_btn.config(state="normal")
+            self.show_error(f"Failed to create required directories:\n{str(e)}")
+            self.set_buttons_state("normal")
             return
-            
-        fps = self.app.fps.get()
-        edge_threshold = [self.app.edge_min.get(), self.app.edge_max.get()]
-        distortion_strength = self.app.distortion.get()
-        
-        self.app.process_btn.config(state="disabled")
-        self.app.reset_btn.config(state="disabled")
         
+        metrics = None
         try:
-            import core
             self.update_log("Starting video processing...", "info")
             
-            if self.app.export_original_frames.get() or self.app.export_nobg_frames.get() or self.app.export_processed_frames.get() or self.app.create_final_video.get():
-                self.update_progress(5, "Extracting frames...")
-                core.extract_frames(video_path, fps, output_dir)
-                self.update_log("Frames extracted successfully.", "success")
+            metrics = JobMetrics(output_name, on_update=self.on_metrics_update)
+            if streaming:
+                self.run_streaming_pipeline(job, metrics)
             else:
-                self.update_log("No processing options selected.", "error")
-                self.update_progress(0, "Ready")
-                self.app.process_btn.config(state="normal")
-                self.app.reset_btn.config(state="normal")
-                return
-            
-            if self.app.export_nobg_frames.get() or self.app.export_processed_frames.get() or self.app.create_final_video.get():
-                self.update_progress(30, "Removing background...")
-                core.remove_background(output_dir, nobg_dir)
-                self.update_log("Background removed successfully.", "success")
-            
-            if self.app.export_processed_frames.get() or self.app.create_final_video.get():
-                self.update_progress(60, "Applying selected art style...")
-                
-                custom_params = None
-                if self.app.selected_style.get() == "custom":
-                    custom_params = self.get_custom_params()
-
-                if hasattr(core.apply_converter_style, '__code__') and core.apply_converter_style.__code__.co_argcount > 4:
-                    core.apply_converter_style(
-                        nobg_dir, 
-                        edge_threshold, 
-                        distortion_strength, 
-                        processed_dir,
-                        self.app.selected_style.get(),
-                        custom_params
-                    )
-                else:
-                    core.apply_converter_style(nobg_dir, edge_threshold, distortion_strength, processed_dir)
-                
-                self.update_log(f"Applied {self.app.selected_style.get()} style successfully.", "success")
-            
-            if self.app.create_final_video.get():
-                self.update_progress(90, "Reassembling video...")
-                core.reassemble_video(processed_dir, fps, final_video_path)
-                self.update_log(f"Video saved as {final_video_path}", "success")
+                checkpoint_path = None
+                if config.get("resume_jobs", True):
+                    checkpoint_path = os.path.join(self.get_base_dir(), config.get("checkpoint_dir", "checkpoints"),
+                                                   output_name + ".json")
+                self.run_staged_pipeline(job, metrics, checkpoint_path)
             
             self.update_progress(100, "Completed!")
+            self.write_job_metrics(metrics, output_name)
             
             completion_msg = "Processing completed!\n"
-            if self.app.export_original_frames.get():
+            if job["export_original_frames"]:
                 completion_msg += f"- Original frames saved to: {output_dir}\n"
-            if self.app.export_nobg_frames.get():
+            if job["export_nobg_frames"]:
                 completion_msg += f"- No-background frames saved to: {nobg_dir}\n"
-            if self.app.export_processed_frames.get():
+            if job["export_processed_frames"]:
                 completion_msg += f"- Processed frames saved to: {processed_dir}\n"
-            if self.app.create_final_video.get():
+            if job["create_final_video"]:
                 completion_msg += f"- Final video saved to: {final_video_path}"
                 
-            messagebox.showinfo("Success", completion_msg)
+            self.app.events.call(messagebox.showinfo, "Success", completion_msg)
             
-            if not self.app.export_original_frames.get() and os.path.exists(output_dir):
+            if not job["export_original_frames"] and os.path.exists(output_dir):
                 self.update_log("Cleaning up original frames...", "info")
                 try:
                     shutil.rmtree(output_dir)
@@ -256,7 +376,7 @@ class AppFunctions:
                 except Exception as e:
                     self.update_log(f"Error removing original frames: {str(e)}", "error")
             
-            if not self.app.export_nobg_frames.get() and os.path.exists(nobg_dir):
+            if not job["export_nobg_frames"] and os.path.exists(nobg_dir):
                 self.update_log("Cleaning up no-background frames...", "info")
                 try:
                     shutil.rmtree(nobg_dir)
@@ -264,14 +384,14 @@ class AppFunctions:
                 except Exception as e:
                     self.update_log(f"Error removing no-background frames: {str(e)}", "error")
             
-            if not self.app.export_processed_frames.get() and not self.app.create_final_video.get() and os.path.exists(processed_dir):
+            if not job["export_processed_frames"] and not job["create_final_video"] and os.path.exists(processed_dir):
                 self.update_log("Cleaning up processed frames...", "info")
                 try:
                     shutil.rmtree(processed_dir)
                     self.update_log("Processed frames removed.", "success")
                 except Exception as e:
                     self.update_log(f"Error removing processed frames: {str(e)}", "error")
-            elif not self.app.export_processed_frames.get() and self.app.create_final_video.get() and os.path.exists(processed_dir):
+            elif not job["export_processed_frames"] and job["create_final_video"] and os.path.exists(processed_dir):
                 self.update_log("Cleaning up processed frames after video creation...", "info")
                 try:
                     shutil.rmtree(processed_dir)
@@ -279,23 +399,217 @@ class AppFunctions:
                 except Exception as e:
                     self.update_log(f"Error removing processed frames: {str(e)}", "error")
             
-            if messagebox.askyesno("Open Folder", "Would you like to open the output folder?"):
-                if self.app.create_final_video.get():
-                    os.startfile(os.path.dirname(final_video_path))
-                elif self.app.export_processed_frames.get():
-                    os.startfile(processed_dir)
-                elif self.app.export_nobg_frames.get():
-                    os.startfile(nobg_dir)
-                else:
-                    os.startfile(output_dir)
+            if job["create_final_video"]:
+                self.offer_to_open_folder(os.path.dirname(final_video_path))
+            elif job["export_processed_frames"]:
+                self.offer_to_open_folder(processed_dir)
+            elif job["export_nobg_frames"]:
+                self.offer_to_open_folder(nobg_dir)
+            else:
+                self.offer_to_open_folder(output_dir)
                 
         except Exception as e:
             self.update_log(f"Error during processing: {str(e)}", "error")
-            messagebox.showerror("Error", f"An error occurred during processing:\n{str(e)}")
+            if metrics:
+                self.write_job_metrics(metrics, output_name)
+            self.show_error(f"An error occurred during processing:\n{str(e)}")
             self.update_progress(0, "Failed")
         finally:
-            self.app.process_btn.config(state="normal")
-            self.app.reset_btn.config(state="normal")
+            self.set_buttons_state("normal")
+    
+    def on_metrics_update(self, stage):
+        """Show per-frame progress, throughput and ETA for the running stage"""
+        start, end, label = STAGE_PROGRESS.get(stage.name, (0, 100, stage.name))
+        fraction = stage.fraction or 0.0
+        status_text = f"{label}..."
+        if stage.total_frames:
+            status_text += f" {stage.frames_done}/{stage.total_frames} frames"
+        if stage.frames_done:
+            status_text += f", {stage.fps:.1f} fps, ETA {format_eta(stage.eta)}"
+        if stage.queues:
+            depths = " ".join(f"{name} {queue['depth']}/{stage.queue_capacity}" for name, queue in stage.queues.items())
+            status_text += f" (queues: {depths}; bottleneck: {stage.bottleneck})"
+        self.update_progress(start + (end - start) * fraction, status_text)
+    
+    def write_job_metrics(self, metrics, output_name):
+        """Write the job's per-stage metrics next to the other outputs"""
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        metrics_path = os.path.join(self.get_base_dir(), config.get("metrics_dir", "metrics"),
+                                    f"{output_name}_{timestamp}.json")
+        try:
+            metrics.write(metrics_path)
+            summary = metrics.summary()
+            self.update_log(f"Metrics written to {metrics_path} (slowest stage: {summary['hot_stage']}).")
+        except Exception as e:
+            self.update_log(f"Error writing metrics: {str(e)}", "error")
+    
+    def run_staged_pipeline(self, job, metrics=None, checkpoint_path=None):
+        """
+        Run each stage over the whole video, passing frames between stages as PNG folders
+        
+        With a checkpoint_path the job resumes where an earlier run of the same
+        output name stopped: finished stages are skipped and interrupted ones
+        only process the frames that are missing or stale. With frame_store set
+        to "raw" the frames are kept in memory-mapped stores under
+        frame_store_dir instead (bypassing the frame cache), and PNGs are only
+        written for the stages whose export box is ticked.
+        """
+        import core
+        
+        video_path, fps, final_video_path = job["video_path"], job["fps"], job["final_video_path"]
+        output_dir, nobg_dir, processed_dir = job["output_dir"], job["nobg_dir"], job["processed_dir"]
+        edge_threshold, distortion_strength = job["edge_threshold"], job["distortion_strength"]
+        need_nobg = job["export_nobg_frames"] or job["export_processed_frames"] or job["create_final_video"]
+        rembg_model = config.get("rembg_model", "u2net")
+        
+        style_name, custom_params = job["style_name"], job["custom_params"]
+        pixel_size, noise_level = 1, 0
+        plan = core.plan_low_res(style_name, custom_params) if job["low_res"] else None
+        if plan:
+            pixel_size, custom_params, noise_level = plan
+            style_name = "custom"
+            self.update_log(f"Low-resolution mode: processing frames at 1/{pixel_size} size.")
+        
+        raw_store = config.get("frame_store", "png") == "raw"
+        if raw_store:
+            store_dir = os.path.join(self.get_base_dir(), config.get("frame_store_dir", "frame_store"),
+                                     os.path.basename(processed_dir))
+            frames, nobg, processed = core.open_stage_stores(store_dir, capacity=core.probe_frame_count(video_path, fps))
+        else:
+            frames, nobg, processed = (core.open_frame_store(directory)
+                                       for directory in (output_dir, nobg_dir, processed_dir))
+        
+        stages = {}
+        if checkpoint_path:
+            stages = core.open_checkpoint(checkpoint_path, video_path, fps, frames, nobg, processed,
+                                          final_video_path, edge_threshold, distortion_strength, style_name,
+                                          custom_params, pixel_size, noise_level)
+        extract_done = "extract_frames" in stages and stages["extract_frames"].is_complete()
+        nobg_done = "remove_background" in stages and stages["remove_background"].is_complete()
+        
+        cache = None if raw_store else core.get_frame_cache(self.get_base_dir())
+        video_hash = cache.video_hash(video_path) if cache else None
+        cached_nobg = None
+        if cache and need_nobg and not nobg_done:
+            cached_nobg = cache.lookup(video_hash, fps, rembg_model, pixel_size)
+        
+        if extract_done and (job["export_original_frames"] or not (nobg_done or cached_nobg)):
+            self.update_log("Resumed: frames already extracted.", "success")
+        elif job["export_original_frames"] or not (nobg_done or cached_nobg):
+            cached_frames = cache.lookup(video_hash, fps, pixel_size=pixel_size) if cache else None
+            if cached_frames:
+                self.update_progress(5, "Restoring cached frames...")
+                cache.restore(cached_frames, output_dir)
+                self.update_log("Reused cached frames, skipped extraction.", "success")
+            else:
+                self.update_progress(5, "Extracting frames...")
+                core.extract_frames(video_path, fps, frames, metrics, pixel_size)
+                self.update_log("Frames extracted successfully.", "success")
+                if cache:
+                    cache.store(video_hash, fps, output_dir, pixel_size=pixel_size)
+            if stages:
+                stages["extract_frames"].mark_done(*frames.names())
+                stages["extract_frames"].complete()
+        
+        if need_nobg:
+            if nobg_done:
+                self.update_log("Resumed: background already removed.", "success")
+            elif cached_nobg:
+                self.update_progress(30, "Restoring cached background-removed frames...")
+                cache.restore(cached_nobg, nobg_dir)
+                self.update_log("Reused cached background-removed frames, skipped background removal.", "success")
+                if stages:
+                    stages["remove_background"].mark_done(*nobg.names())
+                    stages["remove_background"].complete()
+            else:
+                self.update_progress(30, "Removing background...")
+                stats = core.remove_background(frames, nobg, config.get("rembg_batch_size", 1), metrics,
+                                               stages.get("remove_background"))
+                self.update_log(f"Background removed successfully ({stats['fps']:.2f} frames/sec, "
+                                f"{stats['skipped']} duplicate frames skipped).", "success")
+                if cache:
+                    cache.store(video_hash, fps, nobg_dir, rembg_model, pixel_size)
+        
+        if job["export_processed_frames"] or job["create_final_video"]:
+            if "apply_converter_style" in stages and stages["apply_converter_style"].is_complete():
+                self.update_log("Resumed: style already applied.", "success")
+            else:
+                self.update_progress(60, "Applying selected art style...")
+                
+                if hasattr(core.apply_converter_style, '__code__') and core.apply_converter_style.__code__.co_argcount > 4:
+                    stats = core.apply_converter_style(
+                        nobg, 
+                        edge_threshold, 
+                        distortion_strength, 
+                        processed,
+                        style_name,
+                        custom_params,
+                        config.get("style_workers", 1),
+                        metrics,
+                        stages.get("apply_converter_style")
+                    )
+                    if stats and stats["skipped"]:
+                        self.update_log(f"Reused styled frames for {stats['skipped']} duplicate frames.")
+                else:
+                    core.apply_converter_style(nobg, edge_threshold, distortion_strength, processed)
+                
+                self.update_log(f"Applied {job['style_name']} style successfully.", "success")
+        
+        if job["create_final_video"]:
+            encode_stage = stages.get("reassemble_video")
+            if encode_stage and encode_stage.is_complete() and os.path.exists(final_video_path):
+                self.update_log(f"Resumed: video already saved as {final_video_path}", "success")
+            else:
+                self.update_progress(90, "Reassembling video...")
+                output = core.reassemble_video(processed, fps, final_video_path, metrics, pixel_size, noise_level,
+                                               core.probe_video(video_path) if plan else None)
+                if encode_stage:
+                    encode_stage.complete()
+                self.log_saved_output(final_video_path, output["bytes"], output["seconds"])
+        
+        if raw_store:
+            for export, store, directory in ((job["export_original_frames"], frames, output_dir),
+                                             (job["export_nobg_frames"], nobg, nobg_dir),
+                                             (job["export_processed_frames"], processed, processed_dir)):
+                if export:
+                    self.update_log(f"Exporting frames to {directory}...")
+                    store.export_png(directory)
+                store.delete()
+    
+    def run_streaming_pipeline(self, job, metrics=None):
+        """Stream frames through every stage in memory, writing only the requested exports"""
+        import core
+        
+        final_video_path = job["final_video_path"]
+        self.update_progress(5, "Streaming frames through the pipeline...")
+        frame_count = core.process_video_stream(
+            job["video_path"],
+            job["fps"],
+            final_video_path if job["create_final_video"] else None,
+            job["edge_threshold"],
+            job["distortion_strength"],
+            job["style_name"],
+            job["custom_params"],
+            original_dir=job["output_dir"] if job["export_original_frames"] else None,
+            nobg_dir=job["nobg_dir"] if job["export_nobg_frames"] else None,
+            processed_dir=job["processed_dir"] if job["export_processed_frames"] else None,
+            remove_bg=job["export_nobg_frames"] or job["export_processed_frames"] or job["create_final_video"],
+            batch_size=config.get("rembg_batch_size", 1),
+            metrics=metrics,
+            low_res=job["low_res"]
+        )
+        skipped = metrics.stages[-1].skipped if metrics and metrics.stages else 0
+        self.update_log(f"Streamed {frame_count} frames ({skipped} duplicate frames skipped).", "success")
+        if job["create_final_video"]:
+            if metrics and metrics.outputs:
+                self.log_saved_output(final_video_path, metrics.outputs[-1]["bytes"], metrics.outputs[-1]["encode_seconds"])
+            else:
+                self.update_log(f"Video saved as {final_video_path}", "success")
+    
+    def log_saved_output(self, final_video_path, size_bytes, encode_seconds):
+        """Log the saved output with its size and encode time, for comparing output formats"""
+        self.update_log(f"Video saved as {final_video_path} ({size_bytes / 1024 ** 2:.2f} MB, "
+                        f"encoded in {encode_seconds:.2f}s)", "success")
     
     def reset_form(self):
         """Reset all form fields to their default values"""
@@ -311,6 +625,7 @@ class AppFunctions:
         self.app.selected_style.set(config.get("default_style", "faith"))
         self.app.pixel_size.set(4)
         self.app.use_dithering.set(True)
+        self.app.dither_mode.set("floyd_steinberg")
         self.app.contrast.set(1.5)
         self.app.noise_level.set(0.2)
         self.app.progress_var.set(0)
@@ -2,8 +2,11 @@ import tkinter as tk
 import os
 import sys
 import json
+import time
+import style_catalog
 from .ui_builder import UIBuilder
 from .app_functions import AppFunctions
+from .ui_events import UIEventBus
 from .app_styles import setup_styles, DARK_BG
 
 def resource_path(relative_path):
@@ -24,7 +27,7 @@ class ConverterApp(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title(config.get("app_title", "Video Converter"))
-        self.geometry("900x700")
+        self.geometry("960x760")
         self.configure(bg=DARK_BG)
         self.minsize(800, 600)
         
@@ -43,11 +46,23 @@ class ConverterApp(tk.Tk):
         self.initialize_variables()
         
         self.functions = AppFunctions(self)
+        self.events = UIEventBus(self, self.functions.append_logs, self.functions.apply_progress,
+                                 config.get("ui_fps", 30))
+        self.events.start()
         
         self.ui_builder = UIBuilder(self)
         self.ui_builder.create_widgets()
+        self.functions.setup_preview()
         
         self.update_log("Application started. Ready to process videos.")
+        
+        if config.get("warm_start", True):
+            self.after_idle(self.functions.start_background_warmup)
+    
+    def report_startup_time(self, start_time):
+        """Log how long it took from launch until the window was ready"""
+        startup_ms = (time.perf_counter() - start_time) * 1000
+        self.update_log(f"Window ready in {startup_ms:.0f} ms.")
     
 
     def update_log(self, log_text, level="info"):
@@ -84,16 +99,20 @@ class ConverterApp(tk.Tk):
         self.edge_max = tk.IntVar(value=config["edge_threshold"][1])
         self.distortion = tk.DoubleVar(value=config["distortion_strength"])
         
-        import core
-        self.available_styles = core.get_available_styles() if hasattr(core, 'get_available_styles') else ["faith", "classic_pixel", "glitch", "legacy_edge"]
+        self.available_styles = style_catalog.get_available_styles(config)
         self.selected_style = tk.StringVar(value=config.get("default_style", "faith"))
         
         self.pixel_size = tk.IntVar(value=4)
         self.use_dithering = tk.BooleanVar(value=True)
+        self.dither_mode = tk.StringVar(value="floyd_steinberg")
         self.contrast = tk.DoubleVar(value=1.5)
         self.noise_level = tk.DoubleVar(value=0.2)
         
         self.export_original_frames = tk.BooleanVar(value=False)
         self.export_nobg_frames = tk.BooleanVar(value=True)
         self.export_processed_frames = tk.BooleanVar(value=False)
-        self.create_final_video = tk.BooleanVar(value=True)
\ No newline at end of file
+        self.create_final_video = tk.BooleanVar(value=True)
+        self.streaming_mode = tk.BooleanVar(value=config.get("streaming_mode", False))
+        self.low_res_mode = tk.BooleanVar(value=config.get("low_res_mode", False))
+        
+        self.preview_position = tk.DoubleVar(value=0)
\ No newline at end of file
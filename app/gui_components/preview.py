@@ -0,0 +1,116 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class PreviewRenderer:
+    """
+    Renders single-frame style previews on a background thread
+
+    The frame at the requested position is decoded and background-removed once,
+    then cached, so changing the style or its parameters only re-runs styling.
+    Only the newest request is kept; older ones that were never started are
+    dropped. Results are picked up by the Tk thread with take_result().
+    """
+
+    def __init__(self, max_size=(400, 225), cache_frames=8):
+        self.max_size = max_size
+        self.cache_frames = cache_frames
+        self._frames = OrderedDict()
+        self._durations = {}
+        self._request = None
+        self._result = None
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def request(self, video_path, position, style_name, custom_params, edge_threshold, distortion_strength):
+        """Queue a render of the frame at position (0-100% of the video), replacing any pending request"""
+        with self._condition:
+            self._request = (video_path, position, style_name, custom_params, edge_threshold, distortion_strength)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def take_result(self):
+        """Return the newest finished render as a dict, or None if nothing new is ready"""
+        with self._condition:
+            result, self._result = self._result, None
+        return result
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._request is None:
+                    self._condition.wait()
+                request, self._request = self._request, None
+            start_time = time.perf_counter()
+            try:
+                image, styled_ms = self._render(*request)
+                result = {"image": image, "styled_ms": styled_ms,
+                          "total_ms": (time.perf_counter() - start_time) * 1000, "error": None}
+            except Exception as e:
+                result = {"image": None, "styled_ms": None, "total_ms": None, "error": str(e)}
+            with self._condition:
+                self._result = result
+
+    def _source_frame(self, video_path, position):
+        """Background-removed frame at position, decoded and segmented only on the first request"""
+        import core
+
+        key = (video_path, round(position, 1))
+        if key in self._frames:
+            self._frames.move_to_end(key)
+            return self._frames[key]
+
+        if video_path not in self._durations:
+            self._durations[video_path] = core.probe_duration(video_path) or 0.0
+        duration = self._durations[video_path]
+        seconds = min(duration * position / 100, max(0.0, duration - 0.1))
+        frame = core.extract_frame_at(video_path, seconds)
+        if frame is None:
+            frame = core.extract_frame_at(video_path, 0)
+        frame = core.remove_background_frame(frame)
+
+        self._frames[key] = frame
+        while len(self._frames) > self.cache_frames:
+            self._frames.popitem(last=False)
+        return frame
+
+    def _render(self, video_path, position, style_name, custom_params, edge_threshold, distortion_strength):
+        """
+        Style the cached frame and fit it to max_size as an RGB array
+
+        Grid styles are styled at their pixel-grid resolution and enlarged with
+        nearest-neighbour, like low-resolution mode, which keeps renders of
+        large frames fast. Faith noise is then added at preview resolution.
+        Palette styles get a shared palette sampled from the frame, as in a run
+        (see core.plan_palette).
+        """
+        import cv2
+        import numpy as np
+        import core
+
+        frame = self._source_frame(video_path, position)
+        height, width = frame.shape[:2]
+        scale = min(self.max_size[0] / width, self.max_size[1] / height, 1.0)
+        display_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+        styled_start = time.perf_counter()
+        plan = core.plan_low_res(style_name, custom_params)
+        if plan:
+            pixel_size, native_params, noise_level = plan
+            grid = cv2.resize(frame, (max(1, width // pixel_size), max(1, height // pixel_size)),
+                              interpolation=cv2.INTER_NEAREST_EXACT)
+            style_name, native_params = core.plan_palette("custom", native_params, [grid])
+            result = core.style_frame(grid, edge_threshold, distortion_strength, style_name, native_params)
+            result = cv2.resize(result[:, :, :3], display_size, interpolation=cv2.INTER_NEAREST)
+            if int(noise_level * 255) > 0:
+                result = cv2.add(result, core.art_processor.noise.uniform(result.shape, int(noise_level * 255)))
+        else:
+            style_name, custom_params = core.plan_palette(style_name, custom_params, [frame])
+            result = core.style_frame(frame, edge_threshold, distortion_strength, style_name, custom_params)
+            result = cv2.resize(result[:, :, :3], display_size, interpolation=cv2.INTER_AREA)
+        styled_ms = (time.perf_counter() - styled_start) * 1000
+
+        return cv2.cvtColor(np.ascontiguousarray(result), cv2.COLOR_BGR2RGB), styled_ms
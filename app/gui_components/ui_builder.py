@@ -87,6 +87,14 @@ class UIBuilder:
         create_video_check = ttk.Checkbutton(options_frame, text="Create Final Video", 
                                            variable=self.app.create_final_video, style='TCheckbutton')
         create_video_check.pack(anchor=tk.W, pady=2)
+        
+        streaming_check = ttk.Checkbutton(options_frame, text="Streaming Mode (no intermediate frames)", 
+                                        variable=self.app.streaming_mode, style='TCheckbutton')
+        streaming_check.pack(anchor=tk.W, pady=2)
+        
+        low_res_check = ttk.Checkbutton(options_frame, text="Low-Resolution Processing (upscale at encode)", 
+                                      variable=self.app.low_res_mode, style='TCheckbutton')
+        low_res_check.pack(anchor=tk.W, pady=2)
     
     def create_params_frame(self):
         """Create the parameters frame with sliders"""
@@ -180,6 +188,15 @@ class UIBuilder:
                                       variable=self.app.use_dithering, style='TCheckbutton')
         dither_check.pack(anchor=tk.W)
         
+        dither_mode_frame = tk.Frame(self.app.custom_params_frame, bg=LIGHT_BG, pady=5)
+        dither_mode_frame.pack(fill=tk.X)
+        tk.Label(dither_mode_frame, text="Dither Mode:", width=15, anchor=tk.W,
+                bg=LIGHT_BG, fg=TEXT_COLOR, font=FONT).pack(side=tk.LEFT)
+        dither_mode_combobox = ttk.Combobox(dither_mode_frame, textvariable=self.app.dither_mode,
+                                           values=["floyd_steinberg", "atkinson", "bayer2", "bayer4", "bayer8", "blue_noise"],
+                                           state="readonly")
+        dither_mode_combobox.pack(side=tk.RIGHT, fill=tk.X, expand=True)
+        
         contrast_frame = tk.Frame(self.app.custom_params_frame, bg=LIGHT_BG, pady=5)
         contrast_frame.pack(fill=tk.X)
         tk.Label(contrast_frame, text="Contrast:", width=15, anchor=tk.W,
@@ -210,9 +227,37 @@ class UIBuilder:
         self.right_panel = ttk.Frame(self.main_frame)
         self.right_panel.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=(10, 0))
         
+        self.create_preview_frame()
         self.create_progress_frame()
         self.create_logs_frame()
     
+    def create_preview_frame(self):
+        """Create the single-frame style preview"""
+        preview_frame = tk.Frame(self.right_panel, bg=LIGHT_BG, padx=15, pady=15)
+        preview_frame.pack(fill=tk.X, pady=(0, 15))
+        
+        tk.Label(preview_frame, text="Preview", font=FONT, bg=LIGHT_BG, fg=TEXT_COLOR).pack(anchor=tk.W)
+        
+        self.app.preview_label = tk.Label(preview_frame, text="Select a video to preview the style",
+                                          font=FONT, bg=DARK_BG, fg=TEXT_COLOR, height=10)
+        self.app.preview_label.pack(fill=tk.X, pady=(5, 5))
+        
+        position_frame = tk.Frame(preview_frame, bg=LIGHT_BG)
+        position_frame.pack(fill=tk.X)
+        
+        tk.Label(position_frame, text="Position (%):", width=15, anchor=tk.W,
+                bg=LIGHT_BG, fg=TEXT_COLOR, font=FONT).pack(side=tk.LEFT)
+        
+        position_slider = tk.Scale(position_frame, from_=0, to=100, variable=self.app.preview_position,
+                                  orient=tk.HORIZONTAL, bg=LIGHT_BG, fg=TEXT_COLOR,
+                                  highlightthickness=0, bd=0, sliderrelief=tk.FLAT,
+                                  activebackground=ACCENT_COLOR, troughcolor=DARK_BG)
+        position_slider.pack(side=tk.RIGHT, fill=tk.X, expand=True)
+        
+        self.app.preview_status = tk.Label(preview_frame, text="", font=("Segoe UI", 8),
+                                           bg=LIGHT_BG, fg=TEXT_COLOR)
+        self.app.preview_status.pack(anchor=tk.W)
+    
     def create_progress_frame(self):
         """Create the progress bar and status label"""
         progress_frame = tk.Frame(self.right_panel, bg=LIGHT_BG, padx=15, pady=15)
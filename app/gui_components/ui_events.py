@@ -0,0 +1,63 @@
+import queue
+import datetime
+
+
+class UIEventBus:
+    """
+    Thread-safe channel from worker threads to the Tk main loop
+
+    Any thread may post log lines, progress updates or widget calls; nothing
+    touches Tk until the main loop drains the queue, fps times a second. Each
+    drain applies every pending log line in one batch, only the newest progress
+    update, and then the queued calls in order.
+    """
+
+    def __init__(self, root, apply_logs, apply_progress, fps=30):
+        self.root = root
+        self.apply_logs = apply_logs
+        self.apply_progress = apply_progress
+        self.interval_ms = max(1, int(1000 / fps))
+        self._queue = queue.SimpleQueue()
+
+    def start(self):
+        self.root.after(self.interval_ms, self._drain)
+
+    def log(self, text, level="info"):
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        self._queue.put(("log", (timestamp, text, level)))
+
+    def progress(self, value, status_text=None):
+        self._queue.put(("progress", (value, status_text)))
+
+    def call(self, func, *args, **kwargs):
+        """Run func on the Tk thread at the next drain"""
+        self._queue.put(("call", (func, args, kwargs)))
+
+    def _drain(self):
+        logs = []
+        progress = None
+        status_text = None
+        calls = []
+        while True:
+            try:
+                kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                logs.append(payload)
+            elif kind == "progress":
+                progress = payload[0]
+                # Keep the last status text even when a later update only moves the bar
+                status_text = payload[1] or status_text
+            else:
+                calls.append(payload)
+
+        try:
+            if logs:
+                self.apply_logs(logs)
+            if progress is not None:
+                self.apply_progress(progress, status_text)
+            for func, args, kwargs in calls:
+                func(*args, **kwargs)
+        finally:
+            self.root.after(self.interval_ms, self._drain)
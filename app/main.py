@@ -1,3 +1,6 @@
+import time
+START_TIME = time.perf_counter()
+
 import os
 import sys
 import traceback
@@ -9,6 +12,7 @@ def main():
         from gui import ConverterApp
         
         app = ConverterApp()
+        app.after_idle(app.report_startup_time, START_TIME)
         app.mainloop()
     except Exception as e:
         error_message = f"Error starting application: {str(e)}\n\n{traceback.format_exc()}"
@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import threading
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if it cannot be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class StageMetrics:
+    """Frames done, per-frame latency, wall time and memory for one pipeline stage"""
+
+    def __init__(self, name, total_frames=None):
+        self.name = name
+        self.total_frames = total_frames
+        self.frames_done = 0
+        self.skipped = 0
+        self.latencies = []
+        self.start_time = time.perf_counter()
+        self.end_time = None
+        self.peak_rss = current_rss()
+        self.queues = {}
+        self.queue_capacity = None
+        self._last_frame_time = self.start_time
+
+    @property
+    def elapsed(self):
+        return (self.end_time or time.perf_counter()) - self.start_time
+
+    @property
+    def fps(self):
+        elapsed = self.elapsed
+        return self.frames_done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def fraction(self):
+        """Completed fraction of the stage, or None when the frame total is unknown"""
+        if not self.total_frames:
+            return None
+        return min(1.0, self.frames_done / self.total_frames)
+
+    @property
+    def eta(self):
+        """Estimated seconds left in the stage, or None until there is a rate and a total"""
+        if not self.total_frames or not self.frames_done:
+            return None
+        return max(0, self.total_frames - self.frames_done) / self.fps
+
+    def frame_done(self, latency=None, count=1):
+        now = time.perf_counter()
+        if latency is None:
+            latency = (now - self._last_frame_time) / count
+        self._last_frame_time = now
+        self.frames_done += count
+        self.latencies.extend([latency] * count)
+        rss = current_rss()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def frame_skipped(self, count=1):
+        """Count frames whose result was reused instead of computed; they add no latency samples"""
+        self._last_frame_time = time.perf_counter()
+        self.frames_done += count
+        self.skipped += count
+
+    def queue_sample(self, depths, capacity=None):
+        """Record how many items wait in each pipeline queue, keyed by the stage that reads it"""
+        self.queue_capacity = capacity
+        for name, depth in depths.items():
+            queue = self.queues.setdefault(name, {"depth": 0, "total": 0, "samples": 0, "max": 0})
+            queue["depth"] = depth
+            queue["total"] += depth
+            queue["samples"] += 1
+            queue["max"] = max(queue["max"], depth)
+
+    @property
+    def bottleneck(self):
+        """Stage whose input queue was fullest on average, or None without queue samples"""
+        if not self.queues:
+            return None
+        return max(self.queues, key=lambda name: self.queues[name]["total"] / self.queues[name]["samples"])
+
+    def finish(self):
+        self.end_time = time.perf_counter()
+
+    def summary(self):
+        latencies = self.latencies
+        summary = {
+            "stage": self.name,
+            "frames": self.frames_done,
+            "skipped": self.skipped,
+            "total_frames": self.total_frames,
+            "seconds": self.elapsed,
+            "fps": self.fps,
+            "latency_ms": {
+                "mean": sum(latencies) / len(latencies) * 1000 if latencies else None,
+                "p50": percentile(latencies, 50) * 1000 if latencies else None,
+                "p90": percentile(latencies, 90) * 1000 if latencies else None,
+                "p99": percentile(latencies, 99) * 1000 if latencies else None,
+                "max": max(latencies) * 1000 if latencies else None,
+            },
+            "peak_rss_mb": self.peak_rss / 1024 ** 2 if self.peak_rss else None,
+        }
+        if self.queues:
+            summary["queues"] = {name: {"mean_depth": queue["total"] / queue["samples"], "max_depth": queue["max"],
+                                        "capacity": self.queue_capacity}
+                                 for name, queue in self.queues.items()}
+            summary["bottleneck"] = self.bottleneck
+        return summary
+
+
+class JobMetrics:
+    """
+    Metrics for one conversion job that the core stages emit to
+
+    on_update is called with the current StageMetrics whenever a stage starts
+    or ends, and at most every update_interval seconds as frames complete.
+    """
+
+    def __init__(self, job_name, on_update=None, update_interval=0.1):
+        self.job_name = job_name
+        self.on_update = on_update
+        self.update_interval = update_interval
+        self.stages = []
+        self.outputs = []
+        self.current = None
+        self.start_time = time.perf_counter()
+        self._last_update = 0.0
+        self._lock = threading.Lock()
+
+    def start_stage(self, name, total_frames=None):
+        with self._lock:
+            self.current = StageMetrics(name, total_frames)
+            self.stages.append(self.current)
+        self._notify(force=True)
+        return self.current
+
+    def end_stage(self):
+        with self._lock:
+            if self.current:
+                self.current.finish()
+        self._notify(force=True)
+
+    def stage(self, name, total_frames=None):
+        """Context manager that times a stage"""
+        return _StageContext(self, name, total_frames)
+
+    def frame_done(self, latency=None, count=1):
+        with self._lock:
+            if self.current:
+                self.current.frame_done(latency, count)
+        self._notify()
+
+    def frame_skipped(self, count=1):
+        with self._lock:
+            if self.current:
+                self.current.frame_skipped(count)
+        self._notify()
+
+    def output_written(self, path, format_name, encode_seconds):
+        """Record a finished output file with its size and how long encoding it took"""
+        with self._lock:
+            self.outputs.append({
+                "path": path,
+                "format": format_name,
+                "bytes": os.path.getsize(path) if os.path.exists(path) else None,
+                "encode_seconds": encode_seconds,
+            })
+
+    def queue_sample(self, depths, capacity=None):
+        """Record the current depth of each pipeline queue (see StageMetrics.queue_sample)"""
+        with self._lock:
+            if self.current:
+                self.current.queue_sample(depths, capacity)
+        self._notify()
+
+    def advance_to(self, frames_done):
+        """Record progress reported as an absolute frame count, e.g. by ffmpeg"""
+        with self._lock:
+            if self.current and frames_done > self.current.frames_done:
+                self.current.frame_done(count=frames_done - self.current.frames_done)
+        self._notify()
+
+    def _notify(self, force=False):
+        if not self.on_update or not self.current:
+            return
+        now = time.perf_counter()
+        if force or now - self._last_update >= self.update_interval:
+            self._last_update = now
+            self.on_update(self.current)
+
+    def summary(self):
+        stages = [stage.summary() for stage in self.stages]
+        return {
+            "job": self.job_name,
+            "seconds": time.perf_counter() - self.start_time,
+            "peak_rss_mb": max((stage["peak_rss_mb"] or 0 for stage in stages), default=None),
+            "hot_stage": max(stages, key=lambda stage: stage["seconds"])["stage"] if stages else None,
+            "stages": stages,
+            "outputs": list(self.outputs),
+        }
+
+    def write(self, path):
+        """Write the job summary as JSON and return the path"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        return path
+
+
+class NullMetrics:
+    """Stand-in used when the caller does not collect metrics"""
+
+    def stage(self, name, total_frames=None):
+        return _StageContext(self, name, total_frames)
+
+    def start_stage(self, name, total_frames=None):
+        return None
+
+    def end_stage(self):
+        pass
+
+    def frame_done(self, latency=None, count=1):
+        pass
+
+    def frame_skipped(self, count=1):
+        pass
+
+    def output_written(self, path, format_name, encode_seconds):
+        pass
+
+    def queue_sample(self, depths, capacity=None):
+        pass
+
+    def advance_to(self, frames_done):
+        pass
+
+
+class _StageContext:
+    def __init__(self, metrics, name, total_frames):
+        self.metrics = metrics
+        self.name = name
+        self.total_frames = total_frames
+
+    def __enter__(self):
+        return self.metrics.start_stage(self.name, self.total_frames)
+
+    def __exit__(self, *exc_info):
+        self.metrics.end_stage()
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
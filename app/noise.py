@@ -0,0 +1,42 @@
+import numpy as np
+
+
+class NoiseSource:
+    """
+    Uniform uint8 noise for the styles
+
+    Draws from a numpy Generator, or with use_bank from a precomputed noise
+    field a little larger than the frame: each call returns a view at a random
+    offset, so a frame's noise costs no RNG and no allocation. The field is
+    built once per (high, channels) and rebuilt only if a larger frame arrives.
+    """
+
+    def __init__(self, seed=None, use_bank=True, margin=128):
+        self.rng = np.random.default_rng(seed)
+        self.use_bank = use_bank
+        self.margin = margin
+        self._banks = {}
+
+    def uniform(self, shape, high):
+        """Noise in [0, high) with the given shape; may be a read-only view, so never write into it"""
+        if not self.use_bank:
+            return self.rng.integers(0, high, shape, dtype=np.uint8)
+
+        height, width = shape[:2]
+        key = (high, shape[2:])
+        bank = self._banks.get(key)
+        if bank is None or bank.shape[0] < height + self.margin or bank.shape[1] < width + self.margin:
+            bank_shape = (height + self.margin, width + self.margin) + tuple(shape[2:])
+            bank = self.rng.integers(0, high, bank_shape, dtype=np.uint8)
+            bank.flags.writeable = False
+            self._banks[key] = bank
+
+        y = int(self.rng.integers(0, bank.shape[0] - height + 1))
+        x = int(self.rng.integers(0, bank.shape[1] - width + 1))
+        return bank[y:y + height, x:x + width]
+
+
+# color: per-pixel, per-channel noise at full size (the original look)
+# mono: one noise value per full-size pixel, shared by the channels
+# grid: per-channel noise at pixel-grid resolution, enlarged with the frame
+NOISE_MODES = ("color", "mono", "grid")
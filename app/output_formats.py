@@ -0,0 +1,52 @@
+import os
+
+
+# File extension written for each output format
+OUTPUT_FORMATS = {"mp4": ".mp4", "gif": ".gif", "webp": ".webp", "apng": ".apng"}
+
+# Lossless formats only used for intermediate files, e.g. segments joined before the final encode
+INTERMEDIATE_FORMATS = {"ffv1": ".mkv"}
+
+
+def output_format(path):
+    """Output format implied by a file's extension; mp4 for anything unrecognized"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".png":
+        return "apng"
+    for format_name, format_extension in {**OUTPUT_FORMATS, **INTERMEDIATE_FORMATS}.items():
+        if extension == format_extension:
+            return format_name
+    return "mp4"
+
+
+def keeps_alpha(format_name):
+    """Whether the format stores the alpha channel left by background removal"""
+    return format_name != "mp4"
+
+
+def encode_args(format_name, video_filter=None, gif_dither="none"):
+    """
+    ffmpeg output options for a format, i.e. everything between the input and the output path
+
+    mp4 is libx264 yuv420p as before. gif uses one global palette generated
+    over the whole clip (one entry reserved for transparency) and stores each
+    frame as the rectangle that changed, with unchanged pixels transparent;
+    frames are usually already quantized, so gif_dither defaults to none.
+    webp is lossless animated WebP and apng is APNG, both with alpha. ffv1
+    is lossless FFV1 in Matroska, with alpha, for intermediate files.
+    """
+    if format_name == "gif":
+        prefix = f"{video_filter}," if video_filter else ""
+        graph = (f"[0:v]{prefix}split[frames][stats];"
+                 "[stats]palettegen=stats_mode=full:reserve_transparent=1[palette];"
+                 f"[frames][palette]paletteuse=dither={gif_dither}:diff_mode=rectangle:alpha_threshold=128")
+        return ["-filter_complex", graph, "-gifflags", "+offsetting+transdiff", "-loop", "0", "-f", "gif"]
+
+    args = ["-vf", video_filter] if video_filter else []
+    if format_name == "webp":
+        return args + ["-c:v", "libwebp_anim", "-lossless", "1", "-pix_fmt", "bgra", "-loop", "0", "-f", "webp"]
+    if format_name == "ffv1":
+        return args + ["-c:v", "ffv1", "-pix_fmt", "bgra", "-f", "matroska"]
+    if format_name == "apng":
+        return args + ["-c:v", "apng", "-plays", "0", "-f", "apng"]
+    return args + ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
@@ -0,0 +1,51 @@
+import numpy as np
+from PIL import Image
+
+
+def build_palette(frames, colors=16, max_pixels=1 << 20):
+    """
+    Median-cut palette shared by a set of RGB frames, as a (colors, 3) uint8 array
+
+    The frames are pooled into one image (subsampled to at most max_pixels) and
+    quantized once with PIL, the same median cut quantize(colors) runs per frame.
+    """
+    pixels = np.concatenate([frame[:, :, :3].reshape(-1, 3) for frame in frames])
+    if len(pixels) > max_pixels:
+        pixels = pixels[::len(pixels) // max_pixels + 1]
+    quantized = Image.fromarray(np.ascontiguousarray(pixels.reshape(-1, 1, 3))).quantize(colors)
+    palette = np.array(quantized.getpalette(), dtype=np.uint8).reshape(-1, 3)
+    # Flat input yields fewer colors than asked for, so keep only the entries in use
+    return palette[np.unique(np.asarray(quantized))]
+
+
+class PaletteLUT:
+    """
+    Maps colors to their nearest palette entry with one 3D lookup table
+
+    The table has 2**bits levels per channel, each cell holding the palette
+    color nearest to the cell's center, so mapping a frame is a single gather
+    instead of a per-pixel nearest-color search.
+    """
+
+    def __init__(self, palette, bits=6):
+        self.palette = np.asarray(palette, dtype=np.uint8).reshape(-1, 3)
+        self.bits = bits
+        self.shift = 8 - bits
+
+        levels = (np.arange(1 << bits, dtype=np.int32) << self.shift) + (1 << self.shift >> 1)
+        grid = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1).reshape(-1, 3)
+        best = np.zeros(len(grid), dtype=np.uint8)
+        best_distance = np.full(len(grid), np.iinfo(np.int32).max, dtype=np.int32)
+        for index, color in enumerate(self.palette.astype(np.int32)):
+            distance = ((grid - color) ** 2).sum(axis=1)
+            closer = distance < best_distance
+            best[closer] = index
+            best_distance[closer] = distance[closer]
+        self.table = self.palette[best]
+
+    def apply(self, img):
+        """Map a 3-channel uint8 array (in the palette's channel order) to palette colors"""
+        channels = img[:, :, :3] >> self.shift
+        index = (channels[:, :, 0].astype(np.int32) << (2 * self.bits)) \
+            | (channels[:, :, 1].astype(np.int32) << self.bits) | channels[:, :, 2]
+        return self.table[index]
@@ -0,0 +1,138 @@
+import queue
+import threading
+
+from metrics import NullMetrics
+
+
+class _Finished:
+    """Marker passed down a queue after the last item"""
+
+
+class PipelineStage:
+    """
+    One step of a pipeline
+
+    fn takes an (index, value) item and returns a list of items for the next
+    stage. workers threads run fn, so stages with more than one worker may
+    finish items out of order.
+    """
+
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+
+def _put(target, item, stop):
+    """Put item on a bounded queue, waiting while it is full; False if the pipeline stopped meanwhile"""
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(source, stop):
+    """Next item from a queue, or _Finished if the pipeline stopped while waiting"""
+    while not stop.is_set():
+        try:
+            return source.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _Finished
+
+
+def run_pipeline(source, stages, sink, queue_size=8, metrics=None, sample_interval=0.1):
+    """
+    Run source, stages and sink concurrently on a stream of (index, value) items
+
+    source is iterated in a thread of its own and every stage runs in its own
+    worker threads; sink is called on the calling thread. A bounded queue of
+    queue_size items sits in front of every stage and the sink, so a stage
+    that falls behind blocks the ones feeding it instead of letting items pile
+    up in memory. Items reach sink in index order starting from 0, each index
+    exactly once, however the stages reorder them. Queue depths, keyed by the
+    stage that reads the queue ("sink" for the last one), are sampled into
+    metrics every sample_interval seconds so the bottleneck shows up as the
+    stage with the fullest input queue. The first exception raised by any
+    thread stops the pipeline and is re-raised here.
+    """
+    metrics = metrics or NullMetrics()
+    names = [stage.name for stage in stages] + ["sink"]
+    queues = [queue.Queue(maxsize=queue_size) for _ in names]
+    stop = threading.Event()
+    errors = []
+
+    def fail(error):
+        errors.append(error)
+        stop.set()
+
+    def feed():
+        try:
+            for item in source:
+                if not _put(queues[0], item, stop):
+                    break
+            _put(queues[0], _Finished, stop)
+        except Exception as e:
+            fail(e)
+        finally:
+            close = getattr(source, "close", None)
+            if close:
+                close()
+
+    def work(stage, inbox, outbox, running):
+        try:
+            while True:
+                item = _get(inbox, stop)
+                if item is _Finished:
+                    # Leave the marker for this stage's other workers; the last one passes it on
+                    _put(inbox, _Finished, stop)
+                    with running["lock"]:
+                        running["count"] -= 1
+                        last = running["count"] == 0
+                    if last:
+                        _put(outbox, _Finished, stop)
+                    return
+                for result in stage.fn(item):
+                    if not _put(outbox, result, stop):
+                        return
+        except Exception as e:
+            fail(e)
+
+    def sample():
+        while not stop.wait(sample_interval):
+            metrics.queue_sample({name: pending.qsize() for name, pending in zip(names, queues)}, queue_size)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for stage, inbox, outbox in zip(stages, queues, queues[1:]):
+        running = {"count": stage.workers, "lock": threading.Lock()}
+        threads += [threading.Thread(target=work, args=(stage, inbox, outbox, running), daemon=True)
+                    for _ in range(stage.workers)]
+    sampler = threading.Thread(target=sample, daemon=True)
+    for thread in threads + [sampler]:
+        thread.start()
+
+    waiting = {}
+    next_index = 0
+    try:
+        while True:
+            item = _get(queues[-1], stop)
+            if item is _Finished:
+                break
+            waiting[item[0]] = item
+            while next_index in waiting:
+                sink(waiting.pop(next_index))
+                next_index += 1
+    except Exception as e:
+        fail(e)
+    finally:
+        stop.set()
+        for thread in threads + [sampler]:
+            thread.join()
+    if errors:
+        raise errors[0]
+    if waiting:
+        raise RuntimeError(f"Pipeline items {sorted(waiting)[:5]} never received index {next_index}")
+    return next_index
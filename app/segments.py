@@ -0,0 +1,345 @@
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import NullMetrics
+from output_formats import output_format, encode_args, OUTPUT_FORMATS, INTERMEDIATE_FORMATS
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def plan_segments(duration, fps, segment_seconds):
+    """
+    Split a video into time segments of whole frames
+
+    Returns [{"index", "start", "frames"}]. Every segment but the last has
+    round(segment_seconds * fps) frames and starts on its first frame's
+    timestamp, so decoding the segments one after another yields exactly the
+    frames of a decode from the beginning.
+    """
+    total_frames = math.ceil(duration * fps)
+    segment_frames = max(1, round(segment_seconds * fps))
+    return [{"index": index, "start": first / fps, "frames": min(segment_frames, total_frames - first)}
+            for index, first in enumerate(range(0, total_frames, segment_frames))]
+
+
+def _write_json(path, data):
+    """Write a JSON file atomically, so readers on any host never see half of it"""
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+class SegmentQueue:
+    """
+    File-based task queue shared by a segment coordinator and its workers
+
+    The queue is a directory, local or on a shared mount, with one JSON file
+    per task. A task moves from pending/ to claimed/ with an atomic rename, so
+    only one worker gets it, however many processes or hosts poll the queue.
+    The worker touches its claim file while it runs, writes the segment under
+    segments/ and its result to done/. Claims that stop being touched are put
+    back in pending/ by the coordinator (see requeue_stale), so a segment
+    whose worker died is picked up by another one.
+    """
+
+    def __init__(self, queue_dir):
+        self.queue_dir = os.path.abspath(queue_dir)
+        for name in ("pending", "claimed", "done", "segments"):
+            os.makedirs(os.path.join(self.queue_dir, name), exist_ok=True)
+
+    def _path(self, state, task_id):
+        return os.path.join(self.queue_dir, state, task_id + ".json")
+
+    def _task_ids(self, state):
+        return sorted(name[:-5] for name in os.listdir(os.path.join(self.queue_dir, state)) if name.endswith(".json"))
+
+    def segment_path(self, name):
+        return os.path.join(self.queue_dir, "segments", name)
+
+    def submit(self, task):
+        _write_json(self._path("pending", task["id"]), task)
+
+    def claim(self):
+        """Take the oldest pending task, or return None when nothing is pending"""
+        for task_id in self._task_ids("pending"):
+            claimed_path = self._path("claimed", task_id)
+            try:
+                os.rename(self._path("pending", task_id), claimed_path)
+            except OSError:
+                continue
+            os.utime(claimed_path)
+            with open(claimed_path, "r") as f:
+                return json.load(f)
+        return None
+
+    def heartbeat(self, task_id):
+        try:
+            os.utime(self._path("claimed", task_id))
+        except OSError:
+            pass
+
+    def finish(self, task_id, result):
+        _write_json(self._path("done", task_id), result)
+        for state in ("claimed", "pending"):
+            try:
+                os.remove(self._path(state, task_id))
+            except OSError:
+                pass
+
+    def result(self, task_id):
+        try:
+            with open(self._path("done", task_id), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def requeue_stale(self, timeout):
+        """Move claims not touched for timeout seconds back to pending; returns the task ids"""
+        requeued = []
+        for task_id in self._task_ids("claimed"):
+            claimed_path = self._path("claimed", task_id)
+            try:
+                if time.time() - os.path.getmtime(claimed_path) > timeout:
+                    os.rename(claimed_path, self._path("pending", task_id))
+                    requeued.append(task_id)
+            except OSError:
+                pass
+        return requeued
+
+    def is_idle(self):
+        """True when no task is pending or being worked on"""
+        return not self._task_ids("pending") and not self._task_ids("claimed")
+
+    def remove(self, task_id, segment_names=()):
+        for state in ("pending", "claimed", "done"):
+            try:
+                os.remove(self._path(state, task_id))
+            except OSError:
+                pass
+        for name in segment_names:
+            try:
+                os.remove(self.segment_path(name))
+            except OSError:
+                pass
+
+
+def run_segment(queue, task, worker_name):
+    """
+    Process one segment task with the stream pipeline and return its result
+
+    The task carries the coordinator's config, which replaces this process's
+    config so every segment is styled and encoded the same way. The segment is
+    encoded to a file of its own and renamed into place when complete.
+    """
+    import core
+    from art_styles import create_art_processor
+
+    if core.config != task["config"]:
+        core.config.clear()
+        core.config.update(task["config"])
+        core.art_processor = create_art_processor(core.config)
+
+    segment_path = queue.segment_path(task["segment"])
+    base, extension = os.path.splitext(segment_path)
+    partial_path = f"{base}.{worker_name}{extension}"
+    start_time = time.perf_counter()
+    result = {"id": task["id"], "index": task["index"], "worker": worker_name}
+    try:
+        result["frames"] = core.process_video_stream(
+            task["video"], task["fps"], partial_path, task["edge_threshold"], task["distortion_strength"],
+            task["style"], task["custom_params"], batch_size=task["batch_size"], low_res=task["low_res"],
+            start=task["start"], frame_limit=task["frames"]
+        )
+        os.replace(partial_path, segment_path)
+    except Exception as e:
+        result["error"] = str(e)
+        result["traceback"] = traceback.format_exc()
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    result["seconds"] = time.perf_counter() - start_time
+    return result
+
+
+def work(queue_dir, exit_when_idle=True, poll_interval=1.0, heartbeat_interval=5.0):
+    """
+    Worker loop: claim segment tasks from the queue and process them
+
+    With exit_when_idle the worker returns once nothing is pending or claimed,
+    otherwise it keeps polling for new tasks. Returns the number of segments
+    processed.
+    """
+    queue = SegmentQueue(queue_dir)
+    worker_name = f"{socket.gethostname()}-{os.getpid()}"
+    processed = 0
+    while True:
+        task = queue.claim()
+        if task is None:
+            if exit_when_idle and queue.is_idle():
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        stop = threading.Event()
+        def keep_claim():
+            while not stop.wait(heartbeat_interval):
+                queue.heartbeat(task["id"])
+        heartbeat = threading.Thread(target=keep_claim, daemon=True)
+        heartbeat.start()
+        try:
+            result = run_segment(queue, task, worker_name)
+        finally:
+            stop.set()
+            heartbeat.join()
+        queue.finish(task["id"], result)
+        processed += 1
+
+
+def process_video_segmented(video_path, fps, final_video_path, edge_threshold, distortion_strength,
+                            style_name=None, custom_params=None, batch_size=1, metrics=None, low_res=False,
+                            segment_seconds=None, workers=None, queue_dir=None):
+    """
+    Run the stream pipeline on time segments in parallel and join the results
+
+    The video is split into segments of segment_seconds (see plan_segments)
+    that are queued as tasks in queue_dir (a temp dir by default). workers
+    local processes work through the queue; processes on other hosts that see
+    the same queue dir and video path can join in with
+    "python app/segments.py <queue_dir>". Each segment seeks to its start,
+    removes backgrounds, styles and encodes on its own, and the segments are
+    joined with ffmpeg's concat demuxer: MP4 segments are copied without
+    re-encoding, while GIF, WebP and APNG are encoded once from lossless FFV1
+    segments so the whole clip shares one palette and one animation. A shared
+    palette is sampled across the whole video up front. Returns the number of
+    frames processed.
+    """
+    import core
+
+    config = core.config
+    metrics = metrics or NullMetrics()
+    segment_seconds = segment_seconds or config.get("segment_seconds", 10)
+    workers = workers if workers is not None else config.get("segment_workers", 2)
+    workers = workers or os.cpu_count() or 1
+    claim_timeout = config.get("segment_claim_timeout", 60)
+
+    duration = core.probe_duration(video_path)
+    if duration is None:
+        raise RuntimeError(f"Cannot split {video_path} into segments: its duration is unknown")
+    segments = plan_segments(duration, fps, segment_seconds)
+
+    style_name, custom_params = core.plan_palette(
+        style_name, custom_params, lambda: core.sample_video_frames(video_path, config.get("palette_samples", 8)))
+
+    format_name = output_format(final_video_path)
+    segment_extension = OUTPUT_FORMATS["mp4"] if format_name == "mp4" else INTERMEDIATE_FORMATS["ffv1"]
+    temp_dir = None if queue_dir else tempfile.mkdtemp(prefix="converter_segments_")
+    queue = SegmentQueue(queue_dir or temp_dir)
+    job_id = f"{os.path.splitext(os.path.basename(final_video_path))[0]}_{os.getpid()}_{int(time.time())}"
+    tasks = [{
+        "id": f"{job_id}_{segment['index']:05d}",
+        "index": segment["index"],
+        "segment": f"{job_id}_{segment['index']:05d}{segment_extension}",
+        "video": os.path.abspath(video_path),
+        "start": segment["start"],
+        "frames": segment["frames"],
+        "fps": fps,
+        "edge_threshold": edge_threshold,
+        "distortion_strength": distortion_strength,
+        "style": style_name,
+        "custom_params": custom_params,
+        "batch_size": batch_size,
+        "low_res": low_res,
+        "config": config,
+    } for segment in segments]
+
+    local_workers = min(workers, len(tasks))
+    frame_count = 0
+    try:
+        with metrics.stage("segments", sum(segment["frames"] for segment in segments)), \
+                ProcessPoolExecutor(max_workers=local_workers,
+                                    mp_context=multiprocessing.get_context("spawn")) as executor:
+            for task in tasks:
+                queue.submit(task)
+            futures = [executor.submit(work, queue.queue_dir, True) for _ in range(local_workers)]
+            waiting = {task["id"] for task in tasks}
+            try:
+                while waiting:
+                    for task_id in sorted(waiting):
+                        result = queue.result(task_id)
+                        if result is None:
+                            continue
+                        if result.get("error"):
+                            raise RuntimeError(f"Segment {result['index']} failed on {result['worker']}: "
+                                               f"{result['error']}")
+                        waiting.discard(task_id)
+                        frame_count += result["frames"]
+                        metrics.frame_done(count=result["frames"])
+                    if waiting:
+                        for task_id in queue.requeue_stale(claim_timeout):
+                            print(f"Warning: segment task {task_id} stopped responding, requeued it",
+                                  file=sys.stderr)
+                        for future in futures:
+                            if future.done() and future.exception():
+                                raise future.exception()
+                        time.sleep(0.2)
+            except BaseException:
+                # Withdraw the job's remaining tasks so the local workers stop instead of finishing it
+                for task in tasks:
+                    queue.remove(task["id"])
+                raise
+
+        list_path = os.path.join(queue.queue_dir, job_id + ".txt")
+        with open(list_path, "w") as f:
+            for task in tasks:
+                f.write(f"file '{queue.segment_path(task['segment'])}'\n")
+        os.makedirs(os.path.dirname(final_video_path), exist_ok=True)
+        output_args = ["-c", "copy"] if format_name == "mp4" else \
+            encode_args(format_name, gif_dither=config.get("gif_dither", "none"))
+        output_options = " ".join(f'"{arg}"' for arg in output_args)
+        command = f'ffmpeg -f concat -safe 0 -i "{list_path}" {output_options} "{final_video_path}"'
+        start_time = time.perf_counter()
+        with metrics.stage("concat", frame_count):
+            core._run_ffmpeg(command, metrics)
+        if not os.path.exists(final_video_path):
+            raise RuntimeError(f"Joining the segments into {final_video_path} failed")
+        metrics.output_written(final_video_path, format_name, time.perf_counter() - start_time)
+    finally:
+        for task in tasks:
+            queue.remove(task["id"], [task["segment"]])
+        if os.path.exists(os.path.join(queue.queue_dir, job_id + ".txt")):
+            os.remove(os.path.join(queue.queue_dir, job_id + ".txt"))
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return frame_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process video segments from a shared segment queue")
+    parser.add_argument("queue_dir", help="Queue directory given to the coordinator (--queue-dir)")
+    parser.add_argument("--exit-when-idle", action="store_true",
+                        help="Stop once the queue is empty instead of waiting for new segments")
+    parser.add_argument("--poll", type=float, default=1.0, help="Seconds between checks of an empty queue")
+    args = parser.parse_args(argv)
+
+    queue_dir = os.path.abspath(args.queue_dir)
+    if not os.path.exists("config.json"):
+        os.chdir(PROJECT_DIR)
+    processed = work(queue_dir, args.exit_when_idle, args.poll)
+    print(f"Processed {processed} segments")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+CUSTOM_STYLE_DESCRIPTION = "Customized pixel art style with user-defined parameters"
+LEGACY_EDGE_DESCRIPTION = "Original edge detection algorithm with distortion"
+
+def get_available_styles(config):
+    """Return the style names from config plus legacy_edge, without importing any image libraries"""
+    styles = list(config["styles"].keys())
+    styles.append("legacy_edge")
+    return styles
+
+def get_style_description(config, style_name):
+    """Return the description for a style straight from config"""
+    if style_name == "legacy_edge":
+        return LEGACY_EDGE_DESCRIPTION
+    if style_name == "custom":
+        return CUSTOM_STYLE_DESCRIPTION
+    if style_name in config["styles"]:
+        return config["styles"][style_name].get("description", "No description available")
+    return "Style not found"
@@ -0,0 +1,391 @@
+import sys
+import cv2
+import numpy as np
+from PIL import Image
+from buffers import get_arena
+from noise import NOISE_MODES
+from art_styles import autocontrast_tables, grayscale, rgb_shift, displace_blocks
+
+
+# Parameters of every op, with their defaults
+OP_DEFAULTS = {
+    "pixelate": {"size": 4},
+    "grayscale": {},
+    "autocontrast": {"cutoff": 0},
+    "contrast": {"factor": 1.0},
+    "threshold": {"level": 128},
+    "posterize": {"levels": 4},
+    "invert": {},
+    "tint": {"dark": [0, 0, 0], "light": [255, 255, 255]},
+    "dither": {"mode": "floyd_steinberg"},
+    "quantize": {"colors": 16, "palette": None},
+    "rgb_shift": {"amount": 0.02},
+    "glitch_blocks": {"count": 5},
+    "noise": {"level": 0.2, "mode": "color"},
+}
+
+# Ops that map each pixel on its own, so they commute with nearest-neighbour resizes
+POINTWISE_OPS = ("grayscale", "contrast", "threshold", "posterize", "invert", "tint")
+
+# Ops that are one 256-entry table per value, so runs of them compose into a single table
+TABLE_OPS = ("contrast", "threshold", "posterize", "invert")
+
+
+def legacy_pipeline(style_kind, params):
+    """The op pipeline that draws one of the built-in effects ("faith", "classic_pixel", "glitch") with its params"""
+    if style_kind == "faith":
+        steps = [{"op": "pixelate", "size": params.get("pixel_size", 4)}, {"op": "grayscale"}]
+        if params.get("dithering", True):
+            steps.append({"op": "dither", "mode": params.get("dither_mode", "floyd_steinberg")})
+        else:
+            steps.append({"op": "threshold", "level": 128})
+        steps.append({"op": "noise", "level": params.get("noise_level", 0.2),
+                      "mode": params.get("noise_mode", "color")})
+        return steps
+    if style_kind == "classic_pixel":
+        return [{"op": "pixelate", "size": params.get("pixel_size", 3)},
+                {"op": "autocontrast", "cutoff": 5},
+                {"op": "quantize", "colors": 16, "palette": params.get("palette")}]
+    noise_level = params.get("noise_level", 0.5)
+    return [{"op": "pixelate", "size": params.get("pixel_size", 2)},
+            {"op": "rgb_shift", "amount": 0.02},
+            {"op": "glitch_blocks", "count": params.get("glitch_blocks", int(10 * noise_level))}]
+
+
+def _is_pointwise(step):
+    return step["op"] in POINTWISE_OPS or (step["op"] == "quantize" and bool(step["palette"]))
+
+
+def _is_identity(step, gray, binary):
+    """Whether a step leaves the frame unchanged, given whether the frame is gray and black-and-white"""
+    op = step["op"]
+    if op == "pixelate":
+        return int(step["size"]) <= 1
+    if op == "grayscale":
+        return gray
+    if op == "contrast":
+        return step["factor"] == 1
+    if op == "threshold":
+        return binary and 1 <= step["level"] <= 255
+    if op in ("dither", "autocontrast"):
+        return binary
+    if op == "posterize":
+        return step["levels"] >= 256
+    if op == "rgb_shift":
+        return step["amount"] <= 0
+    if op == "glitch_blocks":
+        return step["count"] <= 0
+    if op == "noise":
+        return int(step["level"] * 255) <= 0
+    return False
+
+
+def normalize_steps(steps):
+    """
+    Fill in op defaults and drop the steps that cannot change the frame
+
+    Unknown ops are skipped with a warning. Dropped steps are zero-strength
+    ones (contrast 1, noise, glitch_blocks or rgb_shift of 0, pixelate 1),
+    grayscale on a frame that is already gray, and threshold, dither or
+    autocontrast on a frame that is already black and white. dither and tint
+    read gray frames, so a grayscale step is added before them when needed.
+    """
+    normalized = []
+    gray = binary = False
+    for step in steps:
+        op = step.get("op")
+        if op not in OP_DEFAULTS:
+            print(f"Style op {op} not found, skipping it", file=sys.stderr)
+            continue
+        step = dict(OP_DEFAULTS[op], **step)
+        if op == "noise" and step["mode"] not in NOISE_MODES:
+            print(f"Noise mode {step['mode']} not found, using color", file=sys.stderr)
+            step["mode"] = "color"
+        if op == "posterize":
+            step["levels"] = max(2, int(step["levels"]))
+        if op in ("dither", "tint") and not gray:
+            normalized.append({"op": "grayscale"})
+            gray, binary = True, False
+        if _is_identity(step, gray, binary):
+            continue
+        normalized.append(step)
+
+        if op == "grayscale":
+            gray = True
+        elif op in ("tint", "quantize", "rgb_shift") or (op == "noise" and step["mode"] != "mono"):
+            gray = False
+        binary = op in ("threshold", "dither") or (binary and op in ("invert", "pixelate"))
+    return normalized
+
+
+def plan_steps(steps):
+    """
+    Order normalized steps to run at the lowest resolution they allow
+
+    Pointwise ops just before a pixelate move after it, so they touch one
+    pixel per grid cell instead of every pixel. Everything after the first
+    pixelate runs on the pixel grid, and a single upscale back to the input
+    size is inserted before the first op that needs full resolution (color or
+    mono noise), or at the end.
+    """
+    steps = list(steps)
+    for index in range(len(steps)):
+        if steps[index]["op"] == "pixelate":
+            while index > 0 and _is_pointwise(steps[index - 1]):
+                steps[index - 1], steps[index] = steps[index], steps[index - 1]
+                index -= 1
+
+    pixelates = [index for index, step in enumerate(steps) if step["op"] == "pixelate"]
+    if not pixelates:
+        return steps
+    upscale_at = next((index for index, step in enumerate(steps)
+                       if index > pixelates[0] and step["op"] == "noise" and step["mode"] != "grid"), len(steps))
+    return steps[:upscale_at] + [{"op": "upscale"}] + steps[upscale_at:]
+
+
+def _color(img):
+    """The frame as 3-channel BGR, converting gray or BGRA frames"""
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    return img
+
+
+def _table(step):
+    """The 256-entry uint8 table of a TABLE_OPS step"""
+    levels = np.arange(256, dtype=np.float64)
+    op = step["op"]
+    if op == "contrast":
+        table = (levels - 128) * step["factor"] + 128
+    elif op == "threshold":
+        table = np.where(levels >= step["level"], 255, 0)
+    elif op == "posterize":
+        count = step["levels"]
+        table = np.floor(levels * count / 256) * 255 / (count - 1)
+    else:
+        table = 255 - levels
+    return np.clip(np.round(table), 0, 255).astype(np.uint8)
+
+
+class _Kernel:
+    """
+    One pass over the frame
+
+    in_place kernels write into the frame they are given, and kernels that
+    accept_alpha can be handed a BGRA frame, whose alpha they ignore.
+    """
+
+    def __init__(self, name, run, in_place=False, accepts_alpha=False):
+        self.name = name
+        self.run = run
+        self.in_place = in_place
+        self.accepts_alpha = accepts_alpha
+
+
+class FusedPointwise:
+    """
+    A run of pointwise steps applied in one lookup pass
+
+    The run is an optional grayscale conversion, an optional autocontrast,
+    any number of TABLE_OPS and an optional tint. The fixed tables are
+    composed into one when the style is compiled; autocontrast's per-channel
+    table depends on the frame's histogram, so the fixed table is composed
+    onto it per frame, which still costs only 256 entries per channel.
+    """
+
+    def __init__(self, steps):
+        self.grayscale = steps[0]["op"] == "grayscale"
+        self.cutoff = next((step["cutoff"] for step in steps if step["op"] == "autocontrast"), None)
+        self.table = np.arange(256, dtype=np.uint8)
+        for step in steps:
+            if step["op"] in TABLE_OPS:
+                self.table = _table(step)[self.table]
+        self.has_table = any(step["op"] in TABLE_OPS for step in steps)
+        self.tint = None
+        tint = next((step for step in steps if step["op"] == "tint"), None)
+        if tint:
+            dark, light = np.asarray(tint["dark"], np.float64), np.asarray(tint["light"], np.float64)
+            rgb = dark + (light - dark) * np.arange(256, dtype=np.float64)[:, None] / 255
+            self.tint = np.clip(np.round(rgb[:, ::-1]), 0, 255).astype(np.uint8)
+        self.name = "+".join(step["op"] for step in steps)
+
+    def __call__(self, img, context):
+        if self.grayscale and img.ndim == 3:
+            img = grayscale(img)
+        table = self.table
+        if self.cutoff is not None:
+            tables = self.table[autocontrast_tables(img, self.cutoff)]
+            if self.tint is not None:
+                return self.tint[tables[:, 0]][img]
+            if img.ndim == 2:
+                return cv2.LUT(img, tables[:, 0])
+            return cv2.LUT(img, tables.reshape(1, 256, tables.shape[1]))
+        if self.tint is not None:
+            return self.tint[table][img]
+        if self.has_table:
+            return cv2.LUT(img, table)
+        return img
+
+
+def _pixelate(size):
+    def run(img, context):
+        height, width = img.shape[:2]
+        small = cv2.resize(img, (max(1, width // size), max(1, height // size)),
+                           interpolation=cv2.INTER_NEAREST_EXACT)
+        if small.ndim == 3 and small.shape[2] == 4:
+            small = cv2.cvtColor(small, cv2.COLOR_BGRA2BGR)
+        return small
+    return _Kernel(f"pixelate/{size}", run, accepts_alpha=True)
+
+
+def _upscale(img, context):
+    name = "graph_upscaled_gray" if img.ndim == 2 else "graph_upscaled"
+    dst = get_arena().get(name, (context.height, context.width) + img.shape[2:])
+    return cv2.resize(img, (context.width, context.height), dst=dst, interpolation=cv2.INTER_NEAREST_EXACT)
+
+
+def _dither(mode):
+    def run(img, context):
+        from dithering import dither
+        return dither(img, mode)
+    return _Kernel(f"dither/{mode}", run)
+
+
+def _quantize(colors, palette):
+    def run(img, context):
+        img = np.ascontiguousarray(_color(img))
+        if palette:
+            return context.processor._palette_lut(palette, bgr=True).apply(img)
+        # Median cut depends on channel order, so quantize in RGB like the other engines
+        rgb = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        return cv2.cvtColor(np.asarray(rgb.quantize(colors).convert('RGB')), cv2.COLOR_RGB2BGR)
+    return _Kernel("quantize/palette" if palette else f"quantize/{colors}", run)
+
+
+def _rgb_shift(amount):
+    def run(img, context):
+        return rgb_shift(_color(img), int(context.full_width * amount), red=2, blue=0)
+    return _Kernel("rgb_shift", run)
+
+
+def _glitch_blocks(count):
+    def run(img, context):
+        return displace_blocks(img, count, context.processor.noise.rng)
+    return _Kernel(f"glitch_blocks/{count}", run, in_place=True)
+
+
+def _noise(level, mode):
+    high = int(level * 255)
+    def run(img, context):
+        noise = context.processor.noise
+        if mode != "mono":
+            img = _color(img)
+            return cv2.add(img, noise.uniform(img.shape, high), dst=img)
+        if img.ndim == 2:
+            return cv2.add(img, noise.uniform(img.shape, high), dst=img)
+        return cv2.add(img, cv2.cvtColor(noise.uniform(img.shape[:2], high), cv2.COLOR_GRAY2BGR), dst=img)
+    return _Kernel(f"noise/{mode}", run, in_place=True)
+
+
+def _extends_run(run, step):
+    """Whether step can join a FusedPointwise run: grayscale and autocontrast only open one, tint closes it"""
+    if run[-1]["op"] == "tint":
+        return False
+    if step["op"] == "autocontrast":
+        return [member["op"] for member in run] == ["grayscale"]
+    return step["op"] in TABLE_OPS or step["op"] == "tint"
+
+
+class _RunContext:
+    def __init__(self, processor, height, width, grid_scale):
+        self.processor = processor
+        self.height = height
+        self.width = width
+        self.full_width = width * grid_scale
+
+
+class CompiledStyle:
+    """
+    A style pipeline compiled into the passes that actually run
+
+    steps is a list of {"op": name, ...params} dicts (see OP_DEFAULTS). The
+    compiler drops steps that cannot change the frame (normalize_steps),
+    moves work to the pixel grid (plan_steps) and fuses adjacent pointwise
+    steps into single lookup passes (FusedPointwise). run() takes a BGR(A)
+    frame and returns a BGR frame of the same size, which may be a buffer of
+    the thread's arena.
+    """
+
+    def __init__(self, steps):
+        self.steps = plan_steps(normalize_steps(steps))
+        self.deterministic = not any(step["op"] in ("noise", "glitch_blocks") for step in self.steps)
+        self.kernels = []
+        index = 0
+        while index < len(self.steps):
+            step = self.steps[index]
+            op = step["op"]
+            if op in POINTWISE_OPS or op == "autocontrast":
+                run = [step]
+                index += 1
+                while index < len(self.steps) and _extends_run(run, self.steps[index]):
+                    run.append(self.steps[index])
+                    index += 1
+                fused = FusedPointwise(run)
+                self.kernels.append(_Kernel(fused.name, fused, accepts_alpha=fused.grayscale))
+                continue
+            if op == "pixelate":
+                self.kernels.append(_pixelate(int(step["size"])))
+            elif op == "upscale":
+                self.kernels.append(_Kernel("upscale", _upscale))
+            elif op == "dither":
+                self.kernels.append(_dither(step["mode"]))
+            elif op == "quantize":
+                self.kernels.append(_quantize(step["colors"], step["palette"]))
+            elif op == "rgb_shift":
+                self.kernels.append(_rgb_shift(step["amount"]))
+            elif op == "glitch_blocks":
+                self.kernels.append(_glitch_blocks(int(step["count"])))
+            else:
+                self.kernels.append(_noise(step["level"], step["mode"]))
+            index += 1
+
+    @property
+    def kernel_names(self):
+        return [kernel.name for kernel in self.kernels]
+
+    def run(self, img, processor, grid_scale=1):
+        height, width = img.shape[:2]
+        context = _RunContext(processor, height, width, grid_scale)
+        owned = False
+        if img.ndim == 3 and img.shape[2] == 4 and not (self.kernels and self.kernels[0].accepts_alpha):
+            img, owned = _color(img), True
+        for kernel in self.kernels:
+            if kernel.in_place and not owned:
+                img = img.copy()
+            img = kernel.run(img, context)
+            owned = True
+        if img.ndim == 2:
+            return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        return img
+
+    def low_res_plan(self, params):
+        """
+        (pixel_size, native_params, noise_level) to run the style on frames
+        decoded at its pixel-grid size (see core.plan_low_res), or None when
+        the pipeline does not start with a pixelate or needs full resolution
+        for anything but trailing color noise, which moves to the encoder
+        """
+        if not self.steps or self.steps[0]["op"] != "pixelate":
+            return None
+        upscale_at = next(index for index, step in enumerate(self.steps) if step["op"] == "upscale")
+        tail = self.steps[upscale_at + 1:]
+        noise_level = 0
+        if tail:
+            if len(tail) > 1 or tail[0]["op"] != "noise" or tail[0]["mode"] != "color":
+                return None
+            noise_level = tail[0]["level"]
+        pixel_size = int(self.steps[0]["size"])
+        native_params = dict(params, pipeline=self.steps[1:upscale_at],
+                             grid_scale=pixel_size * params.get("grid_scale", 1))
+        return pixel_size, native_params, noise_level
@@ -0,0 +1,81 @@
+import os
+import shutil
+import subprocess
+import cv2
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# core reads config.json from the working directory when it is imported
+os.chdir(ROOT)
+
+requires_ffmpeg = pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")),
+                                     reason="needs ffmpeg and ffprobe on PATH")
+
+
+@pytest.fixture
+def make_video(tmp_path):
+    """Write a short ffmpeg test-pattern clip and return its path"""
+    def make(name="clip.mp4", size="64x48", rate=10, duration=1, source="testsrc", input_args=()):
+        path = str(tmp_path / name)
+        command = ["ffmpeg", "-v", "error", "-y", "-f", "lavfi",
+                   "-i", f"{source}=size={size}:rate={rate}:duration={duration}",
+                   "-pix_fmt", "yuv420p", "-c:v", "libx264", path]
+        subprocess.run(command, check=True)
+        if input_args:
+            source_path = path
+            path = str(tmp_path / ("input_" + name))
+            subprocess.run(["ffmpeg", "-v", "error", "-y", *input_args, "-i", source_path, "-c", "copy", path],
+                           check=True)
+        return path
+    return make
+
+
+def decode_frames(video_path):
+    """Every frame of a video as BGR(A) arrays, decoded by ffmpeg into PNGs"""
+    directory = video_path + "_frames"
+    os.makedirs(directory, exist_ok=True)
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-i", video_path, os.path.join(directory, "%04d.png")],
+                   check=True)
+    return [cv2.imread(os.path.join(directory, name), cv2.IMREAD_UNCHANGED)
+            for name in sorted(os.listdir(directory))]
+
+
+class FakeRemover:
+    """Stands in for the rembg engine: keeps every pixel and adds an opaque alpha channel"""
+
+    pool_size = 1
+
+    def __init__(self):
+        self.calls = 0
+
+    def warm_up(self):
+        pass
+
+    def supports_batching(self):
+        return False
+
+    def remove(self, data):
+        self.calls += 1
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        return cv2.imencode(".png", cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA))[1].tobytes()
+
+    def remove_frame(self, frame):
+        self.calls += 1
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+
+    def remove_frames(self, frames, batch_size=1):
+        return [self.remove_frame(frame) for frame in frames]
+
+    def map(self, func, items):
+        return [func(item) for item in items]
+
+
+@pytest.fixture
+def fake_remover(monkeypatch):
+    """Replace background removal in core with FakeRemover"""
+    import core
+    remover = FakeRemover()
+    monkeypatch.setattr(core, "get_remover", lambda: remover)
+    return remover
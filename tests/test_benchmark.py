@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import benchmark
+import core
+
+
+def styled_frames(monkeypatch, seed, styles, keep=None):
+    """Run the style benchmark on a few tiny frames and return every frame the styles (or style keep) produced"""
+    outputs = []
+    style_frame = core.style_frame
+
+    def recording_style_frame(*args, **kwargs):
+        result = style_frame(*args, **kwargs)
+        if keep in (None, args[3]):
+            outputs.append(result.copy())
+        return result
+
+    monkeypatch.setattr(core, "style_frame", recording_style_frame)
+    results = benchmark.bench_styles(core, "tiny", (64, 48), 2, styles, seed)
+    monkeypatch.setattr(core, "style_frame", style_frame)
+    assert len(results) == 2 * len(styles)
+    return outputs
+
+
+@pytest.mark.parametrize("style", ["faith", "glitch", "legacy_edge"])
+def test_a_seed_reproduces_the_styled_frames(monkeypatch, style):
+    first = styled_frames(monkeypatch, 3, [style])
+    # Drawing from the generators in between must not change the next run
+    core.art_processor.noise.uniform((10, 10), 255)
+    np.random.random()
+    second = styled_frames(monkeypatch, 3, [style])
+    assert len(first) == len(second)
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+    other = styled_frames(monkeypatch, 4, [style])
+    assert any(not np.array_equal(a, b) for a, b in zip(first, other))
+
+
+def test_styles_do_not_depend_on_the_styles_before_them(monkeypatch):
+    alone = styled_frames(monkeypatch, 3, ["faith"])
+    after_glitch = styled_frames(monkeypatch, 3, ["glitch", "faith"], keep="faith")
+    assert len(after_glitch) == len(alone)
+    for a, b in zip(alone, after_glitch):
+        np.testing.assert_array_equal(a, b)
@@ -0,0 +1,125 @@
+import sys
+import types
+import numpy as np
+import pytest
+
+import bg_removal
+from bg_removal import BackgroundRemover, get_background_remover
+
+
+class FakeInput:
+    name = "input.1"
+
+    def __init__(self, batch_dim):
+        self.shape = [batch_dim, 3, 320, 320]
+
+
+class FakeInnerSession:
+    """onnxruntime session stand-in: predicts a horizontal ramp for every image in the batch"""
+
+    def __init__(self, batch_dim):
+        self.batch_dim = batch_dim
+        self.batches = []
+
+    def get_inputs(self):
+        return [FakeInput(self.batch_dim)]
+
+    def run(self, outputs, feed):
+        tensor = next(iter(feed.values()))
+        self.batches.append(tensor.shape[0])
+        ramp = np.tile(np.linspace(0, 1, tensor.shape[3], dtype=np.float32), (tensor.shape[2], 1))
+        return [np.broadcast_to(ramp, (tensor.shape[0], 1) + ramp.shape).copy()]
+
+
+@pytest.fixture
+def fake_rembg(monkeypatch):
+    """Install a fake rembg module and return the sessions it creates"""
+    sessions = []
+
+    def new_session(model_name):
+        session = types.SimpleNamespace(model_name=model_name, inner_session=FakeInnerSession("batch"))
+        sessions.append(session)
+        return session
+
+    def remove(data, session=None):
+        assert session in sessions
+        return np.dstack((data, np.full(data.shape[:2], 255, np.uint8)))
+
+    monkeypatch.setitem(sys.modules, "rembg", types.SimpleNamespace(new_session=new_session, remove=remove))
+    monkeypatch.setattr(bg_removal, "_removers", {})
+    return sessions
+
+
+def frames(count, shape=(24, 32, 3)):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, shape, dtype=np.uint8) for _ in range(count)]
+
+
+def test_remover_is_shared_per_model(fake_rembg):
+    remover = get_background_remover("u2net", 1)
+    assert get_background_remover("u2net", 1) is remover
+    assert get_background_remover("u2net", 2) is remover
+    assert remover.pool_size == 2
+    assert get_background_remover("u2netp", 1) is not remover
+
+
+def test_sessions_are_created_once_and_reused(fake_rembg):
+    remover = BackgroundRemover("u2net", pool_size=2)
+    results = remover.remove_frames(frames(10))
+    assert len(fake_rembg) <= 2
+    remover.remove_frames(frames(10))
+    assert len(fake_rembg) <= 2
+    assert all(result.shape == (24, 32, 4) for result in results)
+
+
+def test_map_keeps_the_input_order(fake_rembg):
+    remover = BackgroundRemover("u2net", pool_size=3)
+    assert remover.map(lambda value: value * 2, range(20)) == [value * 2 for value in range(20)]
+
+
+def test_warm_up_creates_every_session(fake_rembg):
+    BackgroundRemover("u2net", pool_size=3).warm_up()
+    assert len(fake_rembg) == 3
+
+
+def test_batched_removal_runs_one_inference_per_batch(fake_rembg):
+    remover = BackgroundRemover("u2net", pool_size=1)
+    assert remover.supports_batching()
+    inputs = frames(10)
+    results = remover.remove_frames(inputs, batch_size=4)
+    assert fake_rembg[0].inner_session.batches == [4, 4, 2]
+    assert len(results) == 10
+    for frame, result in zip(inputs, results):
+        assert result.shape == (24, 32, 4)
+        # The ramp mask keeps the right edge and cuts out the left one
+        assert result[:, 0, 3].max() < 16 and result[:, -1, 3].min() > 240
+        np.testing.assert_allclose(result[:, -1, :3], frame[:, -1], atol=8)
+
+
+def test_fixed_batch_models_fall_back_to_single_frames(fake_rembg):
+    remover = BackgroundRemover("u2net", pool_size=1)
+    remover.remove_frames(frames(1))
+    fake_rembg[0].inner_session.batch_dim = 1
+    assert not remover.supports_batching()
+    results = remover.remove_frames(frames(3), batch_size=4)
+    assert fake_rembg[0].inner_session.batches == []
+    assert [result.shape for result in results] == [(24, 32, 4)] * 3
+
+
+def test_unknown_models_are_not_batched(fake_rembg):
+    assert not BackgroundRemover("sam", pool_size=1).supports_batching()
+
+
+def test_failed_session_load_can_be_retried(fake_rembg, monkeypatch):
+    rembg = sys.modules["rembg"]
+    working = rembg.new_session
+
+    def failing(model_name):
+        raise RuntimeError("model download failed")
+
+    monkeypatch.setattr(rembg, "new_session", failing)
+    remover = BackgroundRemover("u2net", 1)
+    with pytest.raises(RuntimeError):
+        remover.warm_up()
+    monkeypatch.setattr(rembg, "new_session", working)
+    assert remover.remove_frame(frames(1)[0]).shape == (24, 32, 4)
@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+
+import core
+from art_styles import NumpyArtStyleProcessor
+from buffers import BufferArena, get_arena
+
+
+def test_same_key_reuses_the_buffer():
+    arena = BufferArena()
+    first = arena.get("gray", (4, 4))
+    assert arena.get("gray", (4, 4)) is first
+    assert arena.get("gray", (4, 4), np.int16) is not first
+    assert arena.get("gray", (4, 5)) is not first
+    assert arena.stats()["allocations"] == 3 and arena.stats()["requests"] == 4
+
+
+def test_least_recently_used_buffers_are_dropped():
+    arena = BufferArena(max_buffers=2)
+    first = arena.get("a", (2,))
+    arena.get("b", (2,))
+    assert arena.get("a", (2,)) is first
+    arena.get("c", (2,))
+    assert arena.stats()["buffers"] == 2
+    assert arena.get("a", (2,)) is first
+    assert arena.stats()["allocations"] == 3
+
+
+def test_each_thread_gets_its_own_arena():
+    arenas = []
+    thread = threading.Thread(target=lambda: arenas.append(get_arena()))
+    thread.start()
+    thread.join()
+    assert get_arena() is get_arena()
+    assert arenas[0] is not get_arena()
+
+
+def frame(seed):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (48, 64, 4), dtype=np.uint8)
+
+
+def test_styles_allocate_no_scratch_buffers_in_steady_state():
+    processor = NumpyArtStyleProcessor(core.config)
+    params = {"pixel_size": 4, "dithering": True, "color_mode": "monochrome", "noise_level": 0.2}
+    processor.process_image(frame(0), "custom", params)
+    core.apply_legacy_edge_detection(frame(0)[:, :, :3], (100, 200), 3)
+    allocations = get_arena().allocations
+    results = [processor.process_image(frame(seed), "custom", params) for seed in (1, 2)]
+    core.apply_legacy_edge_detection(frame(1)[:, :, :3], (100, 200), 3)
+    assert get_arena().allocations == allocations
+    # Returned frames are never arena buffers, so they survive the next frame
+    assert not np.shares_memory(results[0], results[1])
+    assert not np.array_equal(results[0], results[1])
+
+
+def test_zero_distortion_keeps_the_edges():
+    edges = core.apply_legacy_edge_detection(frame(0)[:, :, :3], (100, 200), 0)
+    assert edges.shape == (48, 64, 3) and set(np.unique(edges)) <= {0, 255}
@@ -0,0 +1,111 @@
+import json
+import time
+
+import cv2
+import numpy as np
+
+import core
+from checkpoint import JobCheckpoint, params_hash
+
+
+def names(count):
+    return [f"frame_{index:05d}.png" for index in range(1, count + 1)]
+
+
+def open_stages(path, fps=10, style="faith"):
+    checkpoint = JobCheckpoint(str(path))
+    return [checkpoint.stage("extract", {"fps": fps}), checkpoint.stage("style", {"style": style}),
+            checkpoint.stage("encode", {})]
+
+
+def test_params_hash_ignores_key_order():
+    assert params_hash({"a": 1, "b": [2]}) == params_hash({"b": [2], "a": 1})
+
+
+def test_progress_survives_a_reload(tmp_path):
+    extract, style, _ = open_stages(tmp_path / "checkpoint.json")
+    extract.mark_done(*names(3))
+    extract.complete()
+    style.mark_done("frame_00002.png")
+    style.complete()
+    extract, style, encode = open_stages(tmp_path / "checkpoint.json")
+    assert extract.is_complete() and style.is_complete() and not encode.is_complete()
+    assert style.pending(names(3)) == ["frame_00001.png", "frame_00003.png"]
+
+
+def test_changed_params_invalidate_only_later_stages(tmp_path):
+    extract, style, _ = open_stages(tmp_path / "checkpoint.json")
+    extract.mark_done(*names(3))
+    style.mark_done(*names(3))
+    extract.complete()
+    style.complete()
+    extract, style, _ = open_stages(tmp_path / "checkpoint.json", style="glitch")
+    assert extract.is_complete() and extract.pending(names(3)) == []
+    assert style.pending(names(3)) == names(3)
+    extract, style, _ = open_stages(tmp_path / "checkpoint.json", fps=12)
+    assert extract.pending(names(3)) == names(3)
+
+
+def test_redoing_a_frame_makes_it_stale_in_later_stages(tmp_path):
+    extract, style, _ = open_stages(tmp_path / "checkpoint.json")
+    style.mark_done(*names(3))
+    style.complete()
+    extract.mark_done("frame_00002.png")
+    assert not style.is_complete()
+    assert style.pending(names(3)) == ["frame_00002.png"]
+
+
+def test_missing_outputs_are_pending_again(tmp_path):
+    checkpoint = JobCheckpoint(str(tmp_path / "checkpoint.json"))
+    stage = checkpoint.stage("extract", {}, str(tmp_path))
+    (tmp_path / "frame_00001.png").write_bytes(b"x")
+    stage.mark_done("frame_00001.png", "frame_00002.png")
+    stage.complete()
+    assert not stage.is_complete()
+    assert stage.pending(names(2)) == ["frame_00002.png"]
+
+
+def test_resuming_thousands_of_frames_stays_cheap(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    frames = names(20000)
+    start_time = time.perf_counter()
+    extract, style, _ = open_stages(path)
+    for file_name in frames:
+        extract.mark_done(file_name)
+    extract.complete()
+    for file_name in frames[:15000]:
+        style.mark_done(file_name)
+    style.checkpoint._save()
+    # Resume from the saved manifest and finish the stage
+    extract, style, _ = open_stages(path)
+    assert extract.is_complete()
+    pending = style.pending(frames)
+    assert pending == frames[15000:]
+    for file_name in pending:
+        style.mark_done(file_name)
+    style.complete()
+    # Marking frames one at a time used to re-sort every stage's list per call (over a minute here)
+    assert time.perf_counter() - start_time < 5
+    saved = json.loads(path.read_text())["stages"]
+    assert saved["style"]["frames"] == frames and saved["style"]["complete"]
+
+
+def test_process_pool_only_styles_pending_frames(tmp_path, monkeypatch):
+    monkeypatch.setitem(core.config, "dedup_frames", False)
+    source = tmp_path / "nobg"
+    source.mkdir()
+    rng = np.random.default_rng(0)
+    for file_name in names(6):
+        cv2.imwrite(str(source / file_name), rng.integers(0, 256, (24, 32, 4), dtype=np.uint8))
+    output = tmp_path / "processed"
+    output.mkdir()
+    stage = JobCheckpoint(str(tmp_path / "checkpoint.json")).stage("style", {}, str(output))
+    done = names(6)[:4]
+    for file_name in done:
+        (output / file_name).write_bytes(b"kept")
+    stage.mark_done(*done)
+    stats = core.apply_converter_style(str(source), (100, 200), 0, str(output), "classic_pixel", workers=2,
+                                       checkpoint=stage)
+    assert stats["frames"] == 2
+    assert all((output / file_name).read_bytes() == b"kept" for file_name in done)
+    assert stage.is_complete() and stage.pending(names(6)) == []
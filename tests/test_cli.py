@@ -0,0 +1,102 @@
+import json
+import os
+import argparse
+
+import numpy as np
+
+import cli
+import core
+from conftest import FakeRemover, decode_frames, requires_ffmpeg
+
+
+def args(**overrides):
+    values = {"manifest": None, "videos": [], "style": None, "fps": None, "custom_params": None,
+              "format": None, "output_dir": "out"}
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def test_csv_manifest_decodes_json_and_number_cells(tmp_path):
+    manifest = tmp_path / "jobs.csv"
+    manifest.write_text('video,style,fps,custom_params\n'
+                        'a.mp4,glitch,8,"{""pixel_size"": 3}"\n'
+                        'b.mp4,,,\n')
+    jobs = cli.load_manifest(str(manifest))
+    assert jobs[0] == {"video": str(tmp_path / "a.mp4"), "style": "glitch", "fps": 8,
+                       "custom_params": {"pixel_size": 3}}
+    assert jobs[1] == {"video": str(tmp_path / "b.mp4")}
+
+
+def test_jobs_get_defaults_and_unique_outputs(tmp_path):
+    config = {"fps": 12, "edge_threshold": [100, 200], "distortion_strength": 3, "default_style": "faith"}
+    jobs = cli.build_jobs(args(videos=["x/clip.mp4", "y/clip.mp4"], style="glitch", format="gif"), config)
+    assert [job["style"] for job in jobs] == ["glitch", "glitch"]
+    assert [job["fps"] for job in jobs] == [12, 12]
+    assert [job["output"] for job in jobs] == [os.path.join("out", "clip_final.gif"),
+                                              os.path.join("out", "clip_2_final.gif")]
+
+
+@requires_ffmpeg
+def test_report_is_the_only_stdout_output(make_video, fake_remover, tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(core.config, "rembg_sessions", 1)
+    video = make_video()
+    code = cli.main([video, "--style", "no_such_style", "--fps", "10", "--format", "apng",
+                     "--output-dir", str(tmp_path / "out")])
+    captured = capsys.readouterr()
+    report = json.loads(captured.out)
+    assert code == 0
+    assert report["succeeded"] == 1
+    assert report["jobs"][0]["frames"] == 10
+    assert "Style no_such_style not found" in captured.err
+
+
+class BrokenRemover(FakeRemover):
+    def warm_up(self):
+        raise RuntimeError("no model")
+
+    def remove_frame(self, frame):
+        raise RuntimeError("no model")
+
+
+@requires_ffmpeg
+def test_warm_up_failure_still_reports_every_job(make_video, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(core, "get_remover", BrokenRemover)
+    video = make_video()
+    code = cli.main([video, video, "--fps", "10", "--format", "apng", "--output-dir", str(tmp_path / "out")])
+    captured = capsys.readouterr()
+    report = json.loads(captured.out)
+    assert code == 1
+    assert report["failed"] == 2
+    assert all(job["error"] == "no model" for job in report["jobs"])
+    assert "warm-up failed" in captured.err
+
+
+@requires_ffmpeg
+def test_staged_mode_matches_stream_mode(make_video, fake_remover, tmp_path, capsys):
+    # gameboy has a fixed palette, so both modes style with the same colors
+    video = make_video()
+    for mode in ("stream", "staged"):
+        assert cli.main([video, "--mode", mode, "--style", "gameboy", "--fps", "10", "--format", "apng",
+                         "--output-dir", str(tmp_path / mode)]) == 0
+        assert json.loads(capsys.readouterr().out)["jobs"][0]["frames"] == 10
+    expected = decode_frames(str(tmp_path / "stream" / "clip_final.apng"))
+    frames = decode_frames(str(tmp_path / "staged" / "clip_final.apng"))
+    assert len(frames) == len(expected) == 10
+    for frame, reference in zip(frames, expected):
+        np.testing.assert_array_equal(frame, reference)
+
+
+@requires_ffmpeg
+def test_staged_work_dir_resumes_without_redoing_frames(make_video, fake_remover, tmp_path, capsys):
+    video = make_video()
+    command = [video, "--mode", "staged", "--style", "classic_pixel", "--fps", "10", "--format", "apng",
+               "--output-dir", str(tmp_path / "out"), "--work-dir", str(tmp_path / "work")]
+    assert cli.main(command) == 0
+    assert json.loads(capsys.readouterr().out)["succeeded"] == 1
+    assert fake_remover.calls == 10
+    output = tmp_path / "out" / "clip_final.apng"
+    output.unlink()
+    assert cli.main(command) == 0
+    assert json.loads(capsys.readouterr().out)["jobs"][0]["frames"] == 10
+    assert fake_remover.calls == 10
+    assert output.exists()
@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pytest
+
+import core
+from conftest import requires_ffmpeg
+from dedup import FrameDeduper, find_duplicates
+
+
+def frame(value, noise=0, seed=0):
+    rng = np.random.default_rng(seed)
+    base = np.full((48, 64, 3), value, np.int16) + rng.integers(-noise, noise + 1, (48, 64, 3))
+    return np.clip(base, 0, 255).astype(np.uint8)
+
+
+def test_encoder_noise_is_a_duplicate_but_a_new_frame_is_not():
+    deduper = FrameDeduper(threshold=12)
+    assert not deduper.is_duplicate(frame(100))
+    assert deduper.is_duplicate(frame(100, noise=8, seed=1))
+    assert not deduper.is_duplicate(frame(140))
+    assert (deduper.unique, deduper.duplicates) == (2, 1)
+
+
+def test_a_slow_fade_does_not_drift_through_duplicates():
+    deduper = FrameDeduper(threshold=12)
+    results = [deduper.is_duplicate(frame(100 + 5 * step)) for step in range(6)]
+    # Each step is within the threshold of the previous frame, but not of the frame that started the run
+    assert results == [False, True, True, False, True, True]
+
+
+def test_find_duplicates_maps_runs_to_their_first_frame():
+    frames = {"a": frame(10), "b": frame(10), "c": frame(200), "d": frame(200), "e": frame(10)}
+    assert find_duplicates(frames.__getitem__, list(frames)) == {"a": "a", "b": "a", "c": "c", "d": "c", "e": "e"}
+
+
+@pytest.fixture
+def no_decoding(monkeypatch):
+    """Fail if any stage fingerprints frames by decoding them again"""
+    def fail(*args, **kwargs):
+        raise AssertionError("frames were decoded again for dedup")
+    monkeypatch.setattr(core, "find_duplicates", fail)
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("store", ["png", "raw"])
+def test_stages_reuse_the_map_saved_at_extraction(make_video, tmp_path, fake_remover, monkeypatch, no_decoding,
+                                                  store):
+    monkeypatch.setitem(core.config, "frame_store", store)
+    monkeypatch.setitem(core.config, "dedup_frames", True)
+    video = make_video(source="color")
+    frames, nobg, processed = core.open_stage_stores(str(tmp_path / "work"), capacity=10)
+    core.extract_frames(video, 10, frames)
+    stats = core.remove_background(frames, nobg)
+    assert (stats["frames"], stats["skipped"]) == (1, 9)
+    assert fake_remover.calls == 1
+    stats = core.apply_converter_style(nobg, (100, 200), 0, processed, "classic_pixel")
+    assert stats == {"frames": 1, "skipped": 9}
+
+
+def test_a_stale_map_is_recomputed(tmp_path, monkeypatch):
+    monkeypatch.setitem(core.config, "dedup_frames", True)
+    store = core.open_frame_store(str(tmp_path))
+    for index, value in enumerate((10, 10, 10), start=1):
+        store.write(f"frame_{index:04d}.png", frame(value))
+    names = store.names()
+    assert core.find_duplicate_frames(store, names) == {"frame_0002.png": "frame_0001.png",
+                                                        "frame_0003.png": "frame_0001.png"}
+    assert os.path.exists(store.duplicates_path)
+    store.write("frame_0003.png", frame(200))
+    os.utime(store.path("frame_0003.png"), ns=(0, 0))
+    assert core.find_duplicate_frames(store, names) == {"frame_0002.png": "frame_0001.png"}
+
+
+def test_a_saved_map_skips_decoding(tmp_path, monkeypatch, no_decoding):
+    monkeypatch.setitem(core.config, "dedup_frames", True)
+    store = core.open_frame_store(str(tmp_path))
+    for index in (1, 2):
+        store.write(f"frame_{index:04d}.png", frame(10))
+    core._save_duplicates(store, {"frame_0001.png": "frame_0001.png", "frame_0002.png": "frame_0001.png"})
+    assert core.find_duplicate_frames(store, store.names()) == {"frame_0002.png": "frame_0001.png"}
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from dithering import DITHER_MODES, bayer_matrix, dither
+
+
+def gradient(height=40, width=64):
+    """A horizontal ramp with some noise, so every dither mode produces a mix of black and white"""
+    ramp = np.tile(np.linspace(0, 255, width), (height, 1))
+    noise = np.random.default_rng(0).normal(0, 20, (height, width))
+    return np.clip(ramp + noise, 0, 255).astype(np.uint8)
+
+
+def test_floyd_steinberg_matches_pil():
+    gray = gradient()
+    expected = np.asarray(Image.fromarray(gray).convert('1', dither=Image.FLOYDSTEINBERG).convert('L'))
+    np.testing.assert_array_equal(dither(gray, "floyd_steinberg"), expected)
+
+
+@pytest.mark.parametrize("mode", DITHER_MODES)
+def test_modes_produce_black_and_white(mode):
+    gray = gradient()
+    result = dither(gray, mode)
+    assert result.shape == gray.shape and result.dtype == np.uint8
+    assert set(np.unique(result)) == {0, 255}
+    # The ramp keeps its brightness: the dark side is mostly black, the bright side mostly white
+    assert result[:, :8].mean() < 64 and result[:, -8:].mean() > 191
+
+
+@pytest.mark.parametrize("size", [2, 4, 8])
+def test_bayer_matrix_uses_every_threshold_once(size):
+    matrix = bayer_matrix(size)
+    assert matrix.shape == (size, size)
+    assert len(np.unique(matrix)) == size * size
+
+
+def test_unknown_mode_falls_back_to_floyd_steinberg():
+    gray = gradient()
+    np.testing.assert_array_equal(dither(gray, "unknown"), dither(gray, "floyd_steinberg"))
@@ -0,0 +1,64 @@
+import os
+import time
+
+from frame_cache import FrameCache
+
+
+def write_set(directory, count=3, size=100):
+    os.makedirs(directory, exist_ok=True)
+    for index in range(1, count + 1):
+        with open(os.path.join(directory, f"frame_{index:04d}.png"), "wb") as f:
+            f.write(bytes([index]) * size)
+    return str(directory)
+
+
+def test_stored_frames_are_restored(tmp_path):
+    cache = FrameCache(str(tmp_path / "cache"), 10 ** 6)
+    source = write_set(tmp_path / "frames")
+    cache.store("abc", 12, source)
+    entry = cache.lookup("abc", 12)
+    assert entry is not None
+    cache.restore(entry, str(tmp_path / "restored"))
+    assert sorted(os.listdir(tmp_path / "restored")) == sorted(os.listdir(source))
+    assert cache.lookup("abc", 24) is None
+    assert cache.lookup("abc", 12, model="u2net") is None
+    assert cache.lookup("abc", 12, pixel_size=4) is None
+
+
+def test_index_survives_a_new_instance(tmp_path):
+    FrameCache(str(tmp_path / "cache"), 10 ** 6).store("abc", 12, write_set(tmp_path / "frames"), model="u2net")
+    assert FrameCache(str(tmp_path / "cache"), 10 ** 6).lookup("abc", 12, model="u2net") is not None
+
+
+def test_incomplete_sets_are_dropped(tmp_path):
+    cache = FrameCache(str(tmp_path / "cache"), 10 ** 6)
+    cache.store("abc", 12, write_set(tmp_path / "frames"))
+    entry = cache.lookup("abc", 12)
+    os.remove(os.path.join(entry, "frame_0002.png"))
+    assert cache.lookup("abc", 12) is None
+
+
+def test_least_recently_used_sets_are_evicted(tmp_path):
+    cache = FrameCache(str(tmp_path / "cache"), 700)
+    source = write_set(tmp_path / "frames")
+    cache.store("first", 12, source)
+    time.sleep(0.01)
+    cache.store("second", 12, source)
+    time.sleep(0.01)
+    assert cache.lookup("first", 12) is not None
+    time.sleep(0.01)
+    cache.store("third", 12, source)
+    assert cache.lookup("second", 12) is None
+    assert cache.lookup("first", 12) is not None
+    assert cache.lookup("third", 12) is not None
+    assert cache.total_bytes() <= 700
+
+
+def test_video_hash_follows_the_contents(tmp_path):
+    cache = FrameCache(str(tmp_path / "cache"), 10 ** 6)
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"one")
+    first = cache.video_hash(str(video))
+    assert cache.video_hash(str(video)) == first
+    video.write_bytes(b"two!")
+    assert cache.video_hash(str(video)) != first
@@ -0,0 +1,79 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from checkpoint import JobCheckpoint
+from frame_store import PngFrameStore, RawFrameStore, open_frame_store
+
+
+def frame(value, shape=(6, 8, 3)):
+    return np.full(shape, value, np.uint8)
+
+
+def test_raw_store_grows_past_its_capacity_and_reloads(tmp_path):
+    path = str(tmp_path / "frames.raw")
+    store = RawFrameStore(path, capacity=2)
+    for index in range(1, 6):
+        store.write(f"frame_{index:04d}.png", frame(index))
+    store.copy("frame_0006.png", "frame_0002.png")
+    assert store.capacity >= 6
+    store.flush()
+    reloaded = open_frame_store(path)
+    assert reloaded.names() == [f"frame_{index:04d}.png" for index in range(1, 7)]
+    np.testing.assert_array_equal(reloaded.read("frame_0005.png"), frame(5))
+    np.testing.assert_array_equal(reloaded.read("frame_0006.png"), frame(2))
+
+
+def test_raw_store_rejects_frames_of_another_shape(tmp_path):
+    store = RawFrameStore(str(tmp_path / "frames.raw"))
+    store.write("frame_0001.png", frame(1))
+    with pytest.raises(ValueError):
+        store.write("frame_0002.png", frame(1, (6, 8, 4)))
+
+
+def test_pickled_store_writes_reserved_slots(tmp_path):
+    store = RawFrameStore(str(tmp_path / "frames.raw"))
+    store.reserve(["frame_0001.png", "frame_0002.png"], (6, 8, 3))
+    worker_copy = pickle.loads(pickle.dumps(store))
+    worker_copy.write("frame_0002.png", frame(9))
+    np.testing.assert_array_equal(store.read("frame_0002.png"), frame(9))
+
+
+@pytest.mark.parametrize("kind", ["png", "raw"])
+def test_export_writes_exactly_the_names_given(tmp_path, kind):
+    store = open_frame_store(str(tmp_path / ("frames.raw" if kind == "raw" else "frames")))
+    if kind == "png":
+        os.makedirs(store.directory)
+    for index in (1, 2):
+        store.write(f"frame_{index:04d}.png", frame(index))
+    store.export_png(str(tmp_path / "none"), names=[])
+    assert os.listdir(tmp_path / "none") == []
+    store.export_png(str(tmp_path / "one"), names=["frame_0002.png"])
+    assert os.listdir(tmp_path / "one") == ["frame_0002.png"]
+    store.export_png(str(tmp_path / "all"))
+    assert sorted(os.listdir(tmp_path / "all")) == ["frame_0001.png", "frame_0002.png"]
+
+
+def test_png_store_lists_only_frames(tmp_path):
+    store = PngFrameStore(str(tmp_path))
+    store.write("frame_10000.png", frame(1))
+    store.write("frame_9999.png", frame(2))
+    (tmp_path / "notes.txt").write_text("x")
+    assert store.names() == ["frame_9999.png", "frame_10000.png"]
+
+
+def test_checkpointed_frames_survive_a_crash_mid_stage(tmp_path):
+    path = str(tmp_path / "frames.raw")
+    store = RawFrameStore(path, capacity=4)
+    checkpoint = JobCheckpoint(str(tmp_path / "checkpoint.json"), save_interval=0)
+    stage = checkpoint.stage("extract_frames", {}, store)
+    for index in (1, 2, 3):
+        store.write(f"frame_{index:04d}.png", frame(index))
+        stage.mark_done(f"frame_{index:04d}.png")
+    # No store.flush(): the process dies before the stage ends
+    resumed = JobCheckpoint(str(tmp_path / "checkpoint.json")).stage("extract_frames", {}, RawFrameStore(path))
+    names = [f"frame_{index:04d}.png" for index in range(1, 5)]
+    assert resumed.pending(names) == ["frame_0004.png"]
+    np.testing.assert_array_equal(RawFrameStore(path).read("frame_0003.png"), frame(3))
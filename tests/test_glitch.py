@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageOps
+
+from art_styles import displace_blocks, rgb_shift
+
+
+def image(height=20, width=30):
+    return np.random.default_rng(0).integers(1, 256, (height, width, 3), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("shift", [0, 3, 30, 45])
+def test_rgb_shift_matches_the_pil_channel_crop(shift):
+    img = image()
+    r, g, b = Image.fromarray(img).split()
+    r = ImageOps.expand(ImageOps.crop(r, (min(shift, 30), 0, 0, 0)), (0, 0, min(shift, 30), 0), fill=0)
+    b = ImageOps.expand(ImageOps.crop(b, (0, 0, min(shift, 30), 0)), (min(shift, 30), 0, 0, 0), fill=0)
+    expected = np.asarray(Image.merge("RGB", (r, g, b)))
+    np.testing.assert_array_equal(rgb_shift(img, shift, red=0, blue=2), expected)
+
+
+def test_rgb_shift_follows_the_channel_order_and_writes_into_out():
+    img = image()
+    out = np.empty_like(img)
+    result = rgb_shift(img, 2, red=2, blue=0, out=out)
+    assert result is out
+    np.testing.assert_array_equal(result[:, :-2, 2], img[:, 2:, 2])
+    np.testing.assert_array_equal(result[:, 2:, 0], img[:, :-2, 0])
+    np.testing.assert_array_equal(result[:, :, 1], img[:, :, 1])
+
+
+def displace_blocks_loop(img, count, rng, max_size=6, max_shift=3):
+    """One block at a time, reading every block from the frame before any is moved"""
+    height, width = img.shape[:2]
+    xs = rng.integers(0, width - 2, count)
+    ys = rng.integers(0, height - 2, count)
+    block_w = rng.integers(1, max_size + 1, count)
+    block_h = rng.integers(1, max_size + 1, count)
+    shifts = rng.integers(-max_shift, max_shift + 1, count)
+    padded = np.zeros((height, width + max_size) + img.shape[2:], img.dtype)
+    padded[:, :width] = img
+    blocks = [padded[y:y + h, x:x + w].copy() for x, y, w, h in zip(xs, ys, block_w, block_h)]
+    for block, x, y, shift in zip(blocks, xs, ys, shifts):
+        for dy in range(block.shape[0]):
+            for dx in range(block.shape[1]):
+                if 0 <= x + dx + shift < width:
+                    img[y + dy, x + dx + shift] = block[dy, dx]
+    return img
+
+
+@pytest.mark.parametrize("count", [1, 10, 500])
+def test_displace_blocks_matches_a_block_by_block_loop(count):
+    expected = displace_blocks_loop(image(), count, np.random.default_rng(5))
+    np.testing.assert_array_equal(displace_blocks(image(), count, np.random.default_rng(5)), expected)
+
+
+def test_displace_blocks_skips_tiny_frames_and_zero_counts():
+    img = image(2, 30)
+    np.testing.assert_array_equal(displace_blocks(img.copy(), 10, np.random.default_rng(0)), img)
+    np.testing.assert_array_equal(displace_blocks(image(), 0, np.random.default_rng(0)), image())
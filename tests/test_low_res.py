@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+import pytest
+
+import core
+from conftest import decode_frames, requires_ffmpeg
+
+FAITH = {"pixel_size": 4, "dithering": True, "contrast": 1.5, "color_mode": "monochrome"}
+PALETTE = [[0, 0, 0], [255, 255, 255], [200, 30, 30], [30, 200, 30], [30, 30, 200], [128, 128, 128]]
+
+
+def render(make_video, tmp_path, name, params, low_res, size="96x72"):
+    """Stream the test clip through a custom style into a lossless APNG and return its frames"""
+    video = make_video(size=size)
+    output = str(tmp_path / f"{name}.apng")
+    core.process_video_stream(video, 10, output, (100, 200), 0, "custom", params, low_res=low_res)
+    return np.stack(decode_frames(output))
+
+
+def test_faith_noise_moves_to_the_encoder():
+    pixel_size, params, noise_level = core.plan_low_res("custom", dict(FAITH, noise_level=0.3))
+    assert (pixel_size, params["noise_level"], noise_level, params["grid_scale"]) == (4, 0, 0.3, 4)
+
+
+def test_grid_noise_stays_in_the_style():
+    _, params, noise_level = core.plan_low_res("custom", dict(FAITH, noise_level=0.3, noise_mode="grid"))
+    assert (params["noise_level"], noise_level) == (0.3, 0)
+
+
+def test_mono_noise_keeps_full_resolution():
+    assert core.plan_low_res("custom", dict(FAITH, noise_level=0.3, noise_mode="mono")) is None
+
+
+@pytest.mark.parametrize("alpha", [False, True], ids=["bgr", "bgra"])
+def test_encoder_noise_only_brightens(alpha):
+    grid = np.zeros((8, 8, 4 if alpha else 3), dtype=np.uint8)
+    grid[:4] = 255
+    result = core.upscale_with_noise(grid, (32, 32), 0.2)
+    assert result.shape == (32, 32, grid.shape[2])
+    assert (result[:16] == 255).all()
+    dark = result[16:, :, :3]
+    assert dark.max() < int(0.2 * 255) and 20 < dark.mean() < 31
+    if alpha:
+        assert (result[16:, :, 3] == 0).all()
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("params", [
+    dict(FAITH, noise_level=0),
+    {"pixel_size": 3, "color_mode": "limited_palette", "palette": PALETTE},
+    {"pixel_size": 2, "glitch_blocks": 0, "color_mode": "rgb_shift"},
+], ids=["faith", "classic_pixel", "glitch"])
+def test_low_res_matches_full_res_without_noise(make_video, tmp_path, fake_remover, params):
+    full = render(make_video, tmp_path, "full", params, low_res=False)
+    low = render(make_video, tmp_path, "low", params, low_res=True)
+    np.testing.assert_array_equal(low, full)
+
+
+def test_upscale_stretches_to_sizes_that_are_not_grid_multiples():
+    grid = np.arange(3 * 4 * 3, dtype=np.uint8).reshape(3, 4, 3)
+    result = core.upscale_with_noise(grid, (30, 22))
+    expected = cv2.resize(grid, (30, 22), interpolation=cv2.INTER_NEAREST_EXACT)
+    np.testing.assert_array_equal(result, expected)
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("store", ["png", "raw"])
+def test_staged_low_res_keeps_the_source_size(make_video, tmp_path, monkeypatch, store):
+    monkeypatch.setitem(core.config, "frame_store", store)
+    video = make_video(size="70x50")
+    frames, _, processed = core.open_stage_stores(str(tmp_path / "work"), capacity=10)
+    core.extract_frames(video, 10, frames, pixel_size=4)
+    output = str(tmp_path / "out.mp4")
+    core.reassemble_video(frames, 10, output, upscale=4, size=core.probe_video(video))
+    assert core.probe_video(output) == (70, 50)
+
+
+@requires_ffmpeg
+def test_sizes_that_are_not_grid_multiples_match_full_res(make_video, tmp_path, fake_remover):
+    params = dict(FAITH, pixel_size=8, noise_level=0)
+    full = render(make_video, tmp_path, "full", params, low_res=False, size="70x50")
+    low = render(make_video, tmp_path, "low", params, low_res=True, size="70x50")
+    assert low.shape[1:3] == (50, 70)
+    np.testing.assert_array_equal(low, full)
+
+
+@requires_ffmpeg
+def test_low_res_noise_looks_like_full_res_noise(make_video, tmp_path, fake_remover):
+    clean = render(make_video, tmp_path, "clean", dict(FAITH, noise_level=0), low_res=True).astype(int)
+    amplitude = int(0.2 * 255)
+    means = []
+    for low_res in (False, True):
+        noisy = render(make_video, tmp_path, f"noisy_{low_res}", dict(FAITH, noise_level=0.2), low_res)
+        added = noisy.astype(int) - clean
+        # One-sided and saturating: nothing gets darker and white stays white
+        assert added.min() >= 0 and added.max() < amplitude
+        assert (noisy[clean == 255] == 255).all()
+        means.append(added[..., :3][clean[..., :3] == 0].mean())
+    assert abs(means[0] - means[1]) < 1.0
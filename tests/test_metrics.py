@@ -0,0 +1,73 @@
+import json
+
+from metrics import JobMetrics, NullMetrics, StageMetrics, format_eta, percentile
+
+
+def test_percentile_picks_the_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 51
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+
+def test_stage_counts_frames_skips_and_eta():
+    stage = StageMetrics("style", total_frames=10)
+    assert stage.eta is None and stage.fraction == 0.0
+    stage.frame_done(0.01, count=2)
+    stage.frame_skipped(3)
+    assert stage.frames_done == 5 and stage.skipped == 3
+    assert len(stage.latencies) == 2
+    assert stage.fraction == 0.5
+    assert stage.eta is not None and stage.eta >= 0
+    summary = stage.summary()
+    assert summary["frames"] == 5 and summary["skipped"] == 3
+    assert summary["latency_ms"]["p50"] == 10.0
+
+
+def test_fraction_is_unknown_without_a_total():
+    stage = StageMetrics("decode")
+    stage.frame_done(0.01)
+    assert stage.fraction is None and stage.eta is None
+
+
+def test_job_notifies_on_stage_changes_and_throttles_frames(tmp_path):
+    updates = []
+    metrics = JobMetrics("job", on_update=updates.append, update_interval=60)
+    with metrics.stage("extract_frames", 100):
+        for _ in range(50):
+            metrics.frame_done()
+        metrics.advance_to(80)
+    # Start and end are forced; frame updates within update_interval are not sent
+    assert len(updates) == 2
+    assert metrics.stages[0].frames_done == 80
+    summary = json.loads(open(metrics.write(str(tmp_path / "metrics.json"))).read())
+    assert summary["hot_stage"] == "extract_frames"
+    assert summary["stages"][0]["frames"] == 80
+
+
+def test_null_metrics_accepts_every_call():
+    metrics = NullMetrics()
+    with metrics.stage("anything", 3):
+        metrics.frame_done(0.1)
+        metrics.frame_skipped()
+        metrics.advance_to(3)
+    metrics.output_written("missing.mp4", "mp4", 0.1)
+
+
+def test_format_eta():
+    assert format_eta(None) == "--:--"
+    assert format_eta(75) == "1:15"
+    assert format_eta(3725) == "1:02:05"
+
+
+def test_queue_samples_name_the_bottleneck():
+    metrics = JobMetrics("job")
+    metrics.start_stage("stream")
+    metrics.queue_sample({"remove_background": 1, "style": 7, "sink": 0}, 8)
+    metrics.queue_sample({"remove_background": 0, "style": 8, "sink": 1}, 8)
+    metrics.end_stage()
+    summary = metrics.summary()["stages"][0]
+    assert summary["bottleneck"] == "style"
+    assert summary["queues"]["style"] == {"mean_depth": 7.5, "max_depth": 8, "capacity": 8}
+
+
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import core
+from art_styles import NumpyArtStyleProcessor
+from noise import NoiseSource
+
+
+@pytest.mark.parametrize("use_bank", [True, False], ids=["bank", "fresh"])
+def test_noise_stays_in_range_and_is_seeded(use_bank):
+    first = NoiseSource(seed=3, use_bank=use_bank).uniform((40, 60, 3), 51)
+    second = NoiseSource(seed=3, use_bank=use_bank).uniform((40, 60, 3), 51)
+    assert first.shape == (40, 60, 3) and first.dtype == np.uint8
+    assert first.max() < 51
+    np.testing.assert_array_equal(first, second)
+
+
+def test_bank_views_are_read_only_and_differ_per_frame():
+    source = NoiseSource(seed=1)
+    first, second = source.uniform((32, 32, 3), 100), source.uniform((32, 32, 3), 100)
+    assert not first.flags.writeable
+    assert not np.array_equal(first, second)
+    # One bank serves every frame of that size
+    assert len(source._banks) == 1
+
+
+def test_bank_grows_for_larger_frames():
+    source = NoiseSource(seed=1, margin=8)
+    source.uniform((16, 16), 50)
+    assert source.uniform((64, 48), 50).shape == (64, 48)
+    assert source._banks[(50, ())].shape == (72, 56)
+
+
+def frame():
+    return np.dstack([np.tile(np.linspace(0, 255, 48, dtype=np.uint8), (32, 1))] * 3)
+
+
+@pytest.mark.parametrize("noise_mode", ["color", "mono", "grid"])
+def test_noise_modes_only_brighten(noise_mode):
+    processor = NumpyArtStyleProcessor(core.config)
+    params = {"pixel_size": 4, "dithering": False, "color_mode": "monochrome", "noise_level": 0.2,
+              "noise_mode": noise_mode}
+    clean = processor.process_image(frame(), "custom", dict(params, noise_level=0)).astype(int)
+    noisy = processor.process_image(frame(), "custom", params).astype(int)
+    added = noisy - clean
+    assert added.min() >= 0 and added.max() < 51
+    assert (noisy[clean == 255] == 255).all()
+    if noise_mode == "mono":
+        assert (added[..., 0] == added[..., 1]).all() and (added[..., 1] == added[..., 2]).all()
+    if noise_mode == "grid":
+        # Every 4x4 cell gets one value per channel
+        cells = added.reshape(8, 4, 12, 4, 3)
+        assert (cells == cells[:, :1, :, :1]).all()
+
+
+def test_unknown_noise_mode_falls_back_to_color(capsys):
+    processor = NumpyArtStyleProcessor(core.config)
+    assert processor._noise_mode({"noise_mode": "sparkle"}, 0.2) == "color"
+    assert processor._noise_mode({"noise_mode": "mono"}, 0) is None
+    assert "sparkle" in capsys.readouterr().err
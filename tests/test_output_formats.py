@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import core
+from conftest import decode_frames, requires_ffmpeg
+from output_formats import encode_args, keeps_alpha, output_format
+
+
+@pytest.mark.parametrize("path, expected", [("a.mp4", "mp4"), ("a.GIF", "gif"), ("a.webp", "webp"),
+                                            ("a.apng", "apng"), ("a.png", "apng"), ("a.mkv", "ffv1"),
+                                            ("a.avi", "mp4")])
+def test_format_follows_the_extension(path, expected):
+    assert output_format(path) == expected
+
+
+def test_only_mp4_drops_alpha():
+    assert not keeps_alpha("mp4")
+    assert all(keeps_alpha(name) for name in ("gif", "webp", "apng", "ffv1"))
+
+
+def test_gif_builds_one_palette_after_the_video_filter():
+    args = encode_args("gif", "scale=iw*2:ih*2", "bayer")
+    graph = args[args.index("-filter_complex") + 1]
+    assert graph.startswith("[0:v]scale=iw*2:ih*2,split")
+    assert "palettegen=stats_mode=full:reserve_transparent=1" in graph and "dither=bayer" in graph
+    assert encode_args("mp4", "pad=2:2")[:2] == ["-vf", "pad=2:2"]
+
+
+def frames():
+    """Three BGRA frames with a transparent left half and a moving opaque block"""
+    result = []
+    for step in range(3):
+        frame = np.zeros((32, 48, 4), np.uint8)
+        frame[:, 24:] = (40, 80, 200, 255)
+        frame[8:16, 24 + 8 * step:32 + 8 * step] = (255, 255, 255, 255)
+        result.append(frame)
+    return result
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("extension", [".apng", ".mkv"])
+def test_lossless_formats_keep_every_pixel_and_alpha(tmp_path, extension):
+    path = str(tmp_path / f"out{extension}")
+    with core.VideoEncoder(path, 10) as encoder:
+        for frame in frames():
+            encoder.write(frame)
+    decoded = decode_frames(path)
+    assert len(decoded) == 3
+    for expected, actual in zip(frames(), decoded):
+        np.testing.assert_array_equal(actual, expected)
+
+
+@requires_ffmpeg
+def test_gif_keeps_transparency(tmp_path):
+    path = str(tmp_path / "out.gif")
+    with core.VideoEncoder(path, 10) as encoder:
+        for frame in frames():
+            encoder.write(frame)
+    decoded = decode_frames(path)
+    assert len(decoded) == 3 and decoded[0].shape[2] == 4
+    for expected, actual in zip(frames(), decoded):
+        assert (actual[:, :24, 3] == 0).all()
+        np.testing.assert_array_equal(actual[:, 24:], expected[:, 24:])
+
+
+@requires_ffmpeg
+def test_webp_is_an_animated_lossless_file(tmp_path):
+    path = str(tmp_path / "out.webp")
+    with core.VideoEncoder(path, 10) as encoder:
+        for frame in frames():
+            encoder.write(frame)
+    data = open(path, "rb").read()
+    assert data[:4] == b"RIFF" and data[8:12] == b"WEBP"
+    assert b"ANIM" in data and b"VP8L" in data
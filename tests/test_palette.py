@@ -0,0 +1,55 @@
+import os
+import subprocess
+
+import cv2
+import numpy as np
+
+import core
+from conftest import requires_ffmpeg
+from palette import PaletteLUT, build_palette
+
+
+def test_lut_maps_to_the_nearest_palette_color():
+    palette = [[0, 0, 0], [255, 255, 255], [200, 30, 30], [30, 30, 200]]
+    colors = np.random.default_rng(0).integers(0, 256, (50, 40, 3), dtype=np.uint8)
+    mapped = PaletteLUT(palette, bits=8).apply(colors)
+    distances = ((colors[:, :, None, :].astype(int) - np.array(palette)) ** 2).sum(axis=3)
+    np.testing.assert_array_equal(mapped, np.array(palette, np.uint8)[distances.argmin(axis=2)])
+
+
+def test_coarse_lut_keeps_palette_colors_and_every_output_is_in_the_palette():
+    palette = np.array([[0, 0, 0], [255, 255, 255], [200, 30, 30], [30, 30, 200]], np.uint8)
+    lut = PaletteLUT(palette)
+    np.testing.assert_array_equal(lut.apply(palette.reshape(1, 4, 3)), palette.reshape(1, 4, 3))
+    colors = np.random.default_rng(1).integers(0, 256, (30, 30, 3), dtype=np.uint8)
+    assert {tuple(color) for color in lut.apply(colors).reshape(-1, 3)} <= {tuple(color) for color in palette}
+
+
+def test_build_palette_keeps_only_colors_in_use():
+    frames = [np.full((8, 8, 3), (10, 20, 30), np.uint8), np.full((8, 8, 3), (200, 100, 0), np.uint8)]
+    assert sorted(map(tuple, build_palette(frames).tolist())) == [(10, 20, 30), (200, 100, 0)]
+
+
+def two_scene_clip(tmp_path):
+    """One second of red, then one second of blue"""
+    path = str(tmp_path / "scenes.mp4")
+    scenes = [arg for color in ("red", "blue")
+              for arg in ("-f", "lavfi", "-i", f"color=c={color}:size=64x48:rate=10:duration=1")]
+    subprocess.run(["ffmpeg", "-v", "error", "-y", *scenes, "-filter_complex", "concat=n=2:v=1",
+                    "-pix_fmt", "yuv420p", "-c:v", "libx264", path], check=True)
+    return path
+
+
+@requires_ffmpeg
+def test_stream_palette_covers_the_whole_video(tmp_path, fake_remover, monkeypatch):
+    monkeypatch.setitem(core.config, "shared_palette", True)
+    monkeypatch.setitem(core.config, "dedup_frames", False)
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    core.process_video_stream(two_scene_clip(tmp_path), 10, None, (100, 200), 0, "classic_pixel",
+                              processed_dir=str(processed))
+    names = sorted(os.listdir(processed))
+    first, last = (cv2.imread(str(processed / name)) for name in (names[0], names[-1]))
+    # BGR: the red scene stays red and the blue scene stays blue
+    assert first[:, :, 2].mean() > 150 and first[:, :, 0].mean() < 100
+    assert last[:, :, 0].mean() > 150 and last[:, :, 2].mean() < 100
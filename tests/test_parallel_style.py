@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+import cv2
+import numpy as np
+import pytest
+
+import core
+from frame_store import open_frame_store
+
+
+def write_frames(directory, count=6, shape=(48, 64, 4)):
+    """Distinct random BGRA frames frame_0001.png, ... in a PNG folder"""
+    directory.mkdir(exist_ok=True)
+    rng = np.random.default_rng(0)
+    for index in range(1, count + 1):
+        cv2.imwrite(str(directory / f"frame_{index:04d}.png"), rng.integers(0, 256, shape, dtype=np.uint8))
+    return str(directory)
+
+
+@pytest.mark.parametrize("store_suffix", ["", ".raw"])
+def test_process_pool_matches_a_single_worker(tmp_path, monkeypatch, store_suffix):
+    monkeypatch.setitem(core.config, "dedup_frames", False)
+    input_dir = write_frames(tmp_path / "frames")
+    results = []
+    for workers in (1, 2):
+        output = str(tmp_path / f"processed_{workers}{store_suffix}")
+        if not store_suffix:
+            (tmp_path / f"processed_{workers}").mkdir()
+        stats = core.apply_converter_style(input_dir, (100, 200), 0, output, "classic_pixel", workers=workers)
+        assert stats == {"frames": 6, "skipped": 0}
+        store = open_frame_store(output)
+        results.append([store.read(name).copy() for name in store.names()])
+    assert len(results[0]) == len(results[1]) == 6
+    for single, pooled in zip(*results):
+        np.testing.assert_array_equal(single, pooled)
+
+
+
+def test_pool_exits_after_numba_parallel_kernels_ran(tmp_path):
+    """A forked pool used to leave the parent hanging once numba's threading layer was up"""
+    input_dir = write_frames(tmp_path / "frames")
+    script = (
+        "import sys, core, dithering\n"
+        "dithering.dither(core.np.zeros((8, 8), core.np.uint8), 'bayer4')\n"
+        "core.apply_converter_style(sys.argv[1], (100, 200), 0, sys.argv[2] + '.raw', 'classic_pixel', workers=2)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script, input_dir, str(tmp_path / "processed")],
+                            cwd=os.getcwd(), env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+                            timeout=120)
+    assert result.returncode == 0
@@ -0,0 +1,112 @@
+import time
+import random
+import threading
+
+import pytest
+
+from pipeline import PipelineStage, run_pipeline
+
+
+def items(count):
+    return ((index, index) for index in range(count))
+
+
+def test_sink_gets_items_in_index_order():
+    def jitter(item):
+        time.sleep(random.random() * 0.01)
+        return [(item[0], item[1] * 2)]
+
+    received = []
+    count = run_pipeline(items(50), [PipelineStage("double", jitter, workers=4)], received.append)
+    assert count == 50
+    assert received == [(index, index * 2) for index in range(50)]
+
+
+def test_stage_can_drop_and_split_items():
+    def split(item):
+        index, value = item
+        return [] if value % 2 else [(index // 2, value)]
+
+    received = []
+    assert run_pipeline(items(10), [PipelineStage("evens", split)], received.append) == 5
+    assert received == [(0, 0), (1, 2), (2, 4), (3, 6), (4, 8)]
+
+
+def test_full_queues_hold_back_the_source():
+    pulled = []
+    release = threading.Event()
+
+    def source():
+        for index in range(1000):
+            pulled.append(index)
+            yield index, index
+
+    def sink(item):
+        if item[0] == 0:
+            time.sleep(0.5)
+            # Queue of the stage and of the sink, plus one item held by each thread
+            assert len(pulled) <= 2 * 4 + 3
+            release.set()
+
+    assert run_pipeline(source(), [PipelineStage("copy", lambda item: [item])], sink, queue_size=4) == 1000
+    assert release.is_set()
+
+
+def test_stage_error_stops_the_pipeline_and_closes_the_source():
+    closed = threading.Event()
+
+    def source():
+        try:
+            for index in range(1000):
+                yield index, index
+        finally:
+            closed.set()
+
+    def fail(item):
+        if item[0] == 3:
+            raise ValueError("bad frame")
+        return [item]
+
+    received = []
+    with pytest.raises(ValueError, match="bad frame"):
+        run_pipeline(source(), [PipelineStage("fail", fail, workers=2)], received.append, queue_size=2)
+    assert closed.is_set()
+    assert len(received) <= 3
+
+
+def test_sink_and_source_errors_are_raised():
+    def broken_sink(item):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError, match="disk full"):
+        run_pipeline(items(100), [PipelineStage("copy", lambda item: [item])], broken_sink)
+
+    def broken_source():
+        yield 0, 0
+        raise RuntimeError("decoder died")
+
+    with pytest.raises(RuntimeError, match="decoder died"):
+        run_pipeline(broken_source(), [PipelineStage("copy", lambda item: [item])], lambda item: None)
+
+
+def test_missing_index_is_reported():
+    with pytest.raises(RuntimeError, match="never received index 1"):
+        run_pipeline(iter([(0, 0), (2, 2)]), [PipelineStage("copy", lambda item: [item])], lambda item: None)
+
+
+def test_queue_depths_are_sampled_per_stage():
+    samples = []
+
+    class Metrics:
+        def queue_sample(self, depths, capacity):
+            samples.append((dict(depths), capacity))
+
+    def slow(item):
+        time.sleep(0.01)
+        return [item]
+
+    run_pipeline(items(30), [PipelineStage("slow", slow)], lambda item: None, queue_size=4,
+                 metrics=Metrics(), sample_interval=0.01)
+    assert samples
+    assert all(set(depths) == {"slow", "sink"} and capacity == 4 for depths, capacity in samples)
+    assert max(depths["slow"] for depths, capacity in samples) > max(depths["sink"] for depths, capacity in samples)
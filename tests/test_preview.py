@@ -0,0 +1,58 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import core
+from gui_components.preview import PreviewRenderer
+
+
+def sample_frame():
+    """A smooth BGRA gradient with an opaque alpha, like a background-removed frame"""
+    x = np.linspace(0, 255, 96)
+    y = np.linspace(0, 255, 72)[:, None]
+    frame = np.dstack([np.broadcast_to(x, (72, 96)), np.broadcast_to(y, (72, 96)),
+                       np.broadcast_to((x + y) / 2, (72, 96)), np.full((72, 96), 255)])
+    return frame.astype(np.uint8)
+
+
+@pytest.fixture
+def renderer(monkeypatch):
+    renderer = PreviewRenderer(max_size=(96, 72))
+    monkeypatch.setattr(renderer, "_source_frame", lambda video_path, position: sample_frame())
+    return renderer
+
+
+@pytest.mark.parametrize("style_name", ["classic_pixel", "glitch"])
+def test_preview_matches_the_full_size_output(renderer, style_name):
+    params = {"pixel_size": 3, "glitch_blocks": 0, "color_mode": "rgb_shift"} if style_name == "glitch" else None
+    preview_style = "custom" if params else style_name
+    image, _ = renderer._render("clip.mp4", 0, preview_style, params, (100, 200), 0)
+    name, planned = core.plan_palette(preview_style, params, [sample_frame()])
+    expected = core.style_frame(sample_frame(), (100, 200), 0, name, planned)
+    np.testing.assert_array_equal(image, cv2.cvtColor(expected[:, :, :3], cv2.COLOR_BGR2RGB))
+
+
+def test_requests_render_in_the_background(renderer):
+    renderer.request("clip.mp4", 0, "classic_pixel", None, (100, 200), 0)
+    renderer.request("clip.mp4", 50, "faith", None, (100, 200), 0)
+    result = None
+    deadline = time.perf_counter() + 10
+    while result is None and time.perf_counter() < deadline:
+        time.sleep(0.01)
+        result = renderer.take_result()
+    assert result is not None and result["error"] is None
+    assert result["image"].shape == (72, 96, 3)
+    assert renderer.take_result() is None
+
+
+def test_render_errors_are_reported(renderer, monkeypatch):
+    monkeypatch.setattr(core, "style_frame", lambda *args: 1 / 0)
+    renderer.request("clip.mp4", 0, "faith", None, (100, 200), 0)
+    deadline = time.perf_counter() + 10
+    result = None
+    while result is None and time.perf_counter() < deadline:
+        time.sleep(0.01)
+        result = renderer.take_result()
+    assert "division by zero" in result["error"]
@@ -0,0 +1,82 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import core
+import segments
+from conftest import decode_frames, requires_ffmpeg
+
+
+def test_segments_cover_every_frame_once():
+    plan = segments.plan_segments(2.5, 10, 1)
+    assert [segment["frames"] for segment in plan] == [10, 10, 5]
+    assert [segment["start"] for segment in plan] == [0.0, 1.0, 2.0]
+    assert [segment["index"] for segment in plan] == [0, 1, 2]
+
+
+def test_segments_start_on_frame_timestamps():
+    plan = segments.plan_segments(1, 24, 0.3)
+    assert sum(segment["frames"] for segment in plan) == 24
+    for segment in plan:
+        assert segment["frames"] <= 7
+        assert abs(segment["start"] * 24 - round(segment["start"] * 24)) < 1e-9
+
+
+def test_claim_is_exclusive_and_oldest_first(tmp_path):
+    queue = segments.SegmentQueue(str(tmp_path))
+    for task_id in ("b", "a"):
+        queue.submit({"id": task_id})
+    other = segments.SegmentQueue(str(tmp_path))
+    assert queue.claim()["id"] == "a"
+    assert other.claim()["id"] == "b"
+    assert queue.claim() is None
+    assert not queue.is_idle()
+    queue.finish("a", {"frames": 3})
+    other.finish("b", {"frames": 4})
+    assert queue.result("a") == {"frames": 3}
+    assert queue.is_idle()
+
+
+def test_stale_claims_are_requeued(tmp_path):
+    queue = segments.SegmentQueue(str(tmp_path))
+    queue.submit({"id": "dead"})
+    queue.submit({"id": "alive"})
+    queue.claim()
+    queue.claim()
+    old = time.time() - 120
+    for task_id in ("dead", "alive"):
+        os.utime(queue._path("claimed", task_id), (old, old))
+    queue.heartbeat("alive")
+    assert queue.requeue_stale(60) == ["dead"]
+    assert queue.claim()["id"] == "dead"
+
+
+def test_finished_task_is_not_requeued(tmp_path):
+    queue = segments.SegmentQueue(str(tmp_path))
+    queue.submit({"id": "a"})
+    queue.claim()
+    queue.finish("a", {"frames": 1})
+    assert queue.requeue_stale(0) == []
+    assert queue.claim() is None
+
+
+@requires_ffmpeg
+def test_segmented_run_matches_the_stream_run(make_video, fake_remover, tmp_path, monkeypatch):
+    # Workers run as threads, so they share the fake remover
+    monkeypatch.setattr(segments, "ProcessPoolExecutor",
+                        lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+    video = make_video(duration=2)
+    streamed = str(tmp_path / "stream.apng")
+    segmented = str(tmp_path / "segmented.apng")
+    style = ([100, 200], 3, "classic_pixel")
+    assert core.process_video_stream(video, 10, streamed, *style) == 20
+    assert segments.process_video_segmented(video, 10, segmented, *style, segment_seconds=0.5, workers=2,
+                                            queue_dir=str(tmp_path / "queue")) == 20
+    expected = decode_frames(streamed)
+    frames = decode_frames(segmented)
+    assert len(frames) == len(expected) == 20
+    for frame, reference in zip(frames, expected):
+        np.testing.assert_array_equal(frame, reference)
+    assert segments.SegmentQueue(str(tmp_path / "queue")).is_idle()
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+PROBE = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import gui
+import gui_components.app_functions
+import gui_components.preview
+print(",".join(name for name in ("cv2", "numpy", "PIL", "rembg", "onnxruntime", "numba") if name in sys.modules))
+"""
+
+
+def test_gui_modules_import_without_heavy_libraries():
+    output = subprocess.run([sys.executable, "-c", PROBE, os.path.join(ROOT, "app")], capture_output=True,
+                            text=True, check=True, cwd=ROOT).stdout
+    assert output.strip() == ""
@@ -0,0 +1,43 @@
+import numpy as np
+
+import core
+from conftest import decode_frames, requires_ffmpeg
+
+pytestmark = requires_ffmpeg
+
+
+def test_probe_video_reports_the_stored_size(make_video):
+    assert core.probe_video(make_video(size="64x48")) == (64, 48)
+
+
+def test_probe_video_swaps_the_size_of_rotated_clips(make_video):
+    video = make_video(size="64x48", input_args=("-display_rotation", "90"))
+    assert core.probe_video(video) == (48, 64)
+
+
+def test_iter_video_frames_matches_a_png_decode(make_video):
+    video = make_video(rate=10, duration=1)
+    frames = list(core.iter_video_frames(video, 10))
+    expected = decode_frames(video)
+    assert len(frames) == len(expected) == 10
+    for frame, reference in zip(frames, expected):
+        np.testing.assert_array_equal(frame, reference)
+
+
+def test_iter_video_frames_decodes_rotated_clips_upright(make_video):
+    video = make_video(size="64x48", input_args=("-display_rotation", "90"))
+    frames = list(core.iter_video_frames(video, 10))
+    expected = decode_frames(video)
+    assert frames[0].shape == expected[0].shape == (64, 48, 3)
+    for frame, reference in zip(frames, expected):
+        np.testing.assert_array_equal(frame, reference)
+
+
+def test_iter_video_frames_shrinks_to_the_pixel_grid(make_video):
+    frames = list(core.iter_video_frames(make_video(size="64x48"), 10, pixel_size=4))
+    assert frames[0].shape == (12, 16, 3)
+
+
+def test_extract_frame_at_rotated_clip(make_video):
+    video = make_video(size="64x48", input_args=("-display_rotation", "90"))
+    assert core.extract_frame_at(video, 0.5).shape == (64, 48, 3)
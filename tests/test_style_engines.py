@@ -0,0 +1,81 @@
+import json
+import cv2
+import numpy as np
+import pytest
+
+from art_styles import ArtStyleProcessor, GraphArtStyleProcessor, NumpyArtStyleProcessor, grayscale
+from noise import NoiseSource
+from PIL import Image
+
+with open("config.json", "r") as f:
+    CONFIG = json.load(f)
+
+PALETTE = [[0, 0, 0], [255, 255, 255], [200, 30, 30], [30, 200, 30], [30, 30, 200], [128, 128, 128]]
+
+# Styles whose output depends on the frame alone (or on seeded draws that both engines make alike)
+CASES = {
+    "classic_pixel": ("classic_pixel", None),
+    "shared_palette": ("custom", {"pixel_size": 3, "color_mode": "limited_palette", "palette": PALETTE}),
+    "faith_floyd_steinberg": ("custom", {"pixel_size": 4, "noise_level": 0, "color_mode": "monochrome"}),
+    "faith_atkinson": ("custom", {"pixel_size": 4, "noise_level": 0, "color_mode": "monochrome",
+                                  "dither_mode": "atkinson"}),
+    "faith_bayer4": ("custom", {"pixel_size": 4, "noise_level": 0, "color_mode": "monochrome",
+                                "dither_mode": "bayer4"}),
+    "faith_threshold": ("custom", {"pixel_size": 4, "dithering": False, "noise_level": 0,
+                                   "color_mode": "monochrome"}),
+    "faith_mono_noise": ("custom", {"pixel_size": 4, "noise_level": 0.2, "noise_mode": "mono",
+                                    "color_mode": "monochrome"}),
+    "glitch_shift": ("custom", {"pixel_size": 2, "glitch_blocks": 0, "color_mode": "rgb_shift"}),
+    "glitch_blocks": ("custom", {"pixel_size": 2, "glitch_blocks": 20, "color_mode": "rgb_shift"}),
+}
+
+
+def sample_frame(alpha):
+    """A smooth random BGR(A) frame, so pixelation, contrast and dithering all have work to do"""
+    rng = np.random.default_rng(1)
+    frame = cv2.GaussianBlur(cv2.resize(rng.integers(0, 256, (60, 80, 3), dtype=np.uint8), (320, 240)), (0, 0), 3)
+    if alpha:
+        frame = np.dstack((frame, rng.integers(0, 256, frame.shape[:2], dtype=np.uint8)))
+    return frame
+
+
+def processor(engine, config=CONFIG):
+    instance = engine(config)
+    instance.noise = NoiseSource(seed=7)
+    return instance
+
+
+def test_grayscale_matches_pil():
+    rgb = np.random.default_rng(0).integers(0, 256, (100, 100, 3), dtype=np.uint8)
+    expected = np.asarray(Image.fromarray(rgb).convert('L'))
+    np.testing.assert_array_equal(grayscale(np.ascontiguousarray(rgb[:, :, ::-1])), expected)
+
+
+@pytest.mark.parametrize("alpha", [False, True], ids=["bgr", "bgra"])
+@pytest.mark.parametrize("case", CASES)
+def test_numpy_engine_matches_pil(case, alpha):
+    style_name, params = CASES[case]
+    frame = sample_frame(alpha)
+    expected = processor(ArtStyleProcessor).process_image(frame, style_name, params)
+    result = processor(NumpyArtStyleProcessor).process_image(frame, style_name, params)
+    assert result.shape == expected.shape == frame.shape
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize("alpha", [False, True], ids=["bgr", "bgra"])
+@pytest.mark.parametrize("case", CASES)
+def test_graph_engine_matches_pil(case, alpha):
+    style_name, params = CASES[case]
+    frame = sample_frame(alpha)
+    expected = processor(ArtStyleProcessor).process_image(frame, style_name, params)
+    result = processor(GraphArtStyleProcessor).process_image(frame, style_name, params)
+    assert result.shape == expected.shape == frame.shape
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize("style_name", ["faith", "glitch"])
+def test_graph_engine_matches_numpy_noise_draws(style_name):
+    frame = sample_frame(False)
+    expected = processor(NumpyArtStyleProcessor).process_image(frame, style_name)
+    result = processor(GraphArtStyleProcessor).process_image(frame, style_name)
+    np.testing.assert_array_equal(result, expected)
@@ -0,0 +1,64 @@
+import numpy as np
+
+from art_styles import NumpyArtStyleProcessor
+from style_graph import CompiledStyle, normalize_steps, plan_steps
+from test_style_engines import processor, sample_frame
+
+
+def ops(steps):
+    return [step["op"] for step in steps]
+
+
+def test_normalize_drops_steps_that_cannot_change_the_frame():
+    steps = normalize_steps([{"op": "contrast", "factor": 1}, {"op": "pixelate", "size": 1}, {"op": "grayscale"},
+                             {"op": "threshold"}, {"op": "threshold"}, {"op": "dither"}, {"op": "noise", "level": 0}])
+    assert steps == [{"op": "grayscale"}, {"op": "threshold", "level": 128}]
+
+
+def test_normalize_adds_grayscale_before_dither():
+    assert ops(normalize_steps([{"op": "dither"}])) == ["grayscale", "dither"]
+    assert ops(normalize_steps([{"op": "grayscale"}, {"op": "grayscale"}, {"op": "tint"}])) == ["grayscale", "tint"]
+    # A color threshold leaves channels at 0 or 255, but their gray mix has to be dithered again
+    assert ops(normalize_steps([{"op": "threshold"}, {"op": "dither"}])) == ["threshold", "grayscale", "dither"]
+
+
+def test_unknown_ops_and_noise_modes_warn_on_stderr(capsys):
+    steps = normalize_steps([{"op": "sparkle"}, {"op": "noise", "mode": "pink"}])
+    captured = capsys.readouterr()
+    assert steps == [{"op": "noise", "level": 0.2, "mode": "color"}]
+    assert captured.out == ""
+    assert "Style op sparkle not found" in captured.err
+    assert "Noise mode pink not found" in captured.err
+
+
+def test_pointwise_steps_move_to_the_pixel_grid():
+    steps = plan_steps(normalize_steps([{"op": "invert"}, {"op": "pixelate", "size": 4},
+                                        {"op": "posterize"}, {"op": "noise", "mode": "color"}]))
+    assert ops(steps) == ["pixelate", "invert", "posterize", "upscale", "noise"]
+
+
+def test_adjacent_table_ops_fuse_into_one_pass():
+    style = CompiledStyle([{"op": "pixelate"}, {"op": "grayscale"}, {"op": "contrast", "factor": 1.5},
+                           {"op": "posterize"}, {"op": "invert"}, {"op": "tint", "light": [255, 0, 0]}])
+    assert style.kernel_names == ["pixelate/4", "grayscale+contrast+posterize+invert+tint", "upscale"]
+    assert style.deterministic
+
+
+def test_graph_style_keeps_size_and_alpha():
+    frame = sample_frame(True)
+    pipeline = [{"op": "pixelate", "size": 5}, {"op": "grayscale"}, {"op": "dither", "mode": "bayer4"},
+                {"op": "tint", "dark": [20, 30, 40], "light": [240, 230, 200]}]
+    result = processor(NumpyArtStyleProcessor).process_image(frame, "custom", {"pipeline": pipeline})
+    assert result.shape == frame.shape
+    np.testing.assert_array_equal(result[:, :, 3], frame[:, :, 3])
+    colors = np.unique(result[:, :, :3].reshape(-1, 3), axis=0)
+    np.testing.assert_array_equal(colors, [[40, 30, 20], [200, 230, 240]])
+
+
+def test_low_res_plan_moves_trailing_color_noise_to_the_encoder():
+    style = CompiledStyle([{"op": "pixelate", "size": 4}, {"op": "posterize"}, {"op": "noise", "level": 0.1}])
+    pixel_size, params, noise_level = style.low_res_plan({})
+    assert (pixel_size, noise_level, params["grid_scale"]) == (4, 0.1, 4)
+    assert ops(params["pipeline"]) == ["posterize"]
+    assert CompiledStyle([{"op": "posterize"}, {"op": "pixelate"}, {"op": "noise", "mode": "mono"}]) \
+        .low_res_plan({}) is None
@@ -0,0 +1,108 @@
+import threading
+import types
+
+from gui_components import app_functions
+from gui_components.app_functions import AppFunctions
+from gui_components.ui_events import UIEventBus
+
+
+class FakeRoot:
+    """Records the drains UIEventBus schedules instead of running a Tk main loop"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, interval_ms, func):
+        self.scheduled.append(func)
+
+
+def make_bus():
+    applied = {"logs": [], "progress": []}
+    bus = UIEventBus(FakeRoot(), applied["logs"].extend, lambda *args: applied["progress"].append(args))
+    return bus, applied
+
+
+def test_drain_batches_logs_and_keeps_the_newest_progress():
+    bus, applied = make_bus()
+    calls = []
+    bus.log("one")
+    bus.progress(10, "Extracting")
+    bus.log("two", "error")
+    bus.progress(20)
+    bus.call(calls.append, 1)
+    bus.call(calls.append, 2)
+    bus._drain()
+    assert [(text, level) for _, text, level in applied["logs"]] == [("one", "info"), ("two", "error")]
+    assert applied["progress"] == [(20, "Extracting")]
+    assert calls == [1, 2]
+    # The next drain is always scheduled and has nothing left to apply
+    assert len(bus.root.scheduled) == 1
+    bus._drain()
+    assert applied["progress"] == [(20, "Extracting")]
+
+
+def test_a_failing_call_still_schedules_the_next_drain():
+    bus, _ = make_bus()
+    bus.call(lambda: 1 / 0)
+    try:
+        bus._drain()
+    except ZeroDivisionError:
+        pass
+    assert len(bus.root.scheduled) == 1
+
+
+class TkOnlyButton:
+    def config(self, **options):
+        assert threading.current_thread() is threading.main_thread()
+
+
+def job(tmp_path, **overrides):
+    values = {"video_path": "clip.mp4", "output_name": "clip", "output_dir": str(tmp_path / "clip"),
+              "nobg_dir": str(tmp_path / "clip_nobg"), "processed_dir": str(tmp_path / "processed"),
+              "final_video_path": str(tmp_path / "final" / "clip_final.mp4"), "fps": 10,
+              "edge_threshold": [100, 200], "distortion_strength": 0, "style_name": "faith", "custom_params": None,
+              "export_original_frames": False, "export_nobg_frames": False, "export_processed_frames": False,
+              "create_final_video": True, "streaming": True, "low_res": False}
+    values.update(overrides)
+    return values
+
+
+def run_worker(tmp_path, monkeypatch, pipeline):
+    """Run process_video on a worker thread and return the dialogs it asked the Tk thread to show"""
+    bus, applied = make_bus()
+    app = types.SimpleNamespace(events=bus, process_btn=TkOnlyButton(), reset_btn=TkOnlyButton())
+    functions = AppFunctions(app)
+    dialogs = []
+
+    def dialog(kind):
+        def show(*args):
+            assert threading.current_thread() is threading.main_thread()
+            dialogs.append(kind)
+            return False
+        return show
+
+    monkeypatch.setattr(app_functions, "messagebox", types.SimpleNamespace(
+        showinfo=dialog("info"), showerror=dialog("error"), askyesno=dialog("askyesno")))
+    monkeypatch.setattr(functions, "get_base_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(functions, "run_streaming_pipeline", pipeline)
+    worker = threading.Thread(target=functions.process_video, args=(job(tmp_path),))
+    worker.start()
+    worker.join()
+    assert dialogs == []
+    bus._drain()
+    return dialogs, applied
+
+
+def test_worker_posts_completion_dialogs_to_the_tk_thread(tmp_path, monkeypatch):
+    dialogs, applied = run_worker(tmp_path, monkeypatch, lambda job, metrics: None)
+    assert dialogs == ["info", "askyesno"]
+    assert applied["progress"][-1][0] == 100
+
+
+def test_worker_posts_errors_to_the_tk_thread(tmp_path, monkeypatch):
+    def fail(job, metrics):
+        raise RuntimeError("decode failed")
+
+    dialogs, applied = run_worker(tmp_path, monkeypatch, fail)
+    assert dialogs == ["error"]
+    assert any("decode failed" in text for _, text, _ in applied["logs"])